@@ -9,26 +9,65 @@ import pandas as pd
 import numpy as np
 import re
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import anthropic
+import gzip
+from regras import METAS_PADRAO, obter_regras
+from artefatos import caminho_artefato, salvar_criadores
+from impressao import caminho_impressao, renderizar_impressao, gravar_impressao
+from ia import ia
+from notas_ia import gerar_notas_criadores
+from registros import montar_criadores, valores_compartilhados
+from ranking import Ranking
+from anomalias import referencias, detectar, descrever
+
+try:
+    import brotli
+except ImportError:  # Brotli é opcional: sem ele, só a versão .gz é gerada
+    brotli = None
+
+
+def montar_prompt_insights(agregados):
+    """Prompt dos insights da semana a partir dos agregados já calculados"""
+    top_3 = [c['nome'] for c in agregados['top_pareto'][:3]]
+    
+    return f"""Você é analista sênior da OLAH Agência de Creators (TikTok).
+
+DADOS DA SEMANA:
+- Total diamantes: {agregados['total_diamantes']:,.0f}
+- Horas totais: {agregados['total_horas']:.1f}h
+- Top 3: {', '.join(top_3)}
+- Alertas vermelhos: {agregados['n_alertas']}
+- Atenções: {agregados['n_atencoes']}
+- Média batalhas/creator: {agregados['media_batalhas']:.1f}
+
+RESPONDA APENAS:
+
+🔧 Recomendações Práticas:
+(3-5 ações diretas e práticas)
+
+⚠️ Observações Críticas:
+(2-3 pontos de atenção urgentes)
+
+TOM: Direto, jovem, enérgico (marca OLAH).
+SEM introduções ou conclusões - apenas os bullets."""
+
 
 class AnalisadorRelatorio:
     """
     Analisador de dados de creators seguindo as métricas e regras da agência
     """
     
-    # Metas e alertas (seção 2 do manual)
-    METAS = {
-        'diamantes': {'ideal': 12500, 'alerta': 3000},
-        'horas': {'ideal': 25, 'alerta': 20},
-        'dias': {'ideal': 3, 'alerta': 2},
-        'batalhas': {'ideal': 20, 'alerta': 5},
-        'perc_batalhas': {'ideal': 50, 'alerta': 20}
-    }
+    # Metas e alertas (seção 2 do manual) - perfis configuráveis em regras_metas.json
+    METAS = METAS_PADRAO
     
-    def __init__(self, filepath):
+    def __init__(self, filepath, usar_ia=True, perfil=None, df=None, aba=None):
         self.filepath = filepath
-        self.df = None
+        self.usar_ia = usar_ia
+        self.regras = obter_regras(perfil)
+        self.METAS = self.regras.metas
+        self.aba = aba  # Nome da aba quando vem de uma pasta de trabalho com várias abas
+        self.df = df  # DataFrame já lido (ex: uma aba de processar_pasta_trabalho)
         self.dados_agregados = {}
         self.criadores = []  # Lista de criadores processados
         
@@ -92,46 +131,22 @@ class AnalisadorRelatorio:
     def processar(self):
         """Processa a planilha e retorna dados analisados"""
         try:
-            # Ler arquivo
-            if self.filepath.endswith('.csv'):
-                self.df = pd.read_csv(self.filepath)
-            else:
-                self.df = pd.read_excel(self.filepath, sheet_name=0)
-            
-            # Mapear colunas
-            self.mapear_colunas()
-            
-            # Processar dados
-            self.df['horas_live'] = self.df['duracao_live'].apply(self.converter_duracao_para_horas)
-            self.df['diamantes_total'] = self.df['diamantes_total'].fillna(0)
-            self.df['batalhas_qtd'] = self.df.get('batalhas_qtd', pd.Series([0] * len(self.df))).fillna(0)
-            self.df['diamantes_batalhas'] = self.df.get('diamantes_batalhas', pd.Series([0] * len(self.df))).fillna(0)
-            self.df['dias_live_validos'] = self.df.get('dias_live_validos', pd.Series([0] * len(self.df))).fillna(0)
-            
-            # Calcular métricas
-            self.df['diamantes_por_hora'] = self.df.apply(
-                lambda row: round(row['diamantes_total'] / max(row['horas_live'], 0.01), 2), 
-                axis=1
-            )
-            self.df['perc_batalhas'] = self.df.apply(
-                lambda row: round((row['diamantes_batalhas'] / max(row['diamantes_total'], 1)) * 100, 1), 
-                axis=1
-            )
-            
-            # Aplicar status
-            self.df['status_diamantes'] = self.df['diamantes_total'].apply(self.get_status_diamantes)
-            self.df['status_horas'] = self.df['horas_live'].apply(self.get_status_horas)
-            self.df['status_dias'] = self.df['dias_live_validos'].apply(self.get_status_dias)
-            self.df['status_batalhas'] = self.df['batalhas_qtd'].apply(self.get_status_batalhas)
-            self.df['status_perc_bat'] = self.df['perc_batalhas'].apply(self.get_status_perc_batalhas)
+            # Ler arquivo (a menos que o DataFrame já tenha sido fornecido)
+            if self.df is None:
+                if self.filepath.endswith('.csv'):
+                    self.df = pd.read_csv(self.filepath)
+                else:
+                    self.df = pd.read_excel(self.filepath, sheet_name=0)
             
-            # Classificar criadores
-            self.df['alertas'] = self.df.apply(lambda row: self.classificar_criador(row)[0], axis=1)
-            self.df['atencoes'] = self.df.apply(lambda row: self.classificar_criador(row)[1], axis=1)
+            self.preparar_dados()
             
             # Calcular agregados
             self.calcular_agregados()
             
+            # Etapas de IA sobre os agregados prontos
+            self.dados_agregados['insights_ia'] = self.gerar_insights_ia(self.dados_agregados)
+            self.gerar_notas_ia()
+            
             # Extrair período
             self.extrair_periodo()
             
@@ -146,83 +161,100 @@ class AnalisadorRelatorio:
                 'mensagem': str(e)
             }
     
+    def preparar_dados(self):
+        """Mapeia colunas, calcula métricas, status e alertas de cada criador"""
+        # Mapear colunas
+        self.mapear_colunas()
+        
+        # Processar dados
+        self.df['horas_live'] = self.df['duracao_live'].apply(self.converter_duracao_para_horas)
+        self.df['diamantes_total'] = self.df['diamantes_total'].fillna(0)
+        self.df['batalhas_qtd'] = self.df.get('batalhas_qtd', pd.Series([0] * len(self.df))).fillna(0)
+        self.df['diamantes_batalhas'] = self.df.get('diamantes_batalhas', pd.Series([0] * len(self.df))).fillna(0)
+        self.df['dias_live_validos'] = self.df.get('dias_live_validos', pd.Series([0] * len(self.df))).fillna(0)
+        
+        # Calcular métricas
+        self.df['diamantes_por_hora'] = self.df.apply(
+            lambda row: round(row['diamantes_total'] / max(row['horas_live'], 0.01), 2), 
+            axis=1
+        )
+        self.df['perc_batalhas'] = self.df.apply(
+            lambda row: round((row['diamantes_batalhas'] / max(row['diamantes_total'], 1)) * 100, 1), 
+            axis=1
+        )
+        
+        # Aplicar status (vetorizado com as regras compiladas)
+        self.df['status_diamantes'] = self.regras.status('diamantes', self.df['diamantes_total'])
+        self.df['status_horas'] = self.regras.status('horas', self.df['horas_live'])
+        self.df['status_dias'] = self.regras.status('dias', self.df['dias_live_validos'])
+        self.df['status_batalhas'] = self.regras.status('batalhas', self.df['batalhas_qtd'])
+        self.df['status_perc_bat'] = self.regras.status('perc_batalhas', self.df['perc_batalhas'])
+        
+        # Classificar criadores
+        self.df['alertas'], self.df['atencoes'] = self.classificar_criadores()
+    
     def get_status_diamantes(self, valor):
-        if valor >= self.METAS['diamantes']['ideal']:
-            return '🟢'
-        elif valor >= self.METAS['diamantes']['alerta']:
-            return '🟡'
-        else:
-            return '🔴'
+        return self.regras.status_valor('diamantes', valor)
     
     def get_status_horas(self, valor):
-        if valor >= self.METAS['horas']['ideal']:
-            return '🟢'
-        elif valor >= self.METAS['horas']['alerta']:
-            return '🟡'
-        else:
-            return '🔴'
+        return self.regras.status_valor('horas', valor)
     
     def get_status_dias(self, valor):
-        if valor >= self.METAS['dias']['ideal']:
-            return '🟢'
-        elif valor == self.METAS['dias']['alerta']:
-            return '🟡'
-        else:
-            return '🔴'
+        return self.regras.status_valor('dias', valor)
     
     def get_status_batalhas(self, valor):
-        if valor >= self.METAS['batalhas']['ideal']:
-            return '🟢'
-        elif valor >= self.METAS['batalhas']['alerta']:
-            return '🟡'
-        else:
-            return '🔴'
+        return self.regras.status_valor('batalhas', valor)
     
     def get_status_perc_batalhas(self, valor):
-        if valor >= self.METAS['perc_batalhas']['ideal']:
-            return '🟢'
-        elif valor >= self.METAS['perc_batalhas']['alerta']:
-            return '🟡'
-        else:
-            return '🔴'
+        return self.regras.status_valor('perc_batalhas', valor)
     
-    def classificar_criador(self, row):
-        """Classifica criador em alertas e atenções"""
-        alertas = []
-        atencoes = []
-        
-        # Alertas vermelhos (críticos)
-        if row['diamantes_total'] < self.METAS['diamantes']['alerta']:
-            alertas.append(f"< 3.000 diamantes ({int(row['diamantes_total'])})")
-        
-        if row['dias_live_validos'] < self.METAS['dias']['alerta']:
-            alertas.append(f"< 2 dias válidos ({int(row['dias_live_validos'])})")
+    def classificar_criadores(self):
+        """
+        Classifica todos os criadores em alertas e atenções
         
-        if row['batalhas_qtd'] < self.METAS['batalhas']['alerta']:
-            alertas.append(f"< 5 batalhas ({int(row['batalhas_qtd'])})")
+        As comparações são feitas em bloco sobre as colunas; as mensagens usam
+        os rótulos do perfil de metas (ex: '3.000', '20h').
+        Retorna (lista de alertas, lista de atenções), uma entrada por linha.
+        """
+        metas = self.METAS
+        rot = self.regras.rotulos
         
-        if row['perc_batalhas'] < self.METAS['perc_batalhas']['alerta']:
-            alertas.append(f"% batalhas < 20% ({row['perc_batalhas']}%)")
+        diam = self.df['diamantes_total'].to_numpy(dtype=float)
+        horas = self.df['horas_live'].to_numpy(dtype=float)
+        dias = self.df['dias_live_validos'].to_numpy(dtype=float)
+        bats = self.df['batalhas_qtd'].to_numpy(dtype=float)
+        perc = self.df['perc_batalhas'].to_numpy(dtype=float)
         
-        # Atenções (abaixo da meta ideal, mas não crítico)
-        if row['diamantes_total'] >= self.METAS['diamantes']['alerta'] and row['diamantes_total'] < self.METAS['diamantes']['ideal']:
-            atencoes.append(f"Abaixo da meta ideal em diamantes ({int(row['diamantes_total'])})")
+        def _entre(valores, indicador):
+            return (valores >= metas[indicador]['alerta']) & (valores < metas[indicador]['ideal'])
         
-        if row['horas_live'] >= self.METAS['horas']['alerta'] and row['horas_live'] < self.METAS['horas']['ideal']:
-            atencoes.append(f"Horas entre 20-25h ({row['horas_live']}h)")
-        elif row['horas_live'] < self.METAS['horas']['alerta'] and row['horas_live'] > 0:
-            alertas.append(f"< 20h de live ({row['horas_live']}h)")
+        # (máscara, gerador da mensagem) na ordem em que aparecem no relatório
+        regras_alerta = [
+            (diam < metas['diamantes']['alerta'], lambda i: f"< {rot['diamantes']['alerta']} diamantes ({int(diam[i])})"),
+            (dias < metas['dias']['alerta'], lambda i: f"< {rot['dias']['alerta']} dias válidos ({int(dias[i])})"),
+            (bats < metas['batalhas']['alerta'], lambda i: f"< {rot['batalhas']['alerta']} batalhas ({int(bats[i])})"),
+            (perc < metas['perc_batalhas']['alerta'], lambda i: f"% batalhas < {rot['perc_batalhas']['alerta']} ({perc[i]}%)"),
+            ((horas < metas['horas']['alerta']) & (horas > 0), lambda i: f"< {rot['horas']['alerta']} de live ({horas[i]}h)")
+        ]
         
-        if row['perc_batalhas'] >= self.METAS['perc_batalhas']['alerta'] and row['perc_batalhas'] < self.METAS['perc_batalhas']['ideal']:
-            atencoes.append(f"% batalhas entre 20-50% ({row['perc_batalhas']}%)")
+        regras_atencao = [
+            (_entre(diam, 'diamantes'), lambda i: f"Abaixo da meta ideal em diamantes ({int(diam[i])})"),
+            (_entre(horas, 'horas'), lambda i: f"Horas entre {metas['horas']['alerta']}-{rot['horas']['ideal']} ({horas[i]}h)"),
+            (_entre(perc, 'perc_batalhas'), lambda i: f"% batalhas entre {metas['perc_batalhas']['alerta']}-{rot['perc_batalhas']['ideal']} ({perc[i]}%)"),
+            (_entre(dias, 'dias'), lambda i: f"Apenas {int(dias[i])} dias válidos"),
+            (_entre(bats, 'batalhas'), lambda i: f"Batalhas entre {rot['batalhas']['alerta']}-{rot['batalhas']['ideal']} ({int(bats[i])})")
+        ]
         
-        if row['dias_live_validos'] == self.METAS['dias']['alerta']:
-            atencoes.append(f"Apenas 2 dias válidos")
+        alertas = [[] for _ in range(len(self.df))]
+        atencoes = [[] for _ in range(len(self.df))]
         
-        if row['batalhas_qtd'] >= self.METAS['batalhas']['alerta'] and row['batalhas_qtd'] < self.METAS['batalhas']['ideal']:
-            atencoes.append(f"Batalhas entre 5-20 ({int(row['batalhas_qtd'])})")
+        for destino, regras in ((alertas, regras_alerta), (atencoes, regras_atencao)):
+            for mascara, mensagem in regras:
+                for i in np.flatnonzero(mascara):
+                    destino[i].append(mensagem(i))
         
-        return alertas, atencoes
+        # Tuplas ocupam menos que listas e todas as vazias são o mesmo objeto ()
+        return [tuple(a) for a in alertas], [tuple(a) for a in atencoes]
     
     def calcular_agregados(self):
         """Calcula dados agregados da agência com classificação especial para tops"""
@@ -238,51 +270,55 @@ class AnalisadorRelatorio:
         media_batalhas = round(self.df['batalhas_qtd'].mean(), 1)
         media_dias = round(self.df['dias_live_validos'].mean(), 1)
         
-        # Pareto 80/20 (calcular ANTES da classificação)
-        df_sorted = self.df.sort_values('diamantes_total', ascending=False).reset_index(drop=True)
+        # Ranking por diamantes: uma ordenação para Pareto, curva, Gini e decis
+        ranking = Ranking(self.df['diamantes_total'].to_numpy())
+        ordem = ranking.ordem
         n_top_20 = max(1, int(n_criadores * 0.20))
-        top_pareto_nomes = set(df_sorted.head(n_top_20)['streamer_nome'].tolist())
-        perc_pareto = round(df_sorted.head(n_top_20)['diamantes_total'].sum() / max(total_diamantes, 1) * 100, 1)
+        perc_pareto = ranking.participacao_top(n_top_20) if total_diamantes > 0 else 0.0
         
-        # Aplicar NOVA classificação com regra especial para tops
-        self.criadores = []
-        for idx, row in df_sorted.iterrows():
-            is_top = row['streamer_nome'] in top_pareto_nomes
-            
-            classificacao = self.classificar_criador_com_ia({
-                'nome': row['streamer_nome'],
-                'diamantes': row['diamantes_total'],
-                'horas': row['horas_live'],
-                'batalhas': row['batalhas_qtd'],
-                'perc_batalhas': row['perc_batalhas'],
-                'dias': row['dias_live_validos']
-            }, is_top)
-            
-            self.criadores.append({
-                'nome': row['streamer_nome'],
-                'diamantes': int(row['diamantes_total']),
-                'horas': row['horas_live'],
-                'diam_hora': row['diamantes_por_hora'],
-                'perc_bat': row['perc_batalhas'],
-                'batalhas': int(row['batalhas_qtd']),
-                'dias': int(row['dias_live_validos']),
-                'classificacao': classificacao,
-                'is_top': is_top,
-                'st_diam': row['status_diamantes'],
-                'st_horas': row['status_horas'],
-                'st_perc_bat': row['status_perc_bat'],
-                'st_bats': row['status_batalhas'],
-                'st_dias': row['status_dias']
-            })
+        def _ordenada(coluna):
+            return self.df[coluna].to_numpy()[ordem]
+        
+        # Aplicar NOVA classificação com regra especial para tops (vetorizada, já na ordem do ranking)
+        is_top_arr = np.arange(n_criadores) < n_top_20
+        diamantes = _ordenada('diamantes_total')
+        horas = _ordenada('horas_live')
+        batalhas = _ordenada('batalhas_qtd')
+        perc_batalhas = _ordenada('perc_batalhas')
+        dias = _ordenada('dias_live_validos')
+        status_arr, motivo_arr, acao_arr = self.regras.classificar(
+            diamantes, horas, batalhas, perc_batalhas, dias, is_top_arr
+        )
+        
+        # Registros compactos (__slots__) montados direto das colunas, sem iterrows
+        self.criadores = montar_criadores({
+            'nome': _ordenada('streamer_nome').tolist(),
+            'diamantes': diamantes.astype(np.int64).tolist(),
+            'horas': horas.tolist(),
+            'diam_hora': _ordenada('diamantes_por_hora').tolist(),
+            'perc_bat': perc_batalhas.tolist(),
+            'batalhas': batalhas.astype(np.int64).tolist(),
+            'dias': dias.astype(np.int64).tolist(),
+            'is_top': is_top_arr.tolist(),
+            'st_diam': valores_compartilhados(_ordenada('status_diamantes')),
+            'st_horas': valores_compartilhados(_ordenada('status_horas')),
+            'st_perc_bat': valores_compartilhados(_ordenada('status_perc_bat')),
+            'st_bats': valores_compartilhados(_ordenada('status_batalhas')),
+            'st_dias': valores_compartilhados(_ordenada('status_dias')),
+            'alertas': _ordenada('alertas').tolist(),
+            'atencoes': _ordenada('atencoes').tolist(),
+            'aba': valores_compartilhados(_ordenada('aba')) if 'aba' in self.df else [None] * n_criadores,
+            'percentil': np.round(ranking.percentis[ordem], 1).tolist(),
+            'decil': ranking.decis[ordem].tolist()
+        }, status_arr, motivo_arr, acao_arr)
         
-        # Recontar com nova classificação
-        alertas_list = [c for c in self.criadores if c['classificacao']['status'] == 'vermelho']
-        atencoes_list = [c for c in self.criadores if c['classificacao']['status'] == 'amarelo']
-        oks_list = [c for c in self.criadores if c['classificacao']['status'] == 'verde']
+        # Recontar com nova classificação (índices, sem copiar listas de criadores)
+        idx_alertas = np.flatnonzero(status_arr == 'vermelho')
+        idx_atencoes = np.flatnonzero(status_arr == 'amarelo')
         
-        n_alertas = len(alertas_list)
-        n_atencoes = len(atencoes_list)
-        n_oks = len(oks_list)
+        n_alertas = len(idx_alertas)
+        n_atencoes = len(idx_atencoes)
+        n_oks = int(np.count_nonzero(status_arr == 'verde'))
         
         # Status da agência
         status_diam_ag = self.get_status_diamantes(media_diam_criador)
@@ -301,10 +337,6 @@ class AnalisadorRelatorio:
                 'percentual': perc_individual
             })
         
-        # Gerar insights com IA
-        print("🤖 Gerando insights com Claude...")
-        insights_ia = self.gerar_insights_ia()
-        
         self.dados_agregados = {
             'n_criadores': n_criadores,
             'total_diamantes': total_diamantes,
@@ -320,6 +352,7 @@ class AnalisadorRelatorio:
             'n_oks': n_oks,
             'n_top': n_top_20,
             'perc_pareto': perc_pareto,
+            'concentracao': ranking.resumo(),
             'status_diam_ag': status_diam_ag,
             'status_horas_ag': status_horas_ag,
             'status_perc_bat_ag': status_perc_bat_ag,
@@ -327,13 +360,34 @@ class AnalisadorRelatorio:
             'status_dias_ag': status_dias_ag,
             'top_pareto': top_pareto_list,
             'top_creators': top_pareto_list,
-            'alertas': [{'nome': c['nome'], 'motivos': [c['classificacao']['motivo']]} for c in alertas_list],
-            'atencoes': [{'nome': c['nome'], 'motivos': [c['classificacao']['motivo']]} for c in atencoes_list],
+            # Os próprios registros (nome, motivos, nota_ia) alimentam as caixas do template
+            'alertas': [self.criadores[i] for i in idx_alertas],
+            'atencoes': [self.criadores[i] for i in idx_atencoes],
             'tabela_criadores': self.criadores[:50],  # Top 50
             'criadores_ocultos': max(0, n_criadores - 50),
-            'insights_ia': insights_ia
+            'insights_ia': None,  # preenchido por gerar_insights_ia após a agregação
+            'metas': self.regras.rotulos,
+            'perfil_metas': self.regras.perfil,
+            'aba': self.aba
         }
     
+    def gerar_notas_ia(self):
+        """
+        Notas curtas de coaching para os creators em alerta/atenção
+        
+        Gravadas em criador['nota_ia'] (tabela, Parquet e banco) e nas caixas
+        de alertas/atenções do relatório.
+        """
+        if not self.usar_ia or not ia.disponivel():
+            return
+        
+        alvos = [c for c in self.criadores if c['classificacao']['status'] in ('vermelho', 'amarelo')]
+        notas = gerar_notas_criadores(alvos, perfil=self.regras.perfil)
+        
+        # As caixas de alertas/atenções apontam para os mesmos registros
+        for c in alvos:
+            c['nota_ia'] = notas.get(c['nome'])
+    
     def gerar_nota(self, row):
         """Gera nota contextual para o criador"""
         notas = []
@@ -367,106 +421,35 @@ class AnalisadorRelatorio:
         Classifica criador com regra especial para tops:
         - Tops com 60%+ indicadores OK não vão para vermelho
         """
-        # Calcular % de indicadores positivos
-        indicadores_positivos = sum([
-            criador['diamantes'] >= self.METAS['diamantes']['ideal'],
-            criador['horas'] >= self.METAS['horas']['ideal'],
-            criador['batalhas'] >= self.METAS['batalhas']['ideal'],
-            criador['perc_batalhas'] >= self.METAS['perc_batalhas']['ideal'],
-            criador['dias'] >= self.METAS['dias']['ideal']
-        ])
-        
-        percentual_ok = (indicadores_positivos / 5) * 100
-        
-        # REGRA ESPECIAL: Tops com 60%+ indicadores OK não vão para vermelho
-        if is_top_20 and percentual_ok >= 60:
-            return {
-                'status': 'amarelo',
-                'motivo': f"Top creator com {percentual_ok:.0f}% indicadores OK",
-                'acao': 'Monitorar e otimizar pontos de atenção'
-            }
-        
-        # Regras normais para alertas vermelhos
-        if criador['diamantes'] < self.METAS['diamantes']['alerta']:
-            return {
-                'status': 'vermelho',
-                'motivo': f"Diamantes abaixo do alerta ({criador['diamantes']} < 3.000)",
-                'acao': 'Contato imediato'
-            }
-        
-        if indicadores_positivos <= 1:
-            return {
-                'status': 'vermelho',
-                'motivo': 'Múltiplos indicadores críticos',
-                'acao': 'Contato imediato'
-            }
-        
-        # Atenções
-        if percentual_ok < 60:
-            return {
-                'status': 'amarelo',
-                'motivo': f"{percentual_ok:.0f}% indicadores OK",
-                'acao': 'Monitorar e orientar'
-            }
-        
-        # Status verde
-        return {
-            'status': 'verde',
-            'motivo': 'Todas métricas em dia',
-            'acao': 'Manter estratégia'
-        }
+        status, motivo, acao = self.regras.classificar(
+            [criador['diamantes']], [criador['horas']], [criador['batalhas']],
+            [criador['perc_batalhas']], [criador['dias']], [is_top_20]
+        )
+        return {'status': status[0], 'motivo': motivo[0], 'acao': acao[0]}
     
-    def gerar_insights_ia(self):
+    def gerar_insights_ia(self, agregados):
         """
         Usa Claude API para gerar insights personalizados
         APENAS recomendações práticas e observações críticas
+        
+        Roda depois de calcular_agregados e recebe os agregados prontos
+        (contagens e totais já calculados, sem varrer os criadores de novo).
         """
         try:
-            api_key = os.environ.get('ANTHROPIC_API_KEY')
-            if not api_key:
-                return self._insights_fallback()
+            if not self.usar_ia or not ia.disponivel():
+                return self._insights_fallback(agregados)
             
-            client = anthropic.Anthropic(api_key=api_key)
+            print("🤖 Gerando insights com Claude...")
             
-            # Preparar dados para IA
-            top_creators = self.dados_agregados.get('top_creators', [])[:3]
-            alertas = len([c for c in self.criadores if c.get('classificacao', {}).get('status') == 'vermelho'])
-            atencoes = len([c for c in self.criadores if c.get('classificacao', {}).get('status') == 'amarelo'])
-            
-            prompt = f"""Você é analista sênior da OLAH Agência de Creators (TikTok).
-
-DADOS DA SEMANA:
-- Total diamantes: {self.dados_agregados.get('diamantes_total', 0):,.0f}
-- Horas totais: {self.dados_agregados.get('horas_total', 0):.1f}h
-- Top 3: {', '.join([c['nome'] for c in top_creators[:3]])}
-- Alertas vermelhos: {alertas}
-- Atenções: {atencoes}
-- Média batalhas/creator: {self.dados_agregados.get('media_batalhas', 0):.1f}
-
-RESPONDA APENAS:
-
-🔧 Recomendações Práticas:
-(3-5 ações diretas e práticas)
-
-⚠️ Observações Críticas:
-(2-3 pontos de atenção urgentes)
-
-TOM: Direto, jovem, enérgico (marca OLAH).
-SEM introduções ou conclusões - apenas os bullets."""
-
-            message = client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=800,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            return message.content[0].text
+            # Cliente compartilhado: timeouts, limite de chamadas simultâneas e SLA
+            texto = ia.gerar(montar_prompt_insights(agregados), max_tokens=800)
+            return texto if texto else self._insights_fallback(agregados)
             
         except Exception as e:
             print(f"Erro na IA: {e}")
-            return self._insights_fallback()
+            return self._insights_fallback(agregados)
     
-    def _insights_fallback(self):
+    def _insights_fallback(self, agregados):
         """
         Insights automáticos caso IA falhe
         """
@@ -474,15 +457,16 @@ SEM introduções ou conclusões - apenas os bullets."""
         obs_criticas = []
         
         # Recomendações baseadas em regras
-        alertas = len([c for c in self.criadores if c.get('classificacao', {}).get('status') == 'vermelho'])
-        if alertas > len(self.criadores) * 0.5:
-            obs_criticas.append(f"⚠️ **Concentração extrema:** {alertas} creators ({alertas/len(self.criadores)*100:.0f}%) em alerta vermelho")
+        alertas = agregados['n_alertas']
+        n_criadores = agregados['n_criadores']
+        if alertas > n_criadores * 0.5:
+            obs_criticas.append(f"⚠️ **Concentração extrema:** {alertas} creators ({alertas/n_criadores*100:.0f}%) em alerta vermelho")
         
-        media_batalhas = self.dados_agregados.get('media_batalhas', 0)
+        media_batalhas = agregados.get('media_batalhas', 0)
         if media_batalhas < 10:
             insights.append("🎯 Incentivar participação em batalhas (média baixa)")
         
-        if self.dados_agregados.get('media_perc_batalhas', 0) < 40:
+        if agregados.get('media_perc_batalhas', 0) < 40:
             insights.append("💎 Focar estratégia de batalhas para aumentar diamantes")
         
         # Formatar resposta
@@ -496,6 +480,144 @@ SEM introduções ou conclusões - apenas os bullets."""
         
         return texto if (insights or obs_criticas) else "Análise automática indisponível."
     
+    def obter_periodo_datas(self):
+        """Retorna (periodo_inicio, periodo_fim) a partir do período extraído"""
+        periodo = self.dados_agregados.get('periodo', '')
+        if ' a ' in periodo:
+            periodo_inicio, periodo_fim = periodo.split(' a ')
+            return periodo_inicio.strip(), periodo_fim.strip()
+        
+        hoje = datetime.now().strftime('%Y-%m-%d')
+        return hoje, hoje
+    
+    def comparar_semana_anterior(self, dados_anteriores, periodo_anterior=None):
+        """
+        Compara a semana atual com os agregados já gravados da semana anterior
+        
+        dados_anteriores: DataFrame ou lista de dicts com creator_nome, diamantes,
+        horas, batalhas e status (ex: snapshots_semanais ou um snapshot local).
+        Não relê planilhas antigas: o cruzamento é um merge em creator_nome.
+        """
+        anterior = pd.DataFrame(dados_anteriores)
+        if anterior.empty or not self.criadores:
+            return None
+        
+        anterior = anterior.drop_duplicates('creator_nome', keep='last')
+        
+        atual = pd.DataFrame({
+            'creator_nome': [c['nome'] for c in self.criadores],
+            'diamantes': [c['diamantes'] for c in self.criadores],
+            'horas': [c['horas'] for c in self.criadores],
+            'batalhas': [c['batalhas'] for c in self.criadores],
+            'status': [c['classificacao']['status'] for c in self.criadores]
+        })
+        
+        comp = atual.merge(
+            anterior[['creator_nome', 'diamantes', 'horas', 'batalhas', 'status']],
+            on='creator_nome', how='outer', suffixes=('', '_ant'), indicator=True
+        )
+        
+        ambos = comp['_merge'] == 'both'
+        novos = comp['_merge'] == 'left_only'
+        sairam = comp['_merge'] == 'right_only'
+        
+        comp['delta_diamantes'] = comp['diamantes'] - comp['diamantes_ant']
+        comp['var_diamantes'] = np.where(
+            comp['diamantes_ant'] > 0,
+            (comp['delta_diamantes'] / comp['diamantes_ant'].where(comp['diamantes_ant'] > 0) * 100).round(1),
+            np.nan
+        )
+        comp['tendencia'] = np.select(
+            [comp['var_diamantes'] >= 10, comp['var_diamantes'] <= -10, ambos],
+            ['↑', '↓', '→'],
+            default=''
+        )
+        comp.loc[novos, 'tendencia'] = 'novo'
+        
+        # Creators que entraram em vermelho / saíram do vermelho nesta semana
+        novos_alertas = comp[ambos & (comp['status'] == 'vermelho') & (comp['status_ant'] != 'vermelho')]
+        recuperados = comp[ambos & (comp['status'] != 'vermelho') & (comp['status_ant'] == 'vermelho')]
+        
+        variacoes = comp[ambos].sort_values('delta_diamantes')
+        
+        def _linhas(df):
+            return [{
+                'nome': r.creator_nome,
+                'diamantes': int(r.diamantes),
+                'diamantes_ant': int(r.diamantes_ant),
+                'delta': int(r.delta_diamantes),
+                'var': None if pd.isna(r.var_diamantes) else float(r.var_diamantes),
+                'status': r.status,
+                'status_ant': r.status_ant
+            } for r in df.itertuples(index=False)]
+        
+        total_atual = int(comp.loc[~sairam, 'diamantes'].sum())
+        total_anterior = int(comp.loc[~novos, 'diamantes_ant'].sum())
+        
+        # Propagar variação/tendência para a tabela por criador
+        por_nome = comp.loc[~sairam].set_index('creator_nome')[['var_diamantes', 'tendencia']].to_dict('index')
+        for c in self.criadores:
+            info = por_nome.get(c['nome'])
+            if info:
+                c['var_diamantes'] = None if pd.isna(info['var_diamantes']) else float(info['var_diamantes'])
+                c['tendencia'] = info['tendencia']
+        
+        self.dados_agregados['comparativo'] = {
+            'periodo_anterior': periodo_anterior or '',
+            'total_diamantes_ant': total_anterior,
+            'var_total_diamantes': round((total_atual - total_anterior) / total_anterior * 100, 1) if total_anterior else None,
+            'total_horas_ant': round(float(comp.loc[~novos, 'horas_ant'].sum()), 2),
+            'n_criadores_ant': int((~novos).sum()),
+            'n_novos': int(novos.sum()),
+            'n_sairam': int(sairam.sum()),
+            'novos_alertas': _linhas(novos_alertas),
+            'recuperados': _linhas(recuperados),
+            'maiores_quedas': _linhas(variacoes.head(10)),
+            'maiores_altas': _linhas(variacoes.iloc[::-1].head(10))
+        }
+        
+        return self.dados_agregados['comparativo']
+    
+    def detectar_anomalias(self, historico):
+        """
+        Compara cada creator com a própria mediana/MAD das semanas anteriores
+        
+        historico: linhas de snapshots_semanais das últimas semanas (uma
+        consulta para o upload inteiro). Marca criador['anomalias'] e monta
+        dados_agregados['anomalias'] (tops e maiores quedas primeiro).
+        """
+        ref = referencias(historico)
+        if ref.empty:
+            return []
+        
+        resultado = detectar(
+            np.array([c.nome for c in self.criadores], dtype=object),
+            {
+                'diamantes': [c.diamantes for c in self.criadores],
+                'horas': [c.horas for c in self.criadores],
+                'batalhas': [c.batalhas for c in self.criadores]
+            },
+            ref
+        )
+        
+        anomalias = []
+        for c, lista in zip(self.criadores, resultado):
+            if not lista:
+                continue
+            c['anomalias'] = tuple(lista)
+            anomalias.append({
+                'nome': c.nome,
+                'is_top': c.is_top,
+                'status': c.classificacao.status,
+                'descricoes': [descrever(a) for a in lista],
+                'pior_variacao': min(a['variacao'] for a in lista)
+            })
+        
+        anomalias.sort(key=lambda a: (not a['is_top'], a['pior_variacao']))
+        self.dados_agregados['anomalias'] = anomalias
+        self.dados_agregados['n_anomalias'] = len(anomalias)
+        return anomalias
+    
     def extrair_periodo(self):
         """Extrai período dos dados"""
         if 'periodo' in self.df.columns:
@@ -508,21 +630,34 @@ SEM introduções ou conclusões - apenas os bullets."""
         hoje = datetime.now()
         self.dados_agregados['periodo'] = f"{hoje.strftime('%Y-%m-%d')} (data do upload)"
     
-    def gerar_html(self, output_path):
-        """Gera arquivo HTML do relatório"""
+    def renderizar_html(self, arquivo_nome):
+        """Renderiza o HTML do relatório e retorna como string"""
         from jinja2 import Template
         
-        # Extrair nome do arquivo
-        arquivo_nome = os.path.basename(output_path)
-        
         # Template HTML (inline por simplicidade)
         template_html = self.get_template_html()
         
         template = Template(template_html)
-        html_content = template.render(arquivo_nome=arquivo_nome, **self.dados_agregados)
+        return template.render(arquivo_nome=arquivo_nome, **self.dados_agregados)
+    
+    def gerar_html(self, output_path):
+        """Gera arquivo HTML do relatório"""
+        # Extrair nome do arquivo
+        arquivo_nome = os.path.basename(output_path)
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        html_content = self.renderizar_html(arquivo_nome)
+        
+        gravar_html(html_content, output_path)
+        self.salvar_tabela_completa(output_path)
+        self.salvar_impressao(output_path)
+    
+    def salvar_tabela_completa(self, output_path):
+        """Grava todos os criadores em Parquet ao lado do HTML (servido pela API paginada)"""
+        salvar_criadores(self.criadores, caminho_artefato(output_path))
+    
+    def salvar_impressao(self, output_path):
+        """Grava a versão de impressão ao lado do HTML (origem do PDF)"""
+        gravar_impressao(renderizar_impressao(self.dados_agregados, self.criadores), caminho_impressao(output_path))
     
     def get_template_html(self):
         """Retorna template HTML do relatório"""
@@ -557,9 +692,15 @@ SEM introduções ou conclusões - apenas os bullets."""
         .motivo-list { list-style: none; font-size: 13px; color: #555; margin-top: 5px; }
         .motivo-list li { padding-left: 15px; position: relative; }
         .motivo-list li:before { content: "→"; position: absolute; left: 0; }
+        .nota-ia { font-size: 13px; color: #333; margin-top: 8px; font-style: italic; }
         .pareto-list { list-style: none; counter-reset: pareto-counter; }
         .pareto-list li { counter-increment: pareto-counter; padding: 10px; margin: 8px 0; background: #f9f9f9; border-radius: 6px; display: flex; justify-content: space-between; }
         .pareto-list li:before { content: counter(pareto-counter) ". "; font-weight: 700; color: #667eea; margin-right: 10px; }
+        .tc-linha { display: grid; grid-template-columns: 2fr 1fr 0.7fr 0.8fr 0.7fr 0.6fr 0.5fr 0.7fr 2fr; gap: 8px; align-items: center; height: 36px; padding: 0 8px; font-size: 12px; border-bottom: 1px solid #e0e0e0; white-space: nowrap; overflow: hidden; }
+        .tc-linha span { overflow: hidden; text-overflow: ellipsis; }
+        .tc-cabecalho { background: #2c3e50; color: white; font-weight: 600; border-radius: 8px 8px 0 0; }
+        .tc-cabecalho span[data-col] { cursor: pointer; }
+        @media print { #tabela-completa { display: none !important; } }
         .footer-note { margin-top: 40px; padding-top: 20px; border-top: 2px solid #e0e0e0; text-align: center; color: #666; font-size: 13px; }
     </style>
 </head>
@@ -573,6 +714,12 @@ SEM introduções ou conclusões - apenas os bullets."""
             <a href="/pdf/{{ arquivo_nome }}" download style="padding: 10px 20px; background: #28a745; color: white; border: none; border-radius: 8px; font-weight: 600; cursor: pointer; display: flex; align-items: center; gap: 8px; text-decoration: none; transition: all 0.3s ease;">
                 📥 Baixar PDF
             </a>
+            <a href="/export/{{ arquivo_nome }}?formato=xlsx" style="padding: 10px 20px; background: #1d6f42; color: white; border: none; border-radius: 8px; font-weight: 600; cursor: pointer; display: flex; align-items: center; gap: 8px; text-decoration: none; transition: all 0.3s ease;">
+                📊 Exportar XLSX
+            </a>
+            <a href="/export/{{ arquivo_nome }}?formato=csv" style="padding: 10px 20px; background: white; color: #1d6f42; border: 2px solid #1d6f42; border-radius: 8px; font-weight: 600; cursor: pointer; display: flex; align-items: center; gap: 8px; text-decoration: none; transition: all 0.3s ease;">
+                📄 CSV
+            </a>
         </div>
         <div style="display: flex; gap: 10px;">
             <a href="/historico" style="padding: 10px 20px; background: white; color: #667eea; border: 2px solid #667eea; border-radius: 8px; font-weight: 600; text-decoration: none; display: flex; align-items: center; gap: 8px; transition: all 0.3s ease;">
@@ -590,6 +737,7 @@ SEM introduções ou conclusões - apenas os bullets."""
         <div class="meta-info">
             <span><strong>Período:</strong> {{ periodo }}</span> ·
             <span><strong>Criadores analisados:</strong> {{ n_criadores }}</span>
+            {% if aba %} · <span><strong>Aba:</strong> {{ aba }}</span>{% endif %}
         </div>
 
         <div class="summary-box">
@@ -603,6 +751,34 @@ SEM introduções ou conclusões - apenas os bullets."""
             </ul>
         </div>
 
+        {% if abas %}
+        <h2>🗂️ Resumo por Aba</h2>
+        <table>
+            <thead>
+                <tr>
+                    <th>Aba</th>
+                    <th class="text-right">Criadores</th>
+                    <th class="text-right">Diamantes</th>
+                    <th class="text-right">% do total</th>
+                    <th class="text-right">🔴 Alertas</th>
+                    <th class="text-right">🟡 Atenções</th>
+                </tr>
+            </thead>
+            <tbody>
+                {% for a in abas %}
+                <tr>
+                    <td><strong>{{ a.aba }}</strong></td>
+                    <td class="text-right">{{ a.n_criadores }}</td>
+                    <td class="text-right">{{ "{:,}".format(a.total_diamantes).replace(",", ".") }}</td>
+                    <td class="text-right">{{ a.percentual }}%</td>
+                    <td class="text-right">{{ a.n_alertas }}</td>
+                    <td class="text-right">{{ a.n_atencoes }}</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+        {% endif %}
+
         <h2>🏢 Painel da Agência</h2>
         <table>
             <thead>
@@ -618,36 +794,36 @@ SEM introduções ou conclusões - apenas os bullets."""
                 <tr>
                     <td><strong>Diamantes</strong></td>
                     <td class="text-right">{{ "{:,}".format(media_diam_criador).replace(",", ".") }}</td>
-                    <td class="text-right">≥ 12.500</td>
-                    <td class="text-right">&lt; 3.000</td>
+                    <td class="text-right">≥ {{ metas.diamantes.ideal }}</td>
+                    <td class="text-right">&lt; {{ metas.diamantes.alerta }}</td>
                     <td class="text-center">{{ status_diam_ag }}</td>
                 </tr>
                 <tr>
                     <td><strong>Horas</strong></td>
                     <td class="text-right">{{ media_horas_criador }}h</td>
-                    <td class="text-right">≥ 25h</td>
-                    <td class="text-right">&lt; 20h</td>
+                    <td class="text-right">≥ {{ metas.horas.ideal }}</td>
+                    <td class="text-right">&lt; {{ metas.horas.alerta }}</td>
                     <td class="text-center">{{ status_horas_ag }}</td>
                 </tr>
                 <tr>
                     <td><strong>% em Batalhas</strong></td>
                     <td class="text-right">{{ media_perc_batalhas }}%</td>
-                    <td class="text-right">≥ 50%</td>
-                    <td class="text-right">&lt; 20%</td>
+                    <td class="text-right">≥ {{ metas.perc_batalhas.ideal }}</td>
+                    <td class="text-right">&lt; {{ metas.perc_batalhas.alerta }}</td>
                     <td class="text-center">{{ status_perc_bat_ag }}</td>
                 </tr>
                 <tr>
                     <td><strong>Batalhas</strong></td>
                     <td class="text-right">{{ media_batalhas }}</td>
-                    <td class="text-right">≥ 20</td>
-                    <td class="text-right">&lt; 5</td>
+                    <td class="text-right">≥ {{ metas.batalhas.ideal }}</td>
+                    <td class="text-right">&lt; {{ metas.batalhas.alerta }}</td>
                     <td class="text-center">{{ status_bat_ag }}</td>
                 </tr>
                 <tr>
                     <td><strong>Dias válidos</strong></td>
                     <td class="text-right">{{ media_dias }}</td>
-                    <td class="text-right">≥ 3</td>
-                    <td class="text-right">&lt; 2</td>
+                    <td class="text-right">≥ {{ metas.dias.ideal }}</td>
+                    <td class="text-right">&lt; {{ metas.dias.alerta }}</td>
                     <td class="text-center">{{ status_dias_ag }}</td>
                 </tr>
             </tbody>
@@ -663,6 +839,43 @@ SEM introduções ou conclusões - apenas os bullets."""
             {% endfor %}
         </ol>
 
+        {% if concentracao %}
+        <h2>📐 Concentração de Diamantes</h2>
+        <p class="meta-info"><strong>Índice de Gini:</strong> {{ "%.3f"|format(concentracao.gini) }} (0 = distribuição igual · 1 = tudo em um criador)</p>
+        <table>
+            <thead>
+                <tr>
+                    {% for corte in concentracao.cortes %}<th class="text-right">Top {{ corte.percentual }}% ({{ corte.n }})</th>{% endfor %}
+                </tr>
+            </thead>
+            <tbody>
+                <tr>
+                    {% for corte in concentracao.cortes %}<td class="text-right">{{ corte.participacao }}%</td>{% endfor %}
+                </tr>
+            </tbody>
+        </table>
+        <table>
+            <thead>
+                <tr>
+                    <th>Decil</th>
+                    <th class="text-right">Criadores</th>
+                    <th class="text-right">Diamantes</th>
+                    <th class="text-right">% do total</th>
+                </tr>
+            </thead>
+            <tbody>
+                {% for d in concentracao.decis %}
+                <tr>
+                    <td>{{ d.decil }}º {% if d.decil == 1 %}(topo){% elif d.decil == 10 %}(base){% endif %}</td>
+                    <td class="text-right">{{ d.n }}</td>
+                    <td class="text-right">{{ "{:,}".format(d.total).replace(",", ".") }}</td>
+                    <td class="text-right">{{ d.participacao }}%</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+        {% endif %}
+
         {% if alertas %}
         <h2>🚨 Alertas Vermelhos</h2>
         <p style="color: #c62828; font-weight: 600; margin-bottom: 15px;">{{ n_alertas }} criadores em situação crítica</p>
@@ -675,6 +888,7 @@ SEM introduções ou conclusões - apenas os bullets."""
                     <li>{{ motivo }}</li>
                     {% endfor %}
                 </ul>
+                {% if alerta.nota_ia %}<p class="nota-ia">💬 {{ alerta.nota_ia }}</p>{% endif %}
             </div>
             {% endfor %}
         </div>
@@ -691,10 +905,84 @@ SEM introduções ou conclusões - apenas os bullets."""
                 <li>{{ motivo }}</li>
                 {% endfor %}
             </ul>
+            {% if atencao.nota_ia %}<p class="nota-ia">💬 {{ atencao.nota_ia }}</p>{% endif %}
         </div>
         {% endfor %}
         {% endif %}
 
+        {% if anomalias %}
+        <h2>⚡ Anomalias vs Histórico</h2>
+        <p style="color: #e65100; font-weight: 600; margin-bottom: 15px;">{{ n_anomalias }} criadores fora do próprio padrão (mediana das últimas semanas)</p>
+        <div style="max-height: 600px; overflow-y: auto; border: 1px solid #e0e0e0; border-radius: 8px; padding: 15px;">
+            {% for a in anomalias %}
+            <div class="alert-box {{ 'alert-red' if a.pior_variacao < 0 else 'alert-yellow' }}">
+                <div class="creator-name">{{ a.nome }}{% if a.is_top %} 🏅{% endif %}</div>
+                <ul class="motivo-list">
+                    {% for d in a.descricoes %}
+                    <li>{{ d }}</li>
+                    {% endfor %}
+                </ul>
+            </div>
+            {% endfor %}
+        </div>
+        {% endif %}
+
+        {% if comparativo %}
+        <h2>📈 Comparativo com a Semana Anterior</h2>
+        <p class="meta-info">
+            <strong>Semana anterior:</strong> {{ comparativo.periodo_anterior }} ·
+            <strong>Diamantes:</strong> {{ "{:,}".format(comparativo.total_diamantes_ant).replace(",", ".") }} → {{ "{:,}".format(total_diamantes).replace(",", ".") }}
+            {% if comparativo.var_total_diamantes is not none %}({{ "%+.1f"|format(comparativo.var_total_diamantes) }}%){% endif %} ·
+            <strong>Novos creators:</strong> {{ comparativo.n_novos }} ·
+            <strong>Saíram:</strong> {{ comparativo.n_sairam }}
+        </p>
+
+        {% if comparativo.novos_alertas %}
+        <div class="alert-box alert-red">
+            <div class="creator-name">🆕 Entraram em alerta vermelho nesta semana ({{ comparativo.novos_alertas|length }})</div>
+            <ul class="motivo-list">
+                {% for c in comparativo.novos_alertas %}
+                <li>{{ c.nome }} — {{ "{:,}".format(c.diamantes_ant).replace(",", ".") }} → {{ "{:,}".format(c.diamantes).replace(",", ".") }} diamantes (antes: {{ c.status_ant }})</li>
+                {% endfor %}
+            </ul>
+        </div>
+        {% endif %}
+
+        {% if comparativo.recuperados %}
+        <div class="alert-box" style="background: #f1ffe0; border-color: #2e7d32; color: #2e7d32;">
+            <div class="creator-name">✅ Saíram do alerta vermelho ({{ comparativo.recuperados|length }})</div>
+            <ul class="motivo-list">
+                {% for c in comparativo.recuperados %}
+                <li>{{ c.nome }} — agora {{ c.status }}</li>
+                {% endfor %}
+            </ul>
+        </div>
+        {% endif %}
+
+        <table>
+            <thead>
+                <tr>
+                    <th>📉 Maiores quedas</th>
+                    <th class="text-right">Δ Diamantes</th>
+                    <th>📈 Maiores altas</th>
+                    <th class="text-right">Δ Diamantes</th>
+                </tr>
+            </thead>
+            <tbody>
+                {% for i in range([comparativo.maiores_quedas|length, comparativo.maiores_altas|length]|max) %}
+                <tr>
+                    {% set q = comparativo.maiores_quedas[i] if i < comparativo.maiores_quedas|length else none %}
+                    {% set a = comparativo.maiores_altas[i] if i < comparativo.maiores_altas|length else none %}
+                    <td class="creator-name">{{ q.nome if q and q.delta < 0 else '' }}</td>
+                    <td class="text-right">{% if q and q.delta < 0 %}{{ "{:,}".format(q.delta).replace(",", ".") }}{% if q.var is not none %} ({{ q.var }}%){% endif %}{% endif %}</td>
+                    <td class="creator-name">{{ a.nome if a and a.delta > 0 else '' }}</td>
+                    <td class="text-right">{% if a and a.delta > 0 %}+{{ "{:,}".format(a.delta).replace(",", ".") }}{% if a.var is not none %} ({{ "%+.1f"|format(a.var) }}%){% endif %}{% endif %}</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+        {% endif %}
+
         {% if insights_ia %}
         <h2>🤖 Insights da IA</h2>
         <div style="background: linear-gradient(135deg, #E4FF1A 0%, #8B00FF 100%); padding: 25px; border-radius: 12px; margin: 30px 0; color: #2D2D2D;">
@@ -702,8 +990,8 @@ SEM introduções ou conclusões - apenas os bullets."""
         </div>
         {% endif %}
 
-        <h2>👤 Visão Detalhada por Criador (Top 50)</h2>
-        <div style="overflow-x: auto;">
+        <h2 id="titulo-tabela">👤 Visão Detalhada por Criador (Top 50)</h2>
+        <div id="tabela-top50" style="overflow-x: auto;">
             <table style="font-size: 12px;">
                 <thead>
                     <tr>
@@ -719,13 +1007,14 @@ SEM introduções ou conclusões - apenas os bullets."""
                         <th class="text-center">St(%Bat)</th>
                         <th class="text-center">St(Bats)</th>
                         <th class="text-center">St(Dias)</th>
+                        {% if comparativo %}<th class="text-right">Δ Sem.</th>{% endif %}
                         <th>Notas</th>
                     </tr>
                 </thead>
                 <tbody>
                     {% for criador in tabela_criadores %}
                     <tr>
-                        <td class="creator-name">{{ criador.nome }}</td>
+                        <td class="creator-name">{{ criador.nome }}{% if criador.aba and abas %} <small style="color: #999;">({{ criador.aba }})</small>{% endif %}</td>
                         <td class="text-right">{{ "{:,}".format(criador.diamantes).replace(",", ".") }}</td>
                         <td class="text-right">{{ criador.horas }}</td>
                         <td class="text-right">{{ criador.diam_hora }}</td>
@@ -737,22 +1026,259 @@ SEM introduções ou conclusões - apenas os bullets."""
                         <td class="text-center">{{ criador.st_perc_bat }}</td>
                         <td class="text-center">{{ criador.st_bats }}</td>
                         <td class="text-center">{{ criador.st_dias }}</td>
-                        <td>{{ criador.nota }}</td>
+                        {% if comparativo %}<td class="text-right">{{ criador.tendencia }}{% if criador.var_diamantes is defined and criador.var_diamantes is not none %} {{ "%+.1f"|format(criador.var_diamantes) }}%{% endif %}</td>{% endif %}
+                        <td>{{ criador.nota_ia or '—' }}</td>
                     </tr>
                     {% endfor %}
                 </tbody>
             </table>
         </div>
         {% if criadores_ocultos > 0 %}
-        <p style="margin-top: 20px; color: #666; font-size: 14px;">
+        <p id="nota-ocultos" style="margin-top: 20px; color: #666; font-size: 14px;">
             <em>Nota: {{ criadores_ocultos }} criadores não exibidos na tabela.</em>
         </p>
         {% endif %}
 
+        <!-- Tabela completa: carregada sob demanda da API paginada (só na tela) -->
+        <div id="tabela-completa" style="display: none;">
+            <div style="display: flex; gap: 10px; margin: 10px 0; flex-wrap: wrap;">
+                <input id="tc-busca" type="search" placeholder="Buscar criador..." style="padding: 8px; border: 1px solid #ccc; border-radius: 6px; flex: 1; min-width: 200px;">
+                <select id="tc-status" style="padding: 8px; border: 1px solid #ccc; border-radius: 6px;">
+                    <option value="">Todos os status</option>
+                    <option value="vermelho">🔴 Alertas</option>
+                    <option value="amarelo">🟡 Atenções</option>
+                    <option value="verde">🟢 OKs</option>
+                </select>
+                <span id="tc-total" style="align-self: center; color: #666; font-size: 13px;"></span>
+            </div>
+            <div class="tc-linha tc-cabecalho">
+                <span data-col="nome">Criador</span>
+                <span data-col="diamantes" class="text-right">Diamantes</span>
+                <span data-col="horas" class="text-right">Horas</span>
+                <span data-col="diam_hora" class="text-right">Diam/h</span>
+                <span data-col="perc_bat" class="text-right">%Bat</span>
+                <span data-col="batalhas" class="text-right">Bats</span>
+                <span data-col="dias" class="text-right">Dias</span>
+                <span data-col="status" class="text-center">Status</span>
+                <span>Motivo</span>
+            </div>
+            <div id="tc-viewport" style="height: 600px; overflow-y: auto; position: relative; border: 1px solid #e0e0e0; border-radius: 8px;">
+                <div id="tc-espaco" style="position: relative;"></div>
+            </div>
+        </div>
+
         <div class="footer-note">
             <p><strong>Relatório baseado em {{ n_criadores }} criadores</strong></p>
             <p>Gerado em: {{ periodo }}</p>
         </div>
     </div>
+
+    <script>
+    (function () {
+        // Rolagem virtual: só as linhas visíveis existem no DOM; páginas vêm da API sob demanda
+        var API = '/api/relatorio/{{ arquivo_nome }}/criadores';
+        var ALTURA = 36, POR_PAGINA = 200;
+        var viewport = document.getElementById('tc-viewport');
+        var espaco = document.getElementById('tc-espaco');
+        var estado = { ordenar: 'diamantes', ordem: 'desc', status: '', busca: '', total: 0, paginas: {}, pendentes: {}, geracao: 0 };
+
+        function url(pagina) {
+            var p = new URLSearchParams({ pagina: pagina, por_pagina: POR_PAGINA, ordenar: estado.ordenar, ordem: estado.ordem });
+            if (estado.status) p.set('status', estado.status);
+            if (estado.busca) p.set('busca', estado.busca);
+            return API + '?' + p.toString();
+        }
+
+        function carregar(pagina) {
+            if (estado.paginas[pagina] || estado.pendentes[pagina]) return Promise.resolve();
+            var geracao = estado.geracao;
+            estado.pendentes[pagina] = true;
+            return fetch(url(pagina), { credentials: 'same-origin' })
+                .then(function (r) { if (!r.ok) throw new Error(r.status); return r.json(); })
+                .then(function (dados) {
+                    if (geracao !== estado.geracao) return;
+                    estado.paginas[pagina] = dados.criadores;
+                    estado.total = dados.total;
+                    espaco.style.height = (estado.total * ALTURA) + 'px';
+                    document.getElementById('tc-total').textContent = estado.total + ' criadores';
+                    desenhar();
+                })
+                .finally(function () { delete estado.pendentes[pagina]; });
+        }
+
+        function celula(linha, texto, classe) {
+            var s = document.createElement('span');
+            s.textContent = texto === null || texto === undefined ? '' : texto;
+            if (classe) s.className = classe;
+            linha.appendChild(s);
+            return s;
+        }
+
+        var ICONE = { vermelho: '🔴', amarelo: '🟡', verde: '🟢' };
+
+        function desenhar() {
+            var primeira = Math.floor(viewport.scrollTop / ALTURA);
+            var ultima = Math.min(estado.total, primeira + Math.ceil(viewport.clientHeight / ALTURA) + 10);
+            var fragmento = document.createDocumentFragment();
+            for (var i = primeira; i < ultima; i++) {
+                var pagina = Math.floor(i / POR_PAGINA) + 1;
+                var dados = estado.paginas[pagina];
+                if (!dados) { carregar(pagina); continue; }
+                var c = dados[i % POR_PAGINA];
+                if (!c) continue;
+                var linha = document.createElement('div');
+                linha.className = 'tc-linha';
+                linha.style.cssText = 'position: absolute; left: 0; right: 0; top: ' + (i * ALTURA) + 'px;';
+                celula(linha, c.nome, 'creator-name');
+                celula(linha, c.diamantes.toLocaleString('pt-BR'), 'text-right');
+                celula(linha, c.horas, 'text-right');
+                celula(linha, c.diam_hora, 'text-right');
+                celula(linha, c.perc_bat + '%', 'text-right');
+                celula(linha, c.batalhas, 'text-right');
+                celula(linha, c.dias, 'text-right');
+                celula(linha, ICONE[c.status] || c.status, 'text-center');
+                var motivo = celula(linha, c.motivo);
+                if (c.nota_ia) motivo.title = '💬 ' + c.nota_ia;
+                fragmento.appendChild(linha);
+            }
+            espaco.replaceChildren(fragmento);
+        }
+
+        function recarregar() {
+            estado.geracao++;
+            estado.paginas = {};
+            estado.pendentes = {};
+            viewport.scrollTop = 0;
+            return carregar(1);
+        }
+
+        viewport.addEventListener('scroll', function () { window.requestAnimationFrame(desenhar); });
+
+        document.querySelectorAll('.tc-cabecalho span[data-col]').forEach(function (th) {
+            th.addEventListener('click', function () {
+                var col = th.getAttribute('data-col');
+                estado.ordem = (estado.ordenar === col && estado.ordem === 'desc') ? 'asc' : 'desc';
+                estado.ordenar = col;
+                recarregar();
+            });
+        });
+
+        var espera;
+        document.getElementById('tc-busca').addEventListener('input', function (e) {
+            clearTimeout(espera);
+            espera = setTimeout(function () { estado.busca = e.target.value.trim(); recarregar(); }, 250);
+        });
+        document.getElementById('tc-status').addEventListener('change', function (e) {
+            estado.status = e.target.value;
+            recarregar();
+        });
+
+        // Só troca a tabela estática (Top 50) pela completa se a API responder
+        carregar(1).then(function () {
+            if (!estado.paginas[1]) return;
+            document.getElementById('tabela-top50').style.display = 'none';
+            var nota = document.getElementById('nota-ocultos');
+            if (nota) nota.style.display = 'none';
+            document.getElementById('tabela-completa').style.display = 'block';
+            document.getElementById('titulo-tabela').textContent = '👤 Visão Detalhada por Criador (todos)';
+        }).catch(function () {});
+    })();
+    </script>
 </body>
 </html>"""
+
+
+def gravar_html(html_content, output_path):
+    """
+    Grava o HTML do relatório junto com versões pré-comprimidas (.gz e .br)
+    
+    As irmãs comprimidas são servidas direto do disco por /relatorio/<arquivo>,
+    sem recomprimir a cada acesso.
+    """
+    dados = html_content.encode('utf-8')
+    
+    with open(output_path, 'wb') as f:
+        f.write(dados)
+    
+    # mtime=0 deixa o .gz determinístico (mesmo conteúdo, mesmos bytes)
+    with open(output_path + '.gz', 'wb') as f:
+        f.write(gzip.compress(dados, compresslevel=9, mtime=0))
+    
+    if brotli is not None:
+        with open(output_path + '.br', 'wb') as f:
+            f.write(brotli.compress(dados, mode=brotli.MODE_TEXT, quality=11))
+
+
+def processar_pasta_trabalho(filepath, usar_ia=True, perfil=None, max_workers=4):
+    """
+    Processa todas as abas de uma pasta de trabalho (uma aba por sub-agência)
+    
+    A planilha é aberta uma única vez; cada aba vira um AnalisadorRelatorio
+    processado em paralelo, e o consolidado roda agregação e Pareto sobre as
+    abas já preparadas concatenadas (sem reprocessar as linhas).
+    
+    A IA roda só no consolidado (uma chamada de insights e um lote de notas
+    por upload); as abas usam os insights automáticos e recebem as notas
+    do consolidado.
+    
+    Retorna dict com status, abas (lista de analisadores), consolidado e erros.
+    """
+    try:
+        planilhas = pd.read_excel(filepath, sheet_name=None)
+    except Exception as e:
+        return {'status': 'erro', 'mensagem': str(e)}
+    
+    analisadores = [
+        AnalisadorRelatorio(filepath, usar_ia=False, perfil=perfil, df=df, aba=str(nome))
+        for nome, df in planilhas.items()
+        if not df.dropna(how='all').empty
+    ]
+    
+    if not analisadores:
+        return {'status': 'erro', 'mensagem': 'Nenhuma aba com dados encontrada'}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        resultados = list(pool.map(lambda a: a.processar(), analisadores))
+    
+    abas = [a for a, r in zip(analisadores, resultados) if r['status'] == 'sucesso']
+    erros = [{'aba': a.aba, 'mensagem': r['mensagem']} for a, r in zip(analisadores, resultados) if r['status'] == 'erro']
+    
+    if not abas:
+        return {'status': 'erro', 'mensagem': '; '.join(f"{e['aba']}: {e['mensagem']}" for e in erros)}
+    
+    # Consolidado: concatena os dados já preparados de cada aba
+    consolidado = AnalisadorRelatorio(
+        filepath, usar_ia=usar_ia, perfil=perfil, aba='Consolidado',
+        df=pd.concat([a.df.assign(aba=a.aba) for a in abas], ignore_index=True)
+    )
+    
+    try:
+        consolidado.calcular_agregados()
+        consolidado.dados_agregados['insights_ia'] = consolidado.gerar_insights_ia(consolidado.dados_agregados)
+        consolidado.gerar_notas_ia()
+        consolidado.extrair_periodo()
+    except Exception as e:
+        return {'status': 'erro', 'mensagem': str(e)}
+    
+    notas = {(c.get('aba'), c['nome']): c.get('nota_ia') for c in consolidado.criadores if c.get('nota_ia')}
+    if notas:
+        for a in abas:
+            for c in a.criadores:
+                c['nota_ia'] = notas.get((a.aba, c['nome']))
+    
+    total = max(consolidado.dados_agregados['total_diamantes'], 1)
+    consolidado.dados_agregados['abas'] = [{
+        'aba': a.aba,
+        'n_criadores': a.dados_agregados['n_criadores'],
+        'total_diamantes': a.dados_agregados['total_diamantes'],
+        'percentual': round(a.dados_agregados['total_diamantes'] / total * 100, 1),
+        'n_alertas': a.dados_agregados['n_alertas'],
+        'n_atencoes': a.dados_agregados['n_atencoes']
+    } for a in abas]
+    
+    return {
+        'status': 'sucesso',
+        'abas': abas,
+        'consolidado': consolidado,
+        'erros': erros
+    }
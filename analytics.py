@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analytics Históricos da Agência
+Retenção, churn, coortes de entrada e médias móveis sobre todas as semanas
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_HISTORICO = ['creator_nome', 'periodo_inicio', 'periodo_fim', 'diamantes', 'horas', 'batalhas', 'status']
+
+
+def historico_para_dataframe(registros):
+    """Linhas de snapshots_semanais -> DataFrame tipado (uma linha por creator/semana)"""
+    df = pd.DataFrame(registros, columns=COLUNAS_HISTORICO)
+    df['diamantes'] = pd.to_numeric(df['diamantes'], errors='coerce').fillna(0).astype(np.int64)
+    df['horas'] = pd.to_numeric(df['horas'], errors='coerce').fillna(0.0)
+    df['batalhas'] = pd.to_numeric(df['batalhas'], errors='coerce').fillna(0).astype(np.int64)
+
+    # Reenvios da mesma semana: última linha vence
+    return df.drop_duplicates(['creator_nome', 'periodo_fim'], keep='last').reset_index(drop=True)
+
+
+def resumo_semanal(semanas, idx_semana, idx_criador, primeira_semana, diamantes):
+    """Ativos, novos, retidos e churn de cada semana (contra a semana anterior)"""
+    n_semanas = len(semanas)
+
+    ativos = np.bincount(idx_semana, minlength=n_semanas)
+    novos = np.bincount(idx_semana[idx_semana == primeira_semana], minlength=n_semanas)
+    total = np.bincount(idx_semana, weights=diamantes, minlength=n_semanas)
+
+    # Retido: o par (creator, semana - 1) também existe
+    chave = idx_criador * n_semanas + idx_semana
+    anterior = (idx_semana > 0) & np.isin(chave - 1, chave)
+    retidos = np.bincount(idx_semana[anterior], minlength=n_semanas)
+
+    linhas = []
+    for s in range(n_semanas):
+        ativos_ant = int(ativos[s - 1]) if s > 0 else 0
+        churn = ativos_ant - int(retidos[s]) if s > 0 else 0
+        linhas.append({
+            'periodo_fim': semanas[s],
+            'ativos': int(ativos[s]),
+            'novos': int(novos[s]),
+            'retidos': int(retidos[s]),
+            'churn': churn,
+            'retencao': round(float(retidos[s]) / ativos_ant * 100, 1) if ativos_ant else None,
+            'taxa_churn': round(churn / ativos_ant * 100, 1) if ativos_ant else None,
+            'total_diamantes': int(total[s])
+        })
+    return linhas
+
+
+def coortes_entrada(semanas, idx_semana, primeira_semana, max_semanas=12):
+    """
+    Coortes por semana de entrada: % da coorte ainda ativa N semanas depois
+
+    Cada linha: periodo_fim da entrada, tamanho e lista de retenção
+    (índice 0 = semana de entrada = 100%).
+    """
+    distancia = idx_semana - primeira_semana
+    dentro = distancia < max_semanas
+    n_semanas = len(semanas)
+
+    matriz = np.zeros((n_semanas, max_semanas), dtype=np.int64)
+    np.add.at(matriz, (primeira_semana[dentro], distancia[dentro]), 1)
+
+    coortes = []
+    for s in range(n_semanas):
+        tamanho = int(matriz[s, 0])
+        if not tamanho:
+            continue
+        observadas = min(max_semanas, n_semanas - s)
+        coortes.append({
+            'entrada': semanas[s],
+            'tamanho': tamanho,
+            'retencao': [round(float(matriz[s, d]) / tamanho * 100, 1) for d in range(observadas)]
+        })
+    return coortes
+
+
+def medias_moveis(df, idx_semana, janela=4, limite=100):
+    """
+    Média móvel de diamantes/horas das últimas `janela` semanas de cada creator
+
+    Retorna os creators ativos na última semana, ordenados pela média de
+    diamantes (limite linhas).
+    """
+    ordenado = df.assign(s=idx_semana).sort_values(['creator_nome', 's'], kind='stable')
+    grupos = ordenado.groupby('creator_nome', sort=False)
+
+    # rolling por grupo devolve índice (creator, linha): descartar o nível do creator para alinhar
+    janelas = grupos[['diamantes', 'horas']].rolling(janela, min_periods=1).mean().reset_index(level=0, drop=True)
+    ordenado['media_diamantes'] = janelas['diamantes']
+    ordenado['media_horas'] = janelas['horas']
+    ordenado['semanas'] = grupos.cumcount() + 1
+
+    ultima = ordenado['s'].max()
+    atuais = ordenado[ordenado['s'] == ultima].nlargest(limite, 'media_diamantes')
+
+    return [{
+        'creator_nome': r.creator_nome,
+        'diamantes': int(r.diamantes),
+        'media_diamantes': round(float(r.media_diamantes), 1),
+        'media_horas': round(float(r.media_horas), 2),
+        'semanas': int(r.semanas),
+        'var_vs_media': round((r.diamantes - r.media_diamantes) / r.media_diamantes * 100, 1) if r.media_diamantes else None
+    } for r in atuais.itertuples(index=False)]
+
+
+def calcular_analytics(historico, janela=4, limite=100, max_coortes=12):
+    """
+    Analytics cross-semana a partir do histórico completo
+
+    historico: linhas de snapshots_semanais (uma por creator/semana) ou o
+    DataFrame já montado por historico_para_dataframe.
+    """
+    df = historico if isinstance(historico, pd.DataFrame) else historico_para_dataframe(historico)
+
+    if df.empty:
+        return {'n_semanas': 0, 'n_criadores': 0, 'semanas': [], 'coortes': [], 'medias_moveis': []}
+
+    # Semanas indexadas em ordem cronológica (periodo_fim é ISO 'YYYY-MM-DD')
+    codigos, semanas = pd.factorize(df['periodo_fim'], sort=True)
+    idx_semana = codigos.astype(np.int64)
+    semanas = [str(s) for s in semanas]
+
+    idx_criador = pd.factorize(df['creator_nome'])[0].astype(np.int64)
+
+    # Primeira semana de cada creator, propagada para todas as linhas dele
+    primeira = np.full(idx_criador.max() + 1, len(semanas), dtype=np.int64)
+    np.minimum.at(primeira, idx_criador, idx_semana)
+    primeira_semana = primeira[idx_criador]
+
+    return {
+        'n_semanas': len(semanas),
+        'n_criadores': int(df['creator_nome'].nunique()),
+        'janela_media_movel': janela,
+        'semanas': resumo_semanal(semanas, idx_semana, idx_criador, primeira_semana, df['diamantes'].to_numpy()),
+        'coortes': coortes_entrada(semanas, idx_semana, primeira_semana, max_coortes),
+        'medias_moveis': medias_moveis(df, idx_semana, janela, limite)
+    }
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detecção de Anomalias Históricas
+Compara a semana atual de cada creator com o próprio histórico (mediana/MAD)
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# (chave no criador, coluna no histórico, rótulo)
+METRICAS = [
+    ('diamantes', 'diamantes', 'diamantes'),
+    ('horas', 'horas', 'horas'),
+    ('batalhas', 'batalhas', 'batalhas')
+]
+
+SEMANAS_HISTORICO = int(os.environ.get('ANOMALIAS_SEMANAS', 8))
+MIN_SEMANAS = int(os.environ.get('ANOMALIAS_MIN_SEMANAS', 3))
+LIMIAR_Z = float(os.environ.get('ANOMALIAS_LIMIAR_Z', 3.5))
+# Variação mínima (%) para virar anomalia - evita alarmes em valores pequenos e estáveis
+VARIACAO_MINIMA = float(os.environ.get('ANOMALIAS_VARIACAO_MINIMA', 40))
+
+# Escala do MAD para equivaler ao desvio-padrão numa normal
+_K_MAD = 1.4826
+
+
+def inicio_janela(periodo_inicio, semanas=None):
+    """Data (ISO) a partir da qual o histórico é lido; None se o período não for uma data"""
+    try:
+        inicio = datetime.strptime(periodo_inicio, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+    return (inicio - timedelta(weeks=semanas or SEMANAS_HISTORICO)).strftime('%Y-%m-%d')
+
+
+def referencias(historico, min_semanas=None):
+    """
+    Mediana e MAD de cada métrica por creator (DataFrame indexado pelo nome)
+
+    Só creators com pelo menos min_semanas semanas no histórico entram.
+    """
+    min_semanas = min_semanas or MIN_SEMANAS
+    df = historico if isinstance(historico, pd.DataFrame) else pd.DataFrame(historico)
+    if df.empty:
+        return pd.DataFrame()
+
+    colunas = [col for _, col, _ in METRICAS]
+    df = df[['creator_nome'] + colunas].copy()
+    for col in colunas:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(float)
+
+    grupos = df.groupby('creator_nome')
+    medianas = grupos[colunas].median()
+    desvios = (df[colunas] - grupos[colunas].transform('median')).abs()
+    mads = desvios.groupby(df['creator_nome']).median()
+
+    ref = medianas.add_suffix('_mediana').join(mads.add_suffix('_mad'))
+    ref['semanas'] = grupos.size()
+    return ref[ref['semanas'] >= min_semanas]
+
+
+def detectar(nomes, valores, ref, limiar=None, variacao_minima=None):
+    """
+    Marca anomalias para os creators da semana atual
+
+    nomes: array de nomes; valores: dict chave -> array alinhado com nomes.
+    Retorna lista (uma por creator, na mesma ordem) de listas de dicts
+    {metrica, atual, mediana, variacao, z}; vazia quando está tudo normal.
+    """
+    limiar = limiar or LIMIAR_Z
+    variacao_minima = variacao_minima or VARIACAO_MINIMA
+    n = len(nomes)
+    resultado = [[] for _ in range(n)]
+
+    if ref is None or ref.empty or n == 0:
+        return resultado
+
+    # Alinha o histórico com a ordem dos creators atuais (NaN = sem histórico suficiente)
+    alinhado = ref.reindex(pd.Index(nomes))
+
+    for chave, col, rotulo in METRICAS:
+        atual = np.asarray(valores[chave], dtype=float)
+        mediana = alinhado[f'{col}_mediana'].to_numpy()
+        mad = alinhado[f'{col}_mad'].to_numpy()
+
+        # MAD zero (semanas idênticas): escala mínima de 10% da mediana
+        escala = np.maximum(_K_MAD * mad, 0.1 * np.abs(mediana))
+        escala = np.where(escala > 0, escala, 1.0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = (atual - mediana) / escala
+            variacao = np.where(mediana > 0, (atual - mediana) / mediana * 100, np.nan)
+
+        marcados = np.flatnonzero(
+            ~np.isnan(mediana) & (np.abs(z) >= limiar) & (np.abs(variacao) >= variacao_minima)
+        )
+        for i in marcados:
+            resultado[i].append({
+                'metrica': rotulo,
+                'atual': round(float(atual[i]), 2),
+                'mediana': round(float(mediana[i]), 2),
+                'variacao': round(float(variacao[i]), 1),
+                'z': round(float(z[i]), 1)
+            })
+
+    return resultado
+
+
+def descrever(anomalia):
+    """Texto curto para tabela/caixas (ex: '📉 diamantes -62% vs mediana (8.000)')"""
+    seta = '📉' if anomalia['variacao'] < 0 else '📈'
+    mediana = anomalia['mediana']
+    mediana = f"{mediana:,.0f}".replace(',', '.') if mediana >= 100 else f"{mediana:g}".replace('.', ',')
+    return f"{seta} {anomalia['metrica']} {anomalia['variacao']:+.0f}% vs mediana ({mediana})"
+
+
+def anomalias_creator(semanas, min_semanas=None):
+    """
+    Anomalias da última semana de um creator contra as anteriores (painel)
+
+    semanas: lista de dicts com diamantes/horas/batalhas, da mais antiga
+    para a mais recente.
+    """
+    if len(semanas) < (min_semanas or MIN_SEMANAS) + 1:
+        return []
+
+    anteriores = pd.DataFrame(semanas[:-1]).assign(creator_nome='_')
+    ref = referencias(anteriores, min_semanas)
+    atual = semanas[-1]
+    return detectar(
+        np.array(['_'], dtype=object),
+        {chave: [atual.get(col) or 0] for chave, col, _ in METRICAS},
+        ref
+    )[0]
@@ -5,28 +5,56 @@ OLAH Agência - Sistema de Relatórios v3.0
 Com autenticação, banco de dados e painéis individuais
 """
 
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, send_file, flash, jsonify, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
-from analisador import AnalisadorRelatorio
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from analisador import AnalisadorRelatorio, processar_pasta_trabalho
+from regras import obter_regras
+from artefatos import caminho_artefato, consultar_criadores, gerar_csv, escrever_xlsx
+from impressao import SUFIXO as SUFIXO_IMPRESSAO, caminho_impressao, gerar_pdf
+from recebimento import (RequestUpload, ErroUpload, MAX_UPLOAD, criar_sessao, estado_sessao,
+                         receber_bloco, concluir_sessao, limpar_sessoes)
 from database import db
-from auth import User
+from cache import (cache_painel, cache_analytics, cache_historico, catalogo_relatorios, relatorios_reconstruidos,
+                   invalidar_relatorios)
+from reconstrucao import (PASTA_SNAPSHOTS, ReconstrucaoIndisponivel, nome_relatorio_periodo, periodo_do_nome,
+                          salvar_snapshot, listar_snapshots, montar_analisador)
+from analytics import calcular_analytics, historico_para_dataframe
+from anomalias import inicio_janela, anomalias_creator
+from ia import ia
+from auth import User, limite_login_ip, limite_login_email
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
+import fcntl
+import tempfile
 from datetime import datetime, timedelta
 import json
 
 # Configuração do Flask
 app = Flask(__name__)
+# Uploads gravados direto no disco, com hash e checagem de formato durante a leitura
+app.request_class = RequestUpload
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'olah-secret-key-change-in-production')
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'outputs'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD  # padrão 100MB
+
+# Dias que uploads, HTMLs e PDFs ficam em disco (semanas antigas são reconstruídas sob demanda)
+RETENCAO_DIAS = int(os.environ.get('RETENCAO_DIAS', 30))
+
+# Atrás do proxy do Easypanel: remote_addr passa a ser o IP real do cliente
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.environ.get('PROXY_COUNT', 1)))
 
 # Criar pastas se não existirem
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+os.makedirs(PASTA_SNAPSHOTS, exist_ok=True)
 os.makedirs('static/img', exist_ok=True)
 
+# Novo relatório salvo: painéis dos creators afetados e analytics ficam desatualizados
+db.ao_salvar_relatorio(invalidar_relatorios)
+
 # Configurar Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -38,13 +66,8 @@ def load_user(user_id):
     if not db.is_connected():
         return None
     
-    try:
-        result = db.supabase.table('usuarios').select('*').eq('id', int(user_id)).execute()
-        if result.data:
-            return User(result.data[0])
-    except:
-        pass
-    return None
+    usuario = db.buscar_usuario_por_id(user_id)
+    return User(usuario) if usuario else None
 
 # ==========================================
 # ROTAS DE AUTENTICAÇÃO
@@ -63,13 +86,27 @@ def login():
         if not db.is_connected():
             return render_template('login.html', error='Banco de dados não conectado. Entre em contato com o suporte.')
         
+        # Limite de tentativas por IP e por email+IP (antes de gastar CPU com bcrypt).
+        # O do email inclui o IP: senhas erradas de outra máquina não bloqueiam o dono da conta
+        chave_ip = f"ip:{request.remote_addr}"
+        chave_email = f"email:{(email or '').strip().lower()}|ip:{request.remote_addr}"
+        espera = max(limite_login_ip.tempo_bloqueio(chave_ip), limite_login_email.tempo_bloqueio(chave_email))
+        
+        if espera:
+            return render_template('login.html', error=f'Muitas tentativas. Tente novamente em {espera}s.'), 429
+        
         resultado = db.autenticar(email, senha)
         
         if resultado['sucesso']:
+            limite_login_email.limpar(chave_email)
             user = User(resultado['usuario'])
             login_user(user, remember=True)
             return redirect(url_for('painel'))
+        elif resultado.get('ocupado'):
+            return render_template('login.html', error=resultado['erro']), 503
         else:
+            limite_login_ip.registrar_falha(chave_ip)
+            limite_login_email.registrar_falha(chave_email)
             return render_template('login.html', error=resultado['erro'])
     
     return render_template('login.html')
@@ -85,6 +122,36 @@ def logout():
 # PAINEL INDIVIDUAL
 # ==========================================
 
+def _montar_painel_creator(creator_nome):
+    """Busca stats, histórico e séries do gráfico de um creator"""
+    # Histórico, estatísticas e gráfico são independentes: buscar em paralelo
+    dados = db.em_paralelo(
+        historico=(db.buscar_historico_creator, creator_nome, 10),
+        stats=(db.estatisticas_creator, creator_nome),
+        ultimas_semanas=(db.buscar_ultimas_semanas_creator, creator_nome, 8)
+    )
+    stats = dados['stats']
+    
+    if not stats:
+        return {
+            'stats': {'total_semanas': 0, 'total_diamantes': 0, 'total_horas': 0, 'media_diamantes': 0, 'media_horas': 0, 'melhor_semana': {'diamantes': 0, 'periodo_inicio': 'N/D'}},
+            'historico': [],
+            'labels': [],
+            'data': [],
+            'anomalias': []
+        }
+    
+    # Preparar dados do gráfico
+    ultimas_semanas = list(reversed(dados['ultimas_semanas'] or []))  # Mais antiga primeiro
+    
+    return {
+        'stats': stats,
+        'historico': dados['historico'] or [],
+        'labels': [f"{s['periodo_inicio']}" for s in ultimas_semanas],
+        'data': [s['diamantes'] for s in ultimas_semanas],
+        'anomalias': anomalias_creator(ultimas_semanas)
+    }
+
 @app.route('/painel')
 @login_required
 def painel():
@@ -101,33 +168,17 @@ def painel():
     if current_user.is_creator():
         creator_nome = current_user.email.split('@')[0]
         
-        # Buscar histórico
-        historico = db.buscar_historico_creator(creator_nome, limite=10)
+        # Painel pronto em cache (invalidado quando um upload grava nova semana)
+        dados_painel = cache_painel.obter(creator_nome)
         
-        # Buscar estatísticas
-        stats = db.estatisticas_creator(creator_nome)
-        
-        if not stats:
-            return render_template('painel_creator.html', 
-                                 user=current_user,
-                                 stats={'total_semanas': 0, 'total_diamantes': 0, 'total_horas': 0, 'media_diamantes': 0, 'media_horas': 0, 'melhor_semana': {'diamantes': 0, 'periodo_inicio': 'N/D'}},
-                                 historico=[],
-                                 labels=[],
-                                 data=[])
-        
-        # Preparar dados do gráfico
-        ultimas_semanas = db.buscar_ultimas_semanas_creator(creator_nome, n_semanas=8)
-        ultimas_semanas.reverse()  # Mais antiga primeiro
-        
-        labels = [f"{s['periodo_inicio']}" for s in ultimas_semanas]
-        data = [s['diamantes'] for s in ultimas_semanas]
+        if dados_painel is None:
+            dados_painel = _montar_painel_creator(creator_nome)
+            
+            # Sem stats pode ser creator novo ou falha do banco: não fixar em cache
+            if dados_painel['stats']['total_semanas']:
+                cache_painel.definir(creator_nome, dados_painel)
         
-        return render_template('painel_creator.html',
-                             user=current_user,
-                             stats=stats,
-                             historico=historico,
-                             labels=labels,
-                             data=data)
+        return render_template('painel_creator.html', user=current_user, **dados_painel)
     
     # Sub-agentes (futuro)
     return render_template('error.html', error='Tipo de usuário não suportado ainda')
@@ -143,7 +194,235 @@ def index():
     if not current_user.is_admin():
         return redirect(url_for('painel'))
     
-    return render_template('index.html', user=current_user)
+    return render_template('index.html', user=current_user, max_upload_mb=MAX_UPLOAD // (1024 * 1024))
+
+def _buscar_referencias(periodo_inicio):
+    """Semana anterior e histórico recente da agência (consultas em paralelo)"""
+    desde = inicio_janela(periodo_inicio)
+    return db.em_paralelo(
+        anterior=(db.buscar_semana_anterior, periodo_inicio),
+        historico=(db.buscar_historico_completo, desde, periodo_inicio) if desde else (list,)
+    )
+
+def _referencias_da_aba(dados, analisador):
+    """
+    Semana anterior e histórico só dos creators da aba
+    
+    Sem isso o relatório de uma sub-agência contaria creators das outras
+    abas como saídas e nos totais da semana anterior.
+    """
+    nomes = {c['nome'] for c in analisador.criadores}
+    anterior = dados['anterior']
+    historico = dados['historico']
+    
+    return {
+        'anterior': {**anterior, 'criadores': [c for c in anterior['criadores'] if c['creator_nome'] in nomes]}
+                    if anterior else anterior,
+        'historico': [h for h in historico if h['creator_nome'] in nomes] if historico is not None else None
+    }
+
+def _publicar_relatorio(analisador, output_filename, salvar=True, referencias=None):
+    """
+    Compara com a semana anterior, gera o HTML e grava no banco; retorna as URLs
+    
+    referencias: resultado de _buscar_referencias já lido (ex: uma vez para
+    todas as abas de uma pasta de trabalho); se None, é consultado aqui.
+    """
+    periodo_inicio, periodo_fim = analisador.obter_periodo_datas()
+    
+    # Comparar com a semana anterior e com o histórico de cada creator
+    if db.is_connected():
+        dados = referencias if referencias is not None else _buscar_referencias(periodo_inicio)
+        
+        if dados['historico'] is None:
+            print("⚠️ Histórico indisponível: detecção de anomalias ignorada neste relatório")
+        elif dados['historico']:
+            analisador.detectar_anomalias(dados['historico'])
+        
+        anterior = dados['anterior']
+        if anterior:
+            analisador.comparar_semana_anterior(
+                anterior['criadores'],
+                periodo_anterior=f"{anterior['periodo_inicio']} a {anterior['periodo_fim']}"
+            )
+    
+    # Gerar HTML
+    output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
+    analisador.gerar_html(output_path)
+    
+    # Salvar no banco de dados (o ouvinte invalidar_relatorios descarta as semanas reconstruídas)
+    salvo_no_banco = False
+    aviso = None
+    if salvar and db.is_connected():
+        salvo = db.salvar_relatorio(
+            periodo_inicio=periodo_inicio,
+            periodo_fim=periodo_fim,
+            dados_criadores=analisador.criadores
+        )
+        salvo_no_banco = 'erro' not in salvo or salvo.get('parcial', False)
+        if 'erro' in salvo:
+            aviso = salvo['erro'] if salvo.get('parcial') else f"Relatório não gravado no banco: {salvo['erro']}"
+            print(f"❌ {aviso}")
+        else:
+            print("✅ Dados salvos no Supabase!")
+    
+    # Snapshot colunar da semana: o relatório pode ser refeito depois que o HTML sair do disco
+    if salvar:
+        try:
+            salvar_snapshot(analisador, periodo_inicio, periodo_fim)
+            if not salvo_no_banco:
+                relatorios_reconstruidos.invalidar()  # sem gravação no banco o ouvinte não roda
+        except Exception as e:
+            print(f"⚠️ Não foi possível gravar o snapshot da semana: {e}")
+    
+    # Catálogo visto por todos os workers (tela de histórico)
+    catalogo_relatorios.definir(output_filename, {
+        'periodo_inicio': periodo_inicio,
+        'periodo_fim': periodo_fim,
+        'n_criadores': len(analisador.criadores)
+    })
+    
+    urls = {
+        'html_url': f'/relatorio/{output_filename}',
+        'pdf_url': f'/pdf/{output_filename}'
+    }
+    if aviso:
+        urls['aviso'] = aviso
+    return urls
+
+def _processar_planilha(filepath, timestamp, perfil=None, todas_abas=False):
+    """Gera e publica os relatórios de uma planilha já gravada em uploads/ (resposta JSON)"""
+    # Perfil desconhecido é erro do pedido, não do servidor
+    try:
+        obter_regras(perfil)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    # Pasta de trabalho com uma aba por sub-agência: processa todas de uma vez
+    if todas_abas and not filepath.lower().endswith('.csv'):
+        resultado = processar_pasta_trabalho(filepath, perfil=perfil)
+        
+        if resultado['status'] == 'erro':
+            return jsonify({'erro': resultado['mensagem']}), 400
+        
+        # Semana anterior e histórico lidos uma vez para todas as abas
+        referencias = None
+        if db.is_connected():
+            referencias = _buscar_referencias(resultado['consolidado'].obter_periodo_datas()[0])
+        
+        abas = []
+        for i, analisador_aba in enumerate(resultado['abas'], start=1):
+            nome_aba = secure_filename(analisador_aba.aba) or f"aba{i}"
+            abas.append({
+                'aba': analisador_aba.aba,
+                **_publicar_relatorio(
+                    analisador_aba, f"relatorio_{timestamp}_{nome_aba}.html", salvar=False,
+                    referencias=_referencias_da_aba(referencias, analisador_aba) if referencias else None
+                )
+            })
+        
+        # Só o consolidado vai para o banco (evita gravar cada creator duas vezes)
+        urls = _publicar_relatorio(resultado['consolidado'], f"relatorio_{timestamp}.html", referencias=referencias)
+        
+        return jsonify({
+            'sucesso': True,
+            **urls,
+            'abas': abas,
+            'erros_abas': resultado['erros']
+        })
+    
+    # Processar (perfil de metas opcional, ex: por agência ou tier)
+    analisador = AnalisadorRelatorio(filepath, perfil=perfil)
+    resultado = analisador.processar()
+    
+    if resultado['status'] == 'erro':
+        return jsonify({'erro': resultado['mensagem']}), 400
+    
+    return jsonify({
+        'sucesso': True,
+        **_publicar_relatorio(analisador, f"relatorio_{timestamp}.html")
+    })
+
+# ==========================================
+# RELATÓRIOS RECONSTRUÍDOS (sob demanda)
+# ==========================================
+
+def _garantir_relatorio(filename):
+    """
+    Nome do relatório pronto em outputs/, reconstruindo a semana se preciso
+    
+    Retorna None só quando a semana não existe; falhas (banco fora do ar,
+    erro ao processar) levantam ReconstrucaoIndisponivel.
+    
+    Uploads já apagados pela limpeza apontam para a semana deles (catálogo).
+    Semanas reconstruídas são refeitas no primeiro acesso depois que o
+    histórico gravado muda. A trava garante uma reconstrução por vez: os
+    outros workers esperam e usam o resultado.
+    """
+    filename = secure_filename(filename)
+    periodo = periodo_do_nome(filename)
+    
+    if periodo is None:
+        if os.path.isfile(os.path.join(app.config['OUTPUT_FOLDER'], filename)):
+            return filename
+        entrada = catalogo_relatorios.obter(filename)
+        if not entrada:
+            return None
+        periodo = (entrada['periodo_inicio'], entrada['periodo_fim'])
+        filename = nome_relatorio_periodo(*periodo)
+    
+    html_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
+    
+    def _pronto():
+        return os.path.isfile(html_path) and relatorios_reconstruidos.obter(filename) is not None
+    
+    if _pronto():
+        return filename
+    
+    try:
+        with open(os.path.join(app.config['OUTPUT_FOLDER'], f".reconstruindo_{filename}.lock"), 'w') as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            
+            # Outro worker pode ter terminado enquanto esperávamos a trava
+            if _pronto():
+                return filename
+            
+            analisador, origem = montar_analisador(*periodo, db=db)
+            if analisador is None:
+                return None
+            
+            _publicar_relatorio(analisador, filename, salvar=False)
+            relatorios_reconstruidos.definir(filename, {'origem': origem, 'gerado_em': datetime.now().isoformat()})
+            print(f"♻️ Relatório {periodo[0]} a {periodo[1]} reconstruído ({origem})")
+            return filename
+    
+    except Exception as e:
+        print(f"❌ Erro ao reconstruir relatório {filename}: {e}")
+        if isinstance(e, ReconstrucaoIndisponivel):
+            raise
+        raise ReconstrucaoIndisponivel(f"Erro ao reconstruir o relatório: {e}") from e
+
+def _semanas_gravadas():
+    """Semanas do banco e dos snapshots locais (mais recentes primeiro), com o nome do relatório"""
+    semanas = {(s, s_fim): None for s, s_fim in listar_snapshots()}
+    for p in db.listar_periodos():
+        semanas[(p['periodo_inicio'], p['periodo_fim'])] = p.get('n_criadores')
+    
+    return [{
+        'periodo_inicio': inicio,
+        'periodo_fim': fim,
+        'n_criadores': n_criadores,
+        'nome': nome_relatorio_periodo(inicio, fim),
+        'em_disco': os.path.isfile(os.path.join(app.config['OUTPUT_FOLDER'], nome_relatorio_periodo(inicio, fim)))
+    } for (inicio, fim), n_criadores in sorted(semanas.items(), key=lambda item: item[0][1], reverse=True)]
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_muito_grande(e):
+    return jsonify({'erro': f"Arquivo muito grande (máx. {MAX_UPLOAD // (1024 * 1024)}MB)"}), 413
+
+@app.errorhandler(UnsupportedMediaType)
+def upload_formato_invalido(e):
+    return jsonify({'erro': e.description}), 415
 
 @app.route('/upload', methods=['POST'])
 @login_required
@@ -152,6 +431,7 @@ def upload():
     if not current_user.is_admin():
         return jsonify({'erro': 'Acesso negado'}), 403
     
+    # Só aqui o corpo é lido: tamanho e formato são checados durante a transferência (413/415)
     if 'file' not in request.files:
         return jsonify({'erro': 'Nenhum arquivo enviado'}), 400
     
@@ -164,46 +444,82 @@ def upload():
         return jsonify({'erro': 'Formato inválido. Use XLSX, XLS ou CSV'}), 400
     
     try:
-        # Salvar arquivo
+        # Arquivo já está no disco: só renomear
         filename = secure_filename(file.filename)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename_final = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename_final)
-        file.save(filepath)
-        
-        # Processar
-        analisador = AnalisadorRelatorio(filepath)
-        resultado = analisador.processar()
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{filename}")
+        file.stream.mover_para(filepath)
+        print(f"📥 Upload recebido: {filename} ({file.stream.tamanho / 1024:.0f} KB, sha256 {file.stream.sha256[:12]})")
         
-        if resultado['status'] == 'erro':
-            return jsonify({'erro': resultado['mensagem']}), 400
-        
-        # Gerar HTML
-        output_filename = f"relatorio_{timestamp}.html"
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-        analisador.gerar_html(output_path)
+        return _processar_planilha(
+            filepath, timestamp,
+            perfil=request.form.get('perfil') or None,
+            todas_abas=bool(request.form.get('todas_abas'))
+        )
+    
+    except Exception as e:
+        print(f"Erro no upload: {e}")
+        return jsonify({'erro': str(e)}), 500
+
+# ==========================================
+# UPLOAD EM BLOCOS (RETOMÁVEL)
+# ==========================================
+
+@app.route('/upload/sessoes', methods=['POST'])
+@login_required
+def upload_criar_sessao():
+    """Abre uma sessão de upload em blocos: JSON {nome, tamanho, sha256 opcional}"""
+    if not current_user.is_admin():
+        return jsonify({'erro': 'Acesso negado'}), 403
+    
+    dados = request.get_json(silent=True) or {}
+    try:
+        return jsonify(criar_sessao(
+            app.config['UPLOAD_FOLDER'], secure_filename(dados.get('nome') or ''),
+            dados.get('tamanho'), dados.get('sha256')
+        )), 201
+    except ErroUpload as e:
+        return jsonify({'erro': str(e), **e.extras}), e.codigo
+
+@app.route('/upload/sessoes/<sessao_id>', methods=['GET', 'PUT'])
+@login_required
+def upload_bloco(sessao_id):
+    """GET: bytes já recebidos (para retomar); PUT ?inicio=N: corpo é o próximo bloco"""
+    if not current_user.is_admin():
+        return jsonify({'erro': 'Acesso negado'}), 403
+    
+    try:
+        if request.method == 'GET':
+            return jsonify(estado_sessao(app.config['UPLOAD_FOLDER'], sessao_id))
         
-        # Salvar no banco de dados
-        if db.is_connected():
-            periodo = analisador.dados_agregados.get('periodo', '')
-            if ' a ' in periodo:
-                periodo_inicio, periodo_fim = periodo.split(' a ')
-            else:
-                periodo_inicio = periodo_fim = datetime.now().strftime('%Y-%m-%d')
-            
-            db.salvar_relatorio(
-                periodo_inicio=periodo_inicio,
-                periodo_fim=periodo_fim,
-                dados_criadores=analisador.criadores
-            )
-            print("✅ Dados salvos no Supabase!")
+        inicio = request.args.get('inicio', type=int)
+        if inicio is None:
+            return jsonify({'erro': "Parâmetro 'inicio' obrigatório"}), 400
         
-        return jsonify({
-            'sucesso': True,
-            'html_url': f'/relatorio/{output_filename}',
-            'pdf_url': f'/pdf/{output_filename}'
-        })
+        return jsonify(receber_bloco(app.config['UPLOAD_FOLDER'], sessao_id, inicio, request.stream))
+    except ErroUpload as e:
+        return jsonify({'erro': str(e), **e.extras}), e.codigo
+
+@app.route('/upload/sessoes/<sessao_id>/concluir', methods=['POST'])
+@login_required
+def upload_concluir_sessao(sessao_id):
+    """Confere tamanho/hash do arquivo montado e gera o relatório (mesma resposta de /upload)"""
+    if not current_user.is_admin():
+        return jsonify({'erro': 'Acesso negado'}), 403
+    
+    try:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        arquivo = concluir_sessao(app.config['UPLOAD_FOLDER'], sessao_id, timestamp)
+    except ErroUpload as e:
+        return jsonify({'erro': str(e), **e.extras}), e.codigo
     
+    try:
+        print(f"📥 Upload em blocos concluído: {arquivo['nome']} (sha256 {arquivo['sha256'][:12]})")
+        return _processar_planilha(
+            arquivo['caminho'], timestamp,
+            perfil=request.form.get('perfil') or None,
+            todas_abas=bool(request.form.get('todas_abas'))
+        )
     except Exception as e:
         print(f"Erro no upload: {e}")
         return jsonify({'erro': str(e)}), 500
@@ -219,15 +535,152 @@ def ver_relatorio(filename):
     if not current_user.is_admin():
         return redirect(url_for('painel'))
     
-    filepath = os.path.join(app.config['OUTPUT_FOLDER'], filename)
+    try:
+        nome = _garantir_relatorio(filename) if filename.endswith('.html') else None
+    except ReconstrucaoIndisponivel as e:
+        return f"Relatório temporariamente indisponível: {e}", 503
     
-    if not os.path.exists(filepath):
+    if not nome:
         return "Relatório não encontrado", 404
+    if nome != secure_filename(filename):
+        return redirect(url_for('ver_relatorio', filename=nome))
+    
+    filepath = os.path.join(app.config['OUTPUT_FOLDER'], nome)
+    
+    # Servir a versão pré-comprimida aceita pelo navegador (se estiver atualizada).
+    # Pedidos com Range recebem o HTML original: faixas do .br/.gz não fazem sentido
+    caminho, encoding = filepath, None
+    for enc, ext in (() if request.range else (('br', '.br'), ('gzip', '.gz'))):
+        comprimido = filepath + ext
+        if request.accept_encodings[enc] and os.path.isfile(comprimido) \
+                and os.path.getmtime(comprimido) >= os.path.getmtime(filepath):
+            caminho, encoding = comprimido, enc
+            break
+    
+    # send_file com conditional/etag: ETag + Last-Modified e 304 em visitas repetidas
+    response = send_file(os.path.abspath(caminho), mimetype='text/html', conditional=True, etag=True, max_age=0)
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        html_content = f.read()
+    if encoding and response.status_code == 200:
+        response.headers['Content-Encoding'] = encoding
+        response.headers.pop('Accept-Ranges', None)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'private, no-cache'
     
-    return html_content
+    return response
+
+@app.route('/api/relatorio/<filename>/criadores')
+@login_required
+def api_criadores_relatorio(filename):
+    """Tabela completa de criadores de um relatório, paginada (apenas admins)"""
+    if not current_user.is_admin():
+        return jsonify({'erro': 'Acesso negado'}), 403
+    
+    try:
+        nome = _garantir_relatorio(filename) or secure_filename(filename)
+    except ReconstrucaoIndisponivel as e:
+        return jsonify({'erro': str(e)}), 503
+    
+    artefato = caminho_artefato(os.path.join(app.config['OUTPUT_FOLDER'], nome))
+    
+    if not os.path.isfile(artefato):
+        return jsonify({'erro': 'Tabela completa não disponível para este relatório'}), 404
+    
+    try:
+        return jsonify(consultar_criadores(
+            artefato,
+            pagina=request.args.get('pagina', 1, type=int),
+            por_pagina=request.args.get('por_pagina', 100, type=int),
+            ordenar=request.args.get('ordenar', 'diamantes'),
+            ordem=request.args.get('ordem', 'desc'),
+            status=request.args.get('status') or None,
+            busca=request.args.get('busca') or None,
+            apenas_top=request.args.get('top') == '1'
+        ))
+    except Exception as e:
+        print(f"Erro na API de criadores: {e}")
+        return jsonify({'erro': str(e)}), 500
+
+@app.route('/export/<filename>')
+@login_required
+def exportar_relatorio(filename):
+    """Exporta a análise completa de todos os criadores em CSV ou XLSX (apenas admins)"""
+    if not current_user.is_admin():
+        return jsonify({'erro': 'Acesso negado'}), 403
+    
+    try:
+        nome = _garantir_relatorio(filename) or secure_filename(filename)
+    except ReconstrucaoIndisponivel as e:
+        return f"Relatório temporariamente indisponível: {e}", 503
+    
+    artefato = caminho_artefato(os.path.join(app.config['OUTPUT_FOLDER'], nome))
+    
+    if not os.path.isfile(artefato):
+        return "Tabela completa não disponível para este relatório", 404
+    
+    formato = request.args.get('formato', 'csv')
+    nome_download = nome.replace('.html', '') + f'.{formato}'
+    
+    if formato == 'csv':
+        # Gerador: cada bloco de criadores é enviado assim que é lido do Parquet
+        response = Response(stream_with_context(gerar_csv(artefato)), mimetype='text/csv; charset=utf-8')
+        response.headers['Content-Disposition'] = f'attachment; filename="{nome_download}"'
+        return response
+    
+    if formato == 'xlsx':
+        fd, temporario = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        try:
+            escrever_xlsx(artefato, temporario)
+            # Arquivo já aberto continua legível após a remoção: nada sobra no disco
+            arquivo = open(temporario, 'rb')
+        except Exception as e:
+            print(f"Erro ao exportar XLSX: {e}")
+            return f"Erro ao exportar: {e}", 500
+        finally:
+            os.remove(temporario)
+        
+        return send_file(
+            arquivo, as_attachment=True, download_name=nome_download,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    
+    return "Formato inválido (use csv ou xlsx)", 400
+
+@app.route('/api/analytics')
+@login_required
+def api_analytics():
+    """Retenção, churn, coortes e médias móveis de todas as semanas (apenas admins)"""
+    if not current_user.is_admin():
+        return jsonify({'erro': 'Acesso negado'}), 403
+    
+    if not db.is_connected():
+        return jsonify({'erro': 'Banco de dados não conectado'}), 503
+    
+    janela = min(max(request.args.get('janela', 4, type=int), 1), 52)
+    limite = min(max(request.args.get('limite', 100, type=int), 1), 1000)
+    chave = ('analytics', janela, limite)
+    
+    try:
+        resultado = cache_analytics.obter(chave)
+        if resultado is None:
+            # Histórico lido uma vez e reaproveitado por outras janelas/limites até o próximo upload
+            historico = cache_historico.obter('historico')
+            if historico is None:
+                linhas = db.buscar_historico_completo()
+                if linhas is None:
+                    # Falha na leitura: não guardar histórico/analytics vazios nos caches
+                    return jsonify({'erro': 'Histórico indisponível no momento, tente novamente'}), 503
+                historico = historico_para_dataframe(linhas)
+                cache_historico.definir('historico', historico)
+            
+            resultado = calcular_analytics(historico, janela=janela, limite=limite)
+            resultado['gerado_em'] = datetime.now().isoformat()
+            cache_analytics.definir(chave, resultado)
+        
+        return jsonify(resultado)
+    except Exception as e:
+        print(f"Erro no analytics: {e}")
+        return jsonify({'erro': str(e)}), 500
 
 @app.route('/historico')
 @login_required
@@ -239,23 +692,28 @@ def historico():
     try:
         arquivos = []
         output_dir = app.config['OUTPUT_FOLDER']
+        nomes = [f for f in os.listdir(output_dir) if f.endswith('.html') and not f.endswith(SUFIXO_IMPRESSAO)]
         
-        for filename in os.listdir(output_dir):
-            if filename.endswith('.html'):
-                filepath = os.path.join(output_dir, filename)
-                stat = os.stat(filepath)
-                
-                arquivos.append({
-                    'nome': filename,
-                    'data_criacao': datetime.fromtimestamp(stat.st_mtime).strftime('%d/%m/%Y %H:%M'),
-                    'tamanho': f"{stat.st_size / 1024:.1f} KB",
-                    'url': f'/relatorio/{filename}'
-                })
+        # Período e creators de cada relatório, gravados por qualquer worker ao publicar
+        catalogo = catalogo_relatorios.obter_varios(nomes)
+        
+        for filename in nomes:
+            filepath = os.path.join(output_dir, filename)
+            stat = os.stat(filepath)
+            
+            arquivos.append({
+                'nome': filename,
+                'data_criacao': datetime.fromtimestamp(stat.st_mtime).strftime('%d/%m/%Y %H:%M'),
+                'tamanho': f"{stat.st_size / 1024:.1f} KB",
+                'url': f'/relatorio/{filename}',
+                'catalogo': catalogo.get(filename)
+            })
         
         # Ordenar por data (mais recente primeiro)
         arquivos.sort(key=lambda x: x['data_criacao'], reverse=True)
         
-        return render_template('historico.html', arquivos=arquivos, user=current_user)
+        return render_template('historico.html', arquivos=arquivos, semanas=_semanas_gravadas(),
+                               retencao_dias=RETENCAO_DIAS, user=current_user)
     
     except Exception as e:
         return f"Erro ao listar histórico: {e}", 500
@@ -268,21 +726,31 @@ def download_pdf(filename):
         return jsonify({'erro': 'Acesso negado'}), 403
     
     try:
-        from weasyprint import HTML
-        
-        html_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
+        nome = _garantir_relatorio(filename) if filename.endswith('.html') else None
         
-        # Verificar se arquivo HTML existe
-        if not os.path.exists(html_path):
+        # Verificar se arquivo HTML existe (ou se a semana pode ser reconstruída)
+        if not nome:
             return f"Relatório HTML não encontrado: {filename}", 404
+        if nome != secure_filename(filename):
+            return redirect(url_for('download_pdf', filename=nome))
+        
+        html_path = os.path.join(app.config['OUTPUT_FOLDER'], nome)
+        
+        # Versão de impressão (estilos planos, tabelas paginadas); relatórios antigos usam o HTML da tela
+        origem = caminho_impressao(html_path)
+        if not os.path.exists(origem):
+            origem = html_path
         
         pdf_path = html_path.replace('.html', '.pdf')
         
-        # Gerar PDF
-        HTML(html_path).write_pdf(pdf_path)
+        # PDF já gerado a partir da versão atual: só reenviar
+        if not os.path.exists(pdf_path) or os.path.getmtime(pdf_path) < os.path.getmtime(origem):
+            gerar_pdf(origem, pdf_path)
         
-        return send_file(pdf_path, as_attachment=True, download_name=filename.replace('.html', '.pdf'))
+        return send_file(os.path.abspath(pdf_path), as_attachment=True, download_name=filename.replace('.html', '.pdf'))
     
+    except ReconstrucaoIndisponivel as e:
+        return f"Relatório temporariamente indisponível: {e}", 503
     except Exception as e:
         print(f"Erro ao gerar PDF: {e}")
         return f"Erro ao gerar PDF: {e}", 500
@@ -292,8 +760,8 @@ def download_pdf(filename):
 # ==========================================
 
 def limpar_arquivos_antigos():
-    """Remove arquivos com mais de 30 dias"""
-    limite = datetime.now() - timedelta(days=30)
+    """Remove arquivos com mais de RETENCAO_DIAS dias (snapshots das semanas ficam)"""
+    limite = datetime.now() - timedelta(days=RETENCAO_DIAS)
     
     for pasta in [app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER']]:
         if not os.path.exists(pasta):
@@ -311,6 +779,7 @@ def limpar_arquivos_antigos():
 
 # Executar limpeza ao iniciar
 limpar_arquivos_antigos()
+limpar_sessoes(app.config['UPLOAD_FOLDER'])
 
 # ==========================================
 # HEALTH CHECK
@@ -322,7 +791,10 @@ def health():
     return jsonify({
         'status': 'ok',
         'timestamp': datetime.now().isoformat(),
-        'database': 'connected' if db.is_connected() else 'disconnected'
+        **db.verificar_saude(),
+        'cache_painel': cache_painel.estatisticas(),
+        'cache_analytics': cache_analytics.estatisticas(),
+        'ia': ia.estatisticas()
     })
 
 # ==========================================
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Armazenamento Compartilhado entre Workers
+Chave/valor com TTL e limite de itens em SQLite (WAL) ou Redis, visto por todos os processos
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+# Dentro da pasta da aplicação (não no /tmp, que qualquer usuário local pode preparar antes)
+PASTA_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados')
+CAMINHO_PADRAO = os.path.join(PASTA_DADOS, 'armazenamento.db')
+
+# Valores maiores que isto não são guardados (um painel tem poucos KB)
+MAX_VALOR = int(os.environ.get('ARMAZENAMENTO_MAX_VALOR', 4 * 1024 * 1024))
+
+# A cada N gravações por processo, expirados e excedentes são removidos
+_PODAR_A_CADA = 200
+
+
+def pasta_privada(pasta=PASTA_DADOS):
+    """Cria (se preciso) a pasta de dados de execução, acessível só ao usuário da aplicação"""
+    os.makedirs(pasta, mode=0o700, exist_ok=True)
+    return pasta
+
+
+def _chave(chave):
+    """Chaves podem ser tuplas (ex: ('analytics', 4, 100)): repr é estável e sem colisões"""
+    return chave if isinstance(chave, str) else repr(chave)
+
+
+def _padrao_json(valor):
+    # Escalares numpy (métricas do pandas) e datas; tuplas viram listas
+    if hasattr(valor, 'item'):
+        return valor.item()
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Valor não serializável no armazenamento: {type(valor).__name__}")
+
+
+def serializar(valor):
+    """
+    Valores guardados em JSON, nunca pickle: o arquivo/Redis é compartilhado
+    e desserializar pickle de lá permitiria executar código nos workers
+    """
+    return json.dumps(valor, default=_padrao_json, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def desserializar(dados):
+    return json.loads(dados)
+
+
+class ArmazenamentoSQLite:
+    """
+    Chave/valor em um arquivo SQLite compartilhado pelos workers da máquina
+
+    Modo WAL: leituras não bloqueiam a escrita e cada operação é uma única
+    instrução (atômica). Uma conexão por thread, recriada após o fork do
+    gunicorn. Itens são separados por espaço (ex: 'painel', 'notas_ia'),
+    cada um com seu limite de itens; acima dele, os gravados há mais tempo
+    saem primeiro.
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or os.environ.get('ARMAZENAMENTO_PATH', CAMINHO_PADRAO)
+        self._local = threading.local()
+        self._limites = {}
+        self._escritas = 0
+        self._lock = threading.Lock()
+
+    @property
+    def tipo(self):
+        return 'sqlite'
+
+    def _preparar_arquivo(self):
+        """Pasta e arquivo só do usuário da aplicação (0700/0600); WAL e shm herdam do arquivo"""
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            pasta_privada(pasta)
+        os.close(os.open(self.caminho, os.O_RDWR | os.O_CREAT, 0o600))
+
+    def _conexao(self):
+        con = getattr(self._local, 'con', None)
+        if con is None or self._local.pid != os.getpid():
+            self._preparar_arquivo()
+            con = sqlite3.connect(self.caminho, timeout=5, isolation_level=None, check_same_thread=False)
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute('PRAGMA synchronous=NORMAL')
+            con.execute('''
+                CREATE TABLE IF NOT EXISTS itens (
+                    espaco TEXT NOT NULL,
+                    chave TEXT NOT NULL,
+                    valor BLOB NOT NULL,
+                    expira_em REAL NOT NULL,
+                    gravado_em REAL NOT NULL,
+                    PRIMARY KEY (espaco, chave)
+                ) WITHOUT ROWID
+            ''')
+            con.execute('CREATE INDEX IF NOT EXISTS idx_itens_gravado ON itens (espaco, gravado_em)')
+            self._local.con = con
+            self._local.pid = os.getpid()
+        return con
+
+    def configurar(self, espaco, max_itens):
+        self._limites[espaco] = max_itens
+
+    def obter(self, espaco, chave):
+        linha = self._conexao().execute(
+            'SELECT valor FROM itens WHERE espaco = ? AND chave = ? AND expira_em > ?',
+            (espaco, _chave(chave), time.time())
+        ).fetchone()
+        return desserializar(linha[0]) if linha else None
+
+    def obter_varios(self, espaco, chaves):
+        """dict chave -> valor só das chaves presentes (uma consulta por bloco de 500)"""
+        chaves = list(chaves)
+        textos = {_chave(c): c for c in chaves}
+        resultado = {}
+        agora = time.time()
+
+        lista = list(textos)
+        for i in range(0, len(lista), 500):
+            bloco = lista[i:i + 500]
+            marcadores = ','.join('?' * len(bloco))
+            for chave, valor in self._conexao().execute(
+                f'SELECT chave, valor FROM itens WHERE espaco = ? AND expira_em > ? AND chave IN ({marcadores})',
+                (espaco, agora, *bloco)
+            ):
+                resultado[textos[chave]] = desserializar(valor)
+        return resultado
+
+    def definir(self, espaco, chave, valor, ttl):
+        dados = serializar(valor)
+        if len(dados) > MAX_VALOR:
+            return False
+
+        agora = time.time()
+        self._conexao().execute(
+            'INSERT OR REPLACE INTO itens (espaco, chave, valor, expira_em, gravado_em) VALUES (?, ?, ?, ?, ?)',
+            (espaco, _chave(chave), dados, agora + ttl, agora)
+        )
+
+        with self._lock:
+            self._escritas += 1
+            podar = self._escritas % _PODAR_A_CADA == 0
+        if podar:
+            self.podar()
+        return True
+
+    def remover(self, espaco, chaves=None):
+        """Remove as chaves informadas ou o espaço inteiro"""
+        con = self._conexao()
+        if chaves is None:
+            con.execute('DELETE FROM itens WHERE espaco = ?', (espaco,))
+        else:
+            con.executemany('DELETE FROM itens WHERE espaco = ? AND chave = ?',
+                            [(espaco, _chave(c)) for c in chaves])
+
+    def contar(self, espaco):
+        return self._conexao().execute(
+            'SELECT COUNT(*) FROM itens WHERE espaco = ? AND expira_em > ?', (espaco, time.time())
+        ).fetchone()[0]
+
+    def podar(self):
+        """Apaga itens expirados e o excedente de cada espaço (mais antigos primeiro)"""
+        con = self._conexao()
+        con.execute('DELETE FROM itens WHERE expira_em <= ?', (time.time(),))
+        for espaco, limite in self._limites.items():
+            con.execute('''
+                DELETE FROM itens WHERE espaco = ? AND chave IN (
+                    SELECT chave FROM itens WHERE espaco = ?
+                    ORDER BY gravado_em DESC LIMIT -1 OFFSET ?
+                )
+            ''', (espaco, espaco, limite))
+
+
+class ArmazenamentoRedis:
+    """
+    Mesmo contrato sobre Redis (quando REDIS_URL está configurada)
+
+    TTL nativo do Redis; o limite de tamanho fica com a política de memória
+    do servidor (maxmemory-policy allkeys-lru). Invalidar um espaço inteiro
+    incrementa a versão dele, que faz parte das chaves: O(1), sem SCAN.
+    """
+
+    def __init__(self, url):
+        import redis
+        self.url = url
+        self._redis = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+
+    @property
+    def tipo(self):
+        return 'redis'
+
+    def configurar(self, espaco, max_itens):
+        pass
+
+    def _prefixo(self, espaco):
+        versao = self._redis.get(f'olah:{espaco}:versao') or b'0'
+        return f'olah:{espaco}:{versao.decode()}:'
+
+    def obter(self, espaco, chave):
+        dados = self._redis.get(self._prefixo(espaco) + _chave(chave))
+        return desserializar(dados) if dados is not None else None
+
+    def obter_varios(self, espaco, chaves):
+        chaves = list(chaves)
+        if not chaves:
+            return {}
+        prefixo = self._prefixo(espaco)
+        valores = self._redis.mget([prefixo + _chave(c) for c in chaves])
+        return {c: desserializar(v) for c, v in zip(chaves, valores) if v is not None}
+
+    def definir(self, espaco, chave, valor, ttl):
+        dados = serializar(valor)
+        if len(dados) > MAX_VALOR:
+            return False
+        self._redis.set(self._prefixo(espaco) + _chave(chave), dados, ex=max(1, int(ttl)))
+        return True
+
+    def remover(self, espaco, chaves=None):
+        if chaves is None:
+            self._redis.incr(f'olah:{espaco}:versao')
+            return
+        chaves = list(chaves)
+        if chaves:
+            prefixo = self._prefixo(espaco)
+            self._redis.delete(*[prefixo + _chave(c) for c in chaves])
+
+    def contar(self, espaco):
+        return None
+
+    def podar(self):
+        pass
+
+
+def abrir_armazenamento():
+    """Redis se REDIS_URL estiver definida e o pacote instalado; senão SQLite local"""
+    url = os.environ.get('REDIS_URL')
+    if url:
+        try:
+            return ArmazenamentoRedis(url)
+        except ImportError:
+            print("⚠️ REDIS_URL definida mas o pacote 'redis' não está instalado; usando SQLite")
+    return ArmazenamentoSQLite()
+
+
+armazenamento = abrir_armazenamento()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Artefatos Colunares dos Relatórios
+Tabela completa de criadores gravada em Parquet ao lado de cada relatório HTML
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from anomalias import descrever
+
+# Colunas gravadas (ordem do arquivo) - tudo que a API e as exportações precisam
+COLUNAS = [
+    'nome', 'diamantes', 'horas', 'diam_hora', 'perc_bat', 'batalhas', 'dias',
+    'status', 'motivo', 'acao', 'is_top',
+    'st_diam', 'st_horas', 'st_perc_bat', 'st_bats', 'st_dias',
+    'alertas', 'atencoes', 'aba', 'var_diamantes', 'tendencia', 'nota_ia', 'percentil', 'decil', 'anomalias'
+]
+
+# Colunas de baixa cardinalidade: gravadas como category (dicionário no Parquet)
+CATEGORICAS = ['status', 'motivo', 'acao', 'st_diam', 'st_horas', 'st_perc_bat', 'st_bats', 'st_dias', 'aba', 'tendencia']
+
+COLUNAS_ORDENAVEIS = ['nome', 'diamantes', 'horas', 'diam_hora', 'perc_bat', 'batalhas', 'dias', 'status', 'var_diamantes', 'percentil']
+
+MAX_POR_PAGINA = 500
+
+
+def caminho_artefato(html_path):
+    """relatorio_X.html -> relatorio_X.criadores.parquet"""
+    base = html_path[:-5] if html_path.endswith('.html') else html_path
+    return base + '.criadores.parquet'
+
+
+def salvar_criadores(criadores, caminho):
+    """Grava a lista de criadores processados como Parquet (colunar, comprimido)"""
+    df = pd.DataFrame({
+        'nome': [c['nome'] for c in criadores],
+        'diamantes': np.array([c['diamantes'] for c in criadores], dtype=np.int64),
+        'horas': np.array([c['horas'] for c in criadores], dtype=np.float32),
+        'diam_hora': np.array([c['diam_hora'] for c in criadores], dtype=np.float32),
+        'perc_bat': np.array([c['perc_bat'] for c in criadores], dtype=np.float32),
+        'batalhas': np.array([c['batalhas'] for c in criadores], dtype=np.int32),
+        'dias': np.array([c['dias'] for c in criadores], dtype=np.int16),
+        'status': [c['classificacao']['status'] for c in criadores],
+        'motivo': [c['classificacao']['motivo'] for c in criadores],
+        'acao': [c['classificacao']['acao'] for c in criadores],
+        'is_top': np.array([c['is_top'] for c in criadores], dtype=bool),
+        'st_diam': [c['st_diam'] for c in criadores],
+        'st_horas': [c['st_horas'] for c in criadores],
+        'st_perc_bat': [c['st_perc_bat'] for c in criadores],
+        'st_bats': [c['st_bats'] for c in criadores],
+        'st_dias': [c['st_dias'] for c in criadores],
+        'alertas': [' · '.join(c.get('alertas') or []) for c in criadores],
+        'atencoes': [' · '.join(c.get('atencoes') or []) for c in criadores],
+        'aba': [c.get('aba') for c in criadores],
+        'var_diamantes': np.array([c.get('var_diamantes') for c in criadores], dtype=np.float32),
+        'tendencia': [c.get('tendencia') or '' for c in criadores],
+        'nota_ia': [c.get('nota_ia') for c in criadores],
+        'percentil': np.array([c.get('percentil') for c in criadores], dtype=np.float32),
+        'decil': np.array([c.get('decil') or 0 for c in criadores], dtype=np.int8),
+        'anomalias': [' · '.join(map(descrever, c.get('anomalias') or ())) for c in criadores]
+    }, columns=COLUNAS)
+
+    for coluna in CATEGORICAS:
+        df[coluna] = df[coluna].astype('category')
+
+    df.to_parquet(caminho, index=False, compression='zstd')
+
+
+# ==========================================
+# LEITURA COM CACHE (por processo)
+# ==========================================
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # (caminho, mtime) -> {'df': DataFrame, 'ordens': {}}
+_MAX_ARTEFATOS = 8
+
+
+def carregar_criadores(caminho):
+    """Lê o Parquet de um relatório (cache LRU invalidado pelo mtime do arquivo)"""
+    chave = (caminho, os.path.getmtime(caminho))
+
+    with _lock:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            return _cache[chave]
+
+    entrada = {'df': pd.read_parquet(caminho), 'ordens': {}}
+
+    with _lock:
+        _cache[chave] = entrada
+        while len(_cache) > _MAX_ARTEFATOS:
+            _cache.popitem(last=False)
+
+    return entrada
+
+
+def _ordem(entrada, coluna, desc):
+    """Permutação ordenada de uma coluna (calculada uma vez por artefato/coluna)"""
+    chave = (coluna, desc)
+    if chave not in entrada['ordens']:
+        serie = entrada['df'][coluna]
+        ordem = serie.astype(str).str.lower().argsort(kind='stable').to_numpy() if coluna in ('nome', 'status') \
+            else serie.to_numpy(dtype=float, na_value=np.nan).argsort(kind='stable')
+        if desc:
+            ordem = ordem[::-1]
+        entrada['ordens'][chave] = ordem
+    return entrada['ordens'][chave]
+
+
+def consultar_criadores(caminho, pagina=1, por_pagina=100, ordenar='diamantes', ordem='desc',
+                        status=None, busca=None, apenas_top=False):
+    """
+    Página da tabela completa de criadores, com ordenação e filtros
+
+    Retorna dict com total (após filtros), pagina, por_pagina e criadores.
+    """
+    entrada = carregar_criadores(caminho)
+    df = entrada['df']
+
+    if ordenar not in COLUNAS_ORDENAVEIS or ordenar not in df:  # artefatos antigos não têm todas as colunas
+        ordenar = 'diamantes'
+    pagina = max(1, int(pagina))
+    por_pagina = min(max(1, int(por_pagina)), MAX_POR_PAGINA)
+
+    indices = _ordem(entrada, ordenar, ordem != 'asc')
+
+    # Filtros aplicados como máscara sobre a permutação já ordenada
+    mascara = np.ones(len(df), dtype=bool)
+    if status:
+        mascara &= (df['status'] == status).to_numpy()
+    if busca:
+        mascara &= df['nome'].astype(str).str.contains(busca, case=False, regex=False).to_numpy()
+    if apenas_top:
+        mascara &= df['is_top'].to_numpy()
+
+    if not mascara.all():
+        indices = indices[mascara[indices]]
+
+    inicio = (pagina - 1) * por_pagina
+    fatia = df.iloc[indices[inicio:inicio + por_pagina]]
+
+    # astype(object) + where: NaN vira None e o JSON fica válido
+    registros = fatia.astype(object).where(fatia.notna(), None).to_dict('records')
+    for r in registros:
+        for campo in ('horas', 'diam_hora', 'perc_bat', 'var_diamantes', 'percentil'):
+            if r[campo] is not None:
+                r[campo] = round(float(r[campo]), 2)
+
+    return {
+        'total': int(len(indices)),
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'criadores': registros
+    }
+
+
+# ==========================================
+# EXPORTAÇÃO (CSV / XLSX em streaming)
+# ==========================================
+
+# (coluna do artefato, cabeçalho) - colunas ausentes em artefatos antigos são puladas
+COLUNAS_EXPORTACAO = [
+    ('nome', 'Creator'), ('aba', 'Aba'), ('diamantes', 'Diamantes'), ('horas', 'Horas'),
+    ('diam_hora', 'Diamantes/Hora'), ('dias', 'Dias Válidos'), ('batalhas', 'Batalhas'),
+    ('perc_bat', '% Batalhas'), ('status', 'Status'), ('motivo', 'Motivo'), ('acao', 'Ação'),
+    ('is_top', 'Top 20%'), ('percentil', 'Percentil'), ('decil', 'Decil'),
+    ('st_diam', 'Status Diamantes'), ('st_horas', 'Status Horas'), ('st_dias', 'Status Dias'),
+    ('st_bats', 'Status Batalhas'), ('st_perc_bat', 'Status % Batalhas'),
+    ('var_diamantes', 'Variação Diamantes (%)'), ('tendencia', 'Tendência'),
+    ('alertas', 'Alertas'), ('atencoes', 'Atenções'), ('anomalias', 'Anomalias'), ('nota_ia', 'Nota IA')
+]
+
+_DECIMAIS = {'horas', 'diam_hora', 'perc_bat', 'percentil', 'var_diamantes'}
+
+
+def linhas_exportacao(caminho, tamanho_bloco=5000):
+    """
+    Gera (cabeçalhos, blocos de linhas) lendo o Parquet em lotes
+
+    Lê tamanho_bloco criadores por vez direto do arquivo (sem o DataFrame
+    inteiro em memória). Retorna os cabeçalhos e um gerador de listas de
+    linhas, já com floats arredondados e vazios como None.
+    """
+    import pyarrow.parquet as pq
+
+    arquivo = pq.ParquetFile(caminho)
+    existentes = set(arquivo.schema_arrow.names)
+    colunas = [(c, titulo) for c, titulo in COLUNAS_EXPORTACAO if c in existentes]
+    nomes = [c for c, _ in colunas]
+
+    def _blocos():
+        for lote in arquivo.iter_batches(batch_size=tamanho_bloco, columns=nomes):
+            valores = []
+            for nome in nomes:
+                coluna = lote.column(nome).to_pylist()
+                if nome in _DECIMAIS:
+                    coluna = [None if v is None or v != v else round(v, 2) for v in coluna]
+                valores.append(coluna)
+            yield [list(linha) for linha in zip(*valores)]
+
+    return [titulo for _, titulo in colunas], _blocos()
+
+
+# Texto começando com estes caracteres vira fórmula no Excel/Sheets (nomes vêm das planilhas enviadas)
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _texto_seguro(valor):
+    """Prefixa com ' o texto que seria lido como fórmula (injeção de fórmulas no CSV)"""
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def gerar_csv(caminho, tamanho_bloco=5000):
+    """Gerador de pedaços de texto CSV (um por bloco de criadores)"""
+    import csv
+    import io
+
+    cabecalhos, blocos = linhas_exportacao(caminho, tamanho_bloco)
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    # BOM: Excel abre o CSV em UTF-8 (acentos e emojis corretos)
+    escritor.writerow(cabecalhos)
+    yield '\ufeff' + buffer.getvalue()
+
+    for bloco in blocos:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows([_texto_seguro(v) for v in linha] for linha in bloco)
+        yield buffer.getvalue()
+
+
+def escrever_xlsx(caminho, destino, tamanho_bloco=5000):
+    """
+    Grava a exportação em XLSX com o XlsxWriter em modo constant_memory
+
+    Cada linha é descarregada no disco assim que a próxima começa, então a
+    memória não cresce com o número de criadores.
+    """
+    import xlsxwriter
+
+    cabecalhos, blocos = linhas_exportacao(caminho, tamanho_bloco)
+
+    # Texto sempre como texto: nomes como '=HYPERLINK(...)' não viram fórmula nem link
+    opcoes = {'constant_memory': True, 'nan_inf_to_errors': True, 'strings_to_formulas': False, 'strings_to_urls': False}
+    with xlsxwriter.Workbook(destino, opcoes) as wb:
+        ws = wb.add_worksheet('Criadores')
+        negrito = wb.add_format({'bold': True, 'bg_color': '#2c3e50', 'font_color': 'white'})
+        ws.freeze_panes(1, 1)
+        ws.set_column(0, 0, 28)
+        ws.write_row(0, 0, cabecalhos, negrito)
+
+        linha_atual = 1
+        for bloco in blocos:
+            for linha in bloco:
+                ws.write_row(linha_atual, 0, linha)
+                linha_atual += 1
@@ -5,6 +5,13 @@ Módulo de Autenticação
 Flask-Login + Supabase
 """
 
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+
+import bcrypt
 from flask_login import UserMixin
 
 class User(UserMixin):
@@ -61,3 +68,145 @@ class User(UserMixin):
             return [self.email.split('@')[0]]
         
         return []
+
+
+# ==========================================
+# VERIFICAÇÃO DE SENHAS (POOL LIMITADO)
+# ==========================================
+
+class ServidorOcupado(Exception):
+    """Fila de verificação de senhas cheia - pedir para tentar de novo"""
+
+
+class VerificadorSenhas:
+    """
+    Executa bcrypt em um pool de threads de tamanho fixo
+
+    bcrypt libera o GIL, então o pool limita quantos núcleos o login pode
+    ocupar; pedidos além de max_workers + max_fila são recusados na hora
+    em vez de segurar as threads do gunicorn.
+    """
+
+    def __init__(self, max_workers=2, max_fila=8, rounds=12, timeout=10):
+        self.max_workers = max_workers
+        self.rounds = rounds
+        self.timeout = timeout
+        self._vagas = threading.BoundedSemaphore(max_workers + max_fila)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Recriado por processo: um executor herdado via fork não funciona
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bcrypt')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _executar(self, funcao, *args):
+        if not self._vagas.acquire(blocking=False):
+            raise ServidorOcupado()
+        try:
+            futuro = self._pool().submit(funcao, *args)
+        except Exception:
+            self._vagas.release()
+            raise
+
+        # A vaga só volta quando o bcrypt termina (ou sai da fila): após um timeout
+        # o trabalho continua ocupando o pool e deve continuar contando no limite
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        try:
+            return futuro.result(timeout=self.timeout)
+        except FuturoTimeout:
+            futuro.cancel()
+            raise ServidorOcupado()
+
+    def verificar(self, senha, senha_hash):
+        """Verifica a senha no pool; levanta ServidorOcupado se a fila estiver cheia"""
+        try:
+            return self._executar(bcrypt.checkpw, senha.encode('utf-8'), senha_hash.encode('utf-8'))
+        except ServidorOcupado:
+            raise
+        except Exception:
+            return False
+
+    def gerar_hash(self, senha):
+        """Gera hash com o custo configurado (BCRYPT_ROUNDS)"""
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._executar(bcrypt.hashpw, senha.encode('utf-8'), salt).decode('utf-8')
+
+    def precisa_rehash(self, senha_hash):
+        """True se o hash foi gerado com custo diferente do configurado ($2b$12$...)"""
+        try:
+            return int(senha_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+
+# ==========================================
+# LIMITE DE TENTATIVAS DE LOGIN
+# ==========================================
+
+class LimitadorTentativas:
+    """
+    Janela deslizante de falhas de login por chave (IP ou email)
+
+    Em memória por processo: cada worker do gunicorn conta as suas falhas.
+    """
+
+    def __init__(self, max_falhas, janela_segundos):
+        self.max_falhas = max_falhas
+        self.janela = janela_segundos
+        self._falhas = {}
+        self._lock = threading.Lock()
+        self._ultima_limpeza = time.monotonic()
+
+    def _descartar_antigas(self, fila, agora):
+        while fila and fila[0] <= agora - self.janela:
+            fila.popleft()
+
+    def tempo_bloqueio(self, chave):
+        """Segundos até a chave poder tentar de novo (0 = liberada)"""
+        agora = time.monotonic()
+        with self._lock:
+            fila = self._falhas.get(chave)
+            if not fila:
+                return 0
+            self._descartar_antigas(fila, agora)
+            if len(fila) < self.max_falhas:
+                return 0
+            return int(fila[0] + self.janela - agora) + 1
+
+    def registrar_falha(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            fila = self._falhas.setdefault(chave, deque())
+            self._descartar_antigas(fila, agora)
+            fila.append(agora)
+
+            # Limpeza periódica de chaves inativas (evita crescer sem limite)
+            if agora - self._ultima_limpeza > self.janela:
+                for k in [k for k, f in self._falhas.items() if not f or f[-1] <= agora - self.janela]:
+                    del self._falhas[k]
+                self._ultima_limpeza = agora
+
+    def limpar(self, chave):
+        with self._lock:
+            self._falhas.pop(chave, None)
+
+
+# Instâncias globais (configuráveis por variáveis de ambiente)
+verificador_senhas = VerificadorSenhas(
+    max_workers=int(os.environ.get('BCRYPT_WORKERS', 2)),
+    max_fila=int(os.environ.get('BCRYPT_FILA', 8)),
+    rounds=int(os.environ.get('BCRYPT_ROUNDS', 12))
+)
+limite_login_ip = LimitadorTentativas(
+    max_falhas=int(os.environ.get('LOGIN_MAX_FALHAS_IP', 20)),
+    janela_segundos=int(os.environ.get('LOGIN_JANELA_IP', 600))
+)
+limite_login_email = LimitadorTentativas(
+    max_falhas=int(os.environ.get('LOGIN_MAX_FALHAS_EMAIL', 5)),
+    janela_segundos=int(os.environ.get('LOGIN_JANELA_EMAIL', 900))
+)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de Painéis
+Cache compartilhado entre workers (e em memória por processo) com TTL,
+invalidação por evento e contadores de acerto
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from armazenamento import armazenamento as armazenamento_padrao
+
+
+class CacheMemoria:
+    """
+    Cache LRU em memória (por processo) com TTL
+
+    A invalidação é local (por chave) e também entre processos: invalidar()
+    atualiza um arquivo marcador, e os outros workers descartam tudo quando
+    percebem que o marcador mudou (um os.stat por leitura).
+    """
+
+    def __init__(self, nome, ttl=86400, max_itens=5000, marcador=None):
+        self.nome = nome
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.marcador = marcador or os.path.join(tempfile.gettempdir(), f"olah_cache_{nome}.versao")
+        self._itens = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self._versao = self._versao_marcador()
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    def _versao_marcador(self):
+        try:
+            return os.stat(self.marcador).st_mtime_ns
+        except OSError:
+            return None
+
+    def _sincronizar(self):
+        """Descarta tudo se outro processo sinalizou invalidação"""
+        versao = self._versao_marcador()
+        if versao != self._versao:
+            self._itens.clear()
+            self._versao = versao
+
+    def obter(self, chave):
+        """Retorna o valor em cache ou None"""
+        with self._lock:
+            self._sincronizar()
+            item = self._itens.get(chave)
+
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._itens[chave]
+                self.falhas += 1
+                return None
+
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def definir(self, chave, valor):
+        with self._lock:
+            self._sincronizar()
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chaves=None):
+        """
+        Invalida as chaves informadas (ou tudo) e avisa os outros processos
+
+        Chamado quando um novo relatório é salvo no banco.
+        """
+        with self._lock:
+            if chaves is None:
+                self._itens.clear()
+            else:
+                for chave in chaves:
+                    self._itens.pop(chave, None)
+            self.invalidacoes += 1
+
+            # Atualizar o marcador invalida o cache dos demais workers
+            try:
+                with open(self.marcador, 'a'):
+                    pass
+                os.utime(self.marcador)
+            except OSError as e:
+                print(f"⚠️ Não foi possível sinalizar invalidação do cache '{self.nome}': {e}")
+            self._versao = self._versao_marcador()
+
+    def estatisticas(self):
+        """Contadores de acerto deste processo"""
+        total = self.acertos + self.falhas
+        return {
+            'itens': len(self._itens),
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': round(self.acertos / total * 100, 1) if total else None,
+            'invalidacoes': self.invalidacoes,
+            'pid': os.getpid()
+        }
+
+
+class CacheCompartilhado:
+    """
+    Cache no armazenamento compartilhado (SQLite WAL ou Redis)
+
+    Mesma interface do CacheMemoria, mas um valor gravado por um worker
+    serve para todos: o painel calculado no worker 1 é um acerto no
+    worker 2. Falha no armazenamento vira falta de cache, nunca erro na página.
+    """
+
+    def __init__(self, nome, ttl=86400, max_itens=5000, armazenamento=None):
+        self.nome = nome
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.armazenamento = armazenamento or armazenamento_padrao
+        self.armazenamento.configurar(nome, max_itens)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    def _contar(self, acerto):
+        with self._lock:
+            if acerto:
+                self.acertos += 1
+            else:
+                self.falhas += 1
+
+    def obter(self, chave):
+        """Retorna o valor em cache ou None"""
+        try:
+            valor = self.armazenamento.obter(self.nome, chave)
+        except Exception as e:
+            print(f"⚠️ Cache '{self.nome}' indisponível: {e}")
+            valor = None
+        self._contar(valor is not None)
+        return valor
+
+    def obter_varios(self, chaves):
+        """dict chave -> valor das chaves em cache (uma consulta)"""
+        chaves = list(chaves)
+        try:
+            valores = self.armazenamento.obter_varios(self.nome, chaves)
+        except Exception as e:
+            print(f"⚠️ Cache '{self.nome}' indisponível: {e}")
+            valores = {}
+        with self._lock:
+            self.acertos += len(valores)
+            self.falhas += len(chaves) - len(valores)
+        return valores
+
+    def definir(self, chave, valor):
+        try:
+            self.armazenamento.definir(self.nome, chave, valor, self.ttl)
+        except Exception as e:
+            print(f"⚠️ Não foi possível gravar no cache '{self.nome}': {e}")
+
+    def invalidar(self, chaves=None):
+        """Invalida as chaves informadas (ou tudo) para todos os workers"""
+        try:
+            self.armazenamento.remover(self.nome, None if chaves is None else list(chaves))
+        except Exception as e:
+            print(f"⚠️ Não foi possível invalidar o cache '{self.nome}': {e}")
+        with self._lock:
+            self.invalidacoes += 1
+
+    def estatisticas(self):
+        """Itens no armazenamento (todos os workers) e contadores deste processo"""
+        try:
+            itens = self.armazenamento.contar(self.nome)
+        except Exception:
+            itens = None
+        total = self.acertos + self.falhas
+        return {
+            'itens': itens,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': round(self.acertos / total * 100, 1) if total else None,
+            'invalidacoes': self.invalidacoes,
+            'armazenamento': self.armazenamento.tipo,
+            'pid': os.getpid()
+        }
+
+
+# Cache dos painéis de creators: stats, histórico e séries do gráfico
+cache_painel = CacheCompartilhado(
+    'painel',
+    ttl=int(os.environ.get('CACHE_PAINEL_TTL', 86400)),
+    max_itens=int(os.environ.get('CACHE_PAINEL_MAX_ITENS', 5000))
+)
+
+# Analytics da agência (resultados por janela/limite): descartado a cada novo upload
+cache_analytics = CacheCompartilhado(
+    'analytics',
+    ttl=int(os.environ.get('CACHE_ANALYTICS_TTL', 86400)),
+    max_itens=32
+)
+
+# Histórico completo em DataFrame (grande demais para serializar a cada acesso): fica em cada processo
+cache_historico = CacheMemoria(
+    'historico',
+    ttl=int(os.environ.get('CACHE_ANALYTICS_TTL', 86400)),
+    max_itens=1
+)
+
+# Catálogo dos relatórios gerados (período e quantidade de creators de cada HTML)
+catalogo_relatorios = CacheCompartilhado('catalogo', ttl=30 * 86400, max_itens=10000)
+
+# Relatórios reconstruídos do histórico gravado: sem a entrada, o HTML em disco está desatualizado
+relatorios_reconstruidos = CacheCompartilhado('reconstruidos', ttl=30 * 86400, max_itens=1000)
+
+
+def invalidar_relatorios(nomes=None):
+    """
+    Novo relatório ou reclassificação gravados no banco: descarta painéis
+    (dos creators informados ou de todos), analytics, histórico e semanas
+    reconstruídas
+    """
+    cache_painel.invalidar(nomes)
+    cache_analytics.invalidar()
+    cache_historico.invalidar()
+    # Semanas reconstruídas comparam com a anterior e o histórico: refeitas no próximo acesso
+    relatorios_reconstruidos.invalidar()
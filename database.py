@@ -6,33 +6,230 @@ Gerencia usuários e histórico de relatórios
 """
 
 import os
-from supabase import create_client, Client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from supabase import create_client, Client, ClientOptions
 from datetime import datetime
-import bcrypt
+from auth import verificador_senhas, ServidorOcupado
+
+
+class BancoIndisponivel(Exception):
+    """Supabase degradado: circuito aberto, chamada recusada sem ir à rede"""
+
+
+class DisjuntorCircuito:
+    """
+    Circuit breaker simples para o Supabase
+    
+    Após limite_falhas falhas de rede seguidas o circuito abre e as chamadas
+    falham na hora por tempo_aberto segundos; depois uma chamada de teste
+    (meio-aberto) decide se fecha de novo.
+    """
+    
+    def __init__(self, limite_falhas=5, tempo_aberto=30):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.falhas = 0
+        self.aberto_desde = None
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+    
+    @property
+    def estado(self):
+        if self.aberto_desde is None:
+            return 'fechado'
+        if time.monotonic() - self.aberto_desde >= self.tempo_aberto:
+            return 'meio_aberto'
+        return 'aberto'
+    
+    def permitir(self):
+        with self._lock:
+            estado = self.estado
+            if estado == 'fechado':
+                return True
+            if estado == 'meio_aberto' and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            return False
+    
+    def registrar_sucesso(self):
+        with self._lock:
+            self.falhas = 0
+            self.aberto_desde = None
+            self._teste_em_andamento = False
+    
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas += 1
+            if self._teste_em_andamento or self.falhas >= self.limite_falhas:
+                if self.aberto_desde is None or self._teste_em_andamento:
+                    print(f"⚠️ Supabase degradado: circuito aberto por {self.tempo_aberto}s")
+                self.aberto_desde = time.monotonic()
+            self._teste_em_andamento = False
+
 
 class Database:
     """Gerenciador de banco de dados Supabase"""
     
     def __init__(self):
-        """Inicializa conexão com Supabase"""
-        url = os.environ.get("SUPABASE_URL")
-        key = os.environ.get("SUPABASE_KEY")
+        """Lê a configuração; o cliente é criado sob demanda em cada processo"""
+        self.url = os.environ.get("SUPABASE_URL")
+        self.key = os.environ.get("SUPABASE_KEY")
         
-        if not url or not key:
+        # Timeouts do PostgREST (segundos)
+        self.timeout = httpx.Timeout(
+            float(os.environ.get('SUPABASE_READ_TIMEOUT', 10)),
+            connect=float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', 3))
+        )
+        self.disjuntor = DisjuntorCircuito(
+            limite_falhas=int(os.environ.get('SUPABASE_CIRCUITO_FALHAS', 5)),
+            tempo_aberto=int(os.environ.get('SUPABASE_CIRCUITO_SEGUNDOS', 30))
+        )
+        
+        self._cliente = None
+        self._cliente_pid = None
+        self._ouvintes_salvamento = []
+        self._cliente_lock = threading.Lock()
+        
+        if not self.url or not self.key:
             print("⚠️ Credenciais Supabase não configuradas!")
-            self.supabase = None
-        else:
+    
+    @property
+    def supabase(self):
+        """
+        Cliente Supabase do processo atual
+        
+        Criado na primeira utilização e recriado se o PID mudar, então cada
+        worker do gunicorn tem seu próprio pool HTTP (keep-alive) mesmo com
+        --preload. As threads do worker compartilham o mesmo cliente.
+        """
+        if not self.url or not self.key:
+            return None
+        
+        if self._cliente_pid != os.getpid():
+            with self._cliente_lock:
+                if self._cliente_pid != os.getpid():
+                    try:
+                        self._cliente: Client = create_client(
+                            self.url, self.key,
+                            options=ClientOptions(postgrest_client_timeout=self.timeout)
+                        )
+                        print(f"✅ Conectado ao Supabase! (pid {os.getpid()})")
+                    except Exception as e:
+                        print(f"❌ Erro ao conectar no Supabase: {e}")
+                        self._cliente = None
+                    self._cliente_pid = os.getpid()
+        
+        return self._cliente
+    
+    def ao_salvar_relatorio(self, callback):
+        """Registra callback(nomes_creators) chamado após gravar relatórios"""
+        self._ouvintes_salvamento.append(callback)
+    
+    def _notificar_salvamento(self, registros):
+        nomes = {r['creator_nome'] for r in registros}
+        for callback in self._ouvintes_salvamento:
             try:
-                self.supabase: Client = create_client(url, key)
-                print("✅ Conectado ao Supabase!")
+                callback(nomes)
             except Exception as e:
-                print(f"❌ Erro ao conectar no Supabase: {e}")
-                self.supabase = None
+                print(f"Erro ao notificar salvamento de relatório: {e}")
     
     def is_connected(self):
         """Verifica se está conectado"""
         return self.supabase is not None
     
+    def _executar(self, consulta):
+        """
+        Executa uma consulta PostgREST passando pelo circuit breaker
+        
+        Só erros de rede/timeout contam como falha; erros de validação do
+        PostgREST significam que o banco respondeu.
+        """
+        if not self.disjuntor.permitir():
+            raise BancoIndisponivel('Supabase indisponível no momento (circuito aberto)')
+        
+        try:
+            resultado = consulta.execute()
+        except httpx.TransportError:
+            self.disjuntor.registrar_falha()
+            raise
+        except Exception:
+            # O banco respondeu (APIError, status HTTP, resposta inválida): libera a chamada de teste
+            self.disjuntor.registrar_sucesso()
+            raise
+        
+        self.disjuntor.registrar_sucesso()
+        return resultado
+    
+    def verificar_saude(self):
+        """Mede a latência real de uma consulta mínima ao Supabase"""
+        if not self.is_connected():
+            return {'database': 'disconnected', 'circuito': self.disjuntor.estado}
+        
+        inicio = time.perf_counter()
+        try:
+            self._executar(self.supabase.table('usuarios').select('id').limit(1))
+            status = 'connected'
+        except BancoIndisponivel:
+            status = 'degraded'
+        except Exception as e:
+            print(f"Erro no health check do banco: {e}")
+            status = 'error'
+        
+        return {
+            'database': status,
+            'database_latencia_ms': round((time.perf_counter() - inicio) * 1000, 1),
+            'circuito': self.disjuntor.estado
+        }
+    
+    # ==========================================
+    # CONSULTAS EM PARALELO
+    # ==========================================
+    
+    _executor = None
+    _executor_pid = None
+    _executor_lock = threading.Lock()
+    
+    def _pool(self):
+        """Pool de threads compartilhado (recriado após fork do gunicorn)"""
+        with Database._executor_lock:
+            if Database._executor is None or Database._executor_pid != os.getpid():
+                Database._executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get('DB_MAX_CONCORRENCIA', 8)),
+                    thread_name_prefix='supabase'
+                )
+                Database._executor_pid = os.getpid()
+            return Database._executor
+    
+    def em_paralelo(self, **consultas):
+        """
+        Executa consultas independentes ao mesmo tempo
+        
+        consultas: nome=funcao ou nome=(funcao, arg1, arg2, ...)
+        Retorna dict nome -> resultado; a latência total é a da consulta
+        mais lenta, não a soma. O cliente Supabase (e suas conexões HTTP)
+        é compartilhado entre as threads.
+        
+        Ex: db.em_paralelo(stats=(db.estatisticas_creator, nome),
+                           historico=(db.buscar_historico_creator, nome, 10))
+        """
+        futuros = {}
+        for nome, consulta in consultas.items():
+            funcao, *args = consulta if isinstance(consulta, tuple) else (consulta,)
+            futuros[nome] = self._pool().submit(funcao, *args)
+        
+        resultados = {}
+        for nome, futuro in futuros.items():
+            try:
+                resultados[nome] = futuro.result()
+            except Exception as e:
+                print(f"Erro na consulta paralela '{nome}': {e}")
+                resultados[nome] = None
+        
+        return resultados
+    
     # ==========================================
     # USUÁRIOS
     # ==========================================
@@ -51,7 +248,7 @@ class Database:
         
         try:
             # Hashear senha
-            senha_hash = bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            senha_hash = verificador_senhas.gerar_hash(senha)
             
             dados = {
                 'email': email,
@@ -62,7 +259,7 @@ class Database:
                 'criado_em': datetime.now().isoformat()
             }
             
-            result = self.supabase.table('usuarios').insert(dados).execute()
+            result = self._executar(self.supabase.table('usuarios').insert(dados))
             return {'sucesso': True, 'usuario': result.data[0]}
         
         except Exception as e:
@@ -74,17 +271,25 @@ class Database:
             return None
         
         try:
-            result = self.supabase.table('usuarios').select('*').eq('email', email).execute()
+            result = self._executar(self.supabase.table('usuarios').select('*').eq('email', email))
             return result.data[0] if result.data else None
         except:
             return None
     
-    def verificar_senha(self, senha, senha_hash):
-        """Verifica se senha está correta"""
+    def buscar_usuario_por_id(self, usuario_id):
+        """Busca usuário por ID (usado pelo Flask-Login a cada requisição)"""
+        if not self.is_connected():
+            return None
+        
         try:
-            return bcrypt.checkpw(senha.encode('utf-8'), senha_hash.encode('utf-8'))
+            result = self._executar(self.supabase.table('usuarios').select('*').eq('id', int(usuario_id)))
+            return result.data[0] if result.data else None
         except:
-            return False
+            return None
+    
+    def verificar_senha(self, senha, senha_hash):
+        """Verifica se senha está correta (bcrypt no pool limitado)"""
+        return verificador_senhas.verificar(senha, senha_hash)
     
     def autenticar(self, email, senha):
         """Autentica usuário"""
@@ -93,18 +298,72 @@ class Database:
         if not usuario:
             return {'sucesso': False, 'erro': 'Usuário não encontrado'}
         
-        if not self.verificar_senha(senha, usuario['senha_hash']):
+        try:
+            senha_ok = self.verificar_senha(senha, usuario['senha_hash'])
+        except ServidorOcupado:
+            return {'sucesso': False, 'ocupado': True, 'erro': 'Muitos acessos no momento. Tente novamente em instantes.'}
+        
+        if not senha_ok:
             return {'sucesso': False, 'erro': 'Senha incorreta'}
         
+        # Custo do bcrypt mudou (BCRYPT_ROUNDS): regravar o hash com a senha em mãos
+        if verificador_senhas.precisa_rehash(usuario['senha_hash']):
+            self.atualizar_hash_senha(usuario['id'], senha)
+        
         # Remover senha do retorno
         del usuario['senha_hash']
         
         return {'sucesso': True, 'usuario': usuario}
     
+    def atualizar_hash_senha(self, usuario_id, senha):
+        """Regrava o hash da senha com o custo atual"""
+        try:
+            novo_hash = verificador_senhas.gerar_hash(senha)
+            self._executar(self.supabase.table('usuarios').update({'senha_hash': novo_hash}).eq('id', usuario_id))
+        except Exception as e:
+            # Falha no rehash não impede o login; tenta de novo no próximo acesso
+            print(f"Erro ao atualizar hash de senha: {e}")
+    
     # ==========================================
     # RELATÓRIOS
     # ==========================================
     
+    def _montar_registros(self, periodo_inicio, periodo_fim, dados_criadores):
+        """Converte criadores processados em linhas da tabela 'relatorios'"""
+        data_criacao = datetime.now().isoformat()
+        
+        return [{
+            'periodo_inicio': periodo_inicio,
+            'periodo_fim': periodo_fim,
+            'creator_nome': criador['nome'],
+            'diamantes': criador['diamantes'],
+            'horas': criador['horas'],
+            'batalhas': criador['batalhas'],
+            'dias_validos': criador['dias'],
+            'perc_batalhas': criador['perc_bat'],
+            'diamantes_por_hora': criador['diam_hora'],
+            'status': criador['classificacao']['status'],
+            'motivo': criador['classificacao']['motivo'],
+            'is_top': criador['is_top'],
+            'nota_ia': criador.get('nota_ia'),
+            'data_criacao': data_criacao
+        } for criador in dados_criadores]
+    
+    def _resultado_gravacao(self, registros, snapshots):
+        """
+        Resposta de salvar_relatorio(s): 'relatorios' já gravado, snapshots podem ter falhado
+        
+        Gravação parcial volta como erro com parcial=True: painéis e leituras
+        de snapshots_semanais ficariam diferentes de 'relatorios' até um reenvio.
+        """
+        if 'erro' in snapshots:
+            return {
+                'erro': f"Relatório gravado, mas o snapshot semanal falhou: {snapshots['erro']}",
+                'parcial': True,
+                'total': len(registros)
+            }
+        return {'sucesso': True, 'total': len(registros)}
+    
     def salvar_relatorio(self, periodo_inicio, periodo_fim, dados_criadores):
         """
         Salva dados do relatório no banco
@@ -116,64 +375,257 @@ class Database:
             return {'erro': 'Banco não conectado'}
         
         try:
-            registros = []
-            
-            for criador in dados_criadores:
-                registros.append({
-                    'periodo_inicio': periodo_inicio,
-                    'periodo_fim': periodo_fim,
-                    'creator_nome': criador['nome'],
-                    'diamantes': criador['diamantes'],
-                    'horas': criador['horas'],
-                    'batalhas': criador['batalhas'],
-                    'dias_validos': criador['dias'],
-                    'perc_batalhas': criador['perc_bat'],
-                    'diamantes_por_hora': criador['diam_hora'],
-                    'status': criador['classificacao']['status'],
-                    'motivo': criador['classificacao']['motivo'],
-                    'is_top': criador['is_top'],
-                    'data_criacao': datetime.now().isoformat()
-                })
+            registros = self._montar_registros(periodo_inicio, periodo_fim, dados_criadores)
             
             # Inserir em lote
-            result = self.supabase.table('relatorios').insert(registros).execute()
-            return {'sucesso': True, 'total': len(registros)}
+            result = self._executar(self.supabase.table('relatorios').insert(registros))
+            
+            # Atualizar snapshot semanal (usado pelos gráficos do painel)
+            snapshots = self.salvar_snapshots_semanais(registros)
+            self._notificar_salvamento(registros)
+            
+            return self._resultado_gravacao(registros, snapshots)
+        
+        except Exception as e:
+            return {'erro': str(e)}
+    
+    def salvar_relatorios_lote(self, relatorios, tamanho_lote=1000):
+        """
+        Salva vários relatórios de uma vez (reprocessamento em lote)
+        
+        relatorios: lista de dicts com periodo_inicio, periodo_fim e criadores.
+        Reprocessar não duplica o histórico: cada creator/semana do lote
+        substitui as próprias linhas em 'relatorios' (creators de outras
+        planilhas da mesma semana, ex: outras sub-agências, ficam intactos).
+        Planilhas da mesma semana se somam; creator repetido fica com a última.
+        Os registros são enviados em blocos de tamanho_lote.
+        """
+        if not self.is_connected():
+            return {'erro': 'Banco não conectado'}
+        
+        try:
+            por_creator = {}
+            for rel in relatorios:
+                for r in self._montar_registros(rel['periodo_inicio'], rel['periodo_fim'], rel['criadores']):
+                    por_creator[(r['creator_nome'], r['periodo_inicio'], r['periodo_fim'])] = r
+            registros = list(por_creator.values())
+            
+            for i in range(0, len(registros), tamanho_lote):
+                self._substituir_relatorios(registros[i:i + tamanho_lote])
+            
+            snapshots = self.salvar_snapshots_semanais(registros, tamanho_lote=tamanho_lote)
+            self._notificar_salvamento(registros)
+            
+            return self._resultado_gravacao(registros, snapshots)
+        
+        except Exception as e:
+            return {'erro': str(e)}
+    
+    def _substituir_relatorios(self, bloco, nomes_por_consulta=200):
+        """
+        Troca as linhas de 'relatorios' dos creators/semanas do bloco pelas novas
         
+        Usa a função SQL substituir_relatorios (DELETE + INSERT na mesma
+        transação, ver supabase_schema.sql). Sem a função no banco, insere
+        primeiro e só então apaga as linhas antigas desses creators: uma falha
+        no meio deixa duplicatas, nunca uma semana sem dados.
+        """
+        try:
+            self._executar(self.supabase.rpc('substituir_relatorios', {'linhas': bloco}))
+            return
+        except (BancoIndisponivel, httpx.TransportError):
+            raise
         except Exception as e:
+            print(f"⚠️ Função substituir_relatorios indisponível ({e}); inserindo e depois apagando as antigas")
+        
+        self._executar(self.supabase.table('relatorios').insert(bloco))
+        
+        grupos = {}
+        for r in bloco:
+            grupos.setdefault((r['periodo_inicio'], r['periodo_fim'], r['data_criacao']), []).append(r['creator_nome'])
+        
+        for (periodo_inicio, periodo_fim, data_criacao), nomes in grupos.items():
+            for i in range(0, len(nomes), nomes_por_consulta):
+                self._executar(self.supabase.table('relatorios')
+                    .delete()
+                    .eq('periodo_inicio', periodo_inicio)
+                    .eq('periodo_fim', periodo_fim)
+                    .lt('data_criacao', data_criacao)
+                    .in_('creator_nome', nomes[i:i + nomes_por_consulta])
+                )
+    
+    def salvar_snapshots_semanais(self, registros, tamanho_lote=1000):
+        """
+        Materializa um snapshot por creator/semana em 'snapshots_semanais'
+        
+        Reenvios da mesma semana sobrescrevem a linha existente (upsert em
+        creator_nome + periodo_fim), então o gráfico nunca vê duplicatas.
+        """
+        if not self.is_connected():
+            return {'erro': 'Banco não conectado'}
+        
+        try:
+            snapshots = {}
+            
+            for r in registros:
+                # Última ocorrência vence (mesmo creator repetido na planilha)
+                snapshots[(r['creator_nome'], r['periodo_fim'])] = {
+                    'creator_nome': r['creator_nome'],
+                    'periodo_inicio': r['periodo_inicio'],
+                    'periodo_fim': r['periodo_fim'],
+                    'diamantes': r['diamantes'],
+                    'horas': r['horas'],
+                    'batalhas': r['batalhas'],
+                    'dias_validos': r['dias_validos'],
+                    'perc_batalhas': r['perc_batalhas'],
+                    'diamantes_por_hora': r['diamantes_por_hora'],
+                    'status': r['status'],
+                    'motivo': r['motivo'],
+                    'is_top': r['is_top'],
+                    'atualizado_em': r['data_criacao']
+                }
+            
+            linhas = list(snapshots.values())
+            for i in range(0, len(linhas), tamanho_lote):
+                self._executar(
+                    self.supabase.table('snapshots_semanais')
+                    .upsert(linhas[i:i + tamanho_lote], on_conflict='creator_nome,periodo_fim')
+                )
+            
+            return {'sucesso': True, 'total': len(snapshots)}
+        
+        except Exception as e:
+            print(f"Erro ao salvar snapshots semanais: {e}")
             return {'erro': str(e)}
     
+    # ==========================================
+    # RECLASSIFICAÇÃO
+    # ==========================================
+    
+    COLUNAS_CLASSIFICACAO = 'id, diamantes, horas, batalhas, dias_validos, perc_batalhas, is_top, status, motivo'
+    
+    def buscar_pagina_metricas(self, tabela, apos_id=0, tamanho_pagina=1000):
+        """
+        Próxima página de métricas brutas de 'relatorios' ou 'snapshots_semanais'
+        
+        Paginação por id (keyset): cada página é uma leitura no índice da
+        chave primária, sem o custo crescente de offsets grandes.
+        """
+        result = self._executar(self.supabase.table(tabela)
+            .select(self.COLUNAS_CLASSIFICACAO)
+            .gt('id', apos_id)
+            .order('id')
+            .limit(tamanho_pagina)
+        )
+        return result.data
+    
+    def atualizar_classificacoes(self, tabela, mudancas, tamanho_lote=1000):
+        """
+        Grava status/motivo novos de várias linhas (lista de dicts id/status/motivo)
+        
+        Usa a função SQL atualizar_classificacoes (um UPDATE por bloco, ver
+        supabase_schema.sql). Sem a função no banco, agrupa as linhas por
+        (status, motivo) e faz um update ... in (ids) por grupo. Em caso de
+        erro, 'gravadas' diz quantas linhas dos blocos anteriores já foram gravadas.
+        """
+        if not self.is_connected():
+            return {'erro': 'Banco não conectado', 'gravadas': 0}
+        
+        gravadas = 0
+        try:
+            for i in range(0, len(mudancas), tamanho_lote):
+                bloco = mudancas[i:i + tamanho_lote]
+                try:
+                    self._executar(self.supabase.rpc('atualizar_classificacoes', {'tabela': tabela, 'linhas': bloco}))
+                except (BancoIndisponivel, httpx.TransportError):
+                    raise
+                except Exception as e:
+                    print(f"⚠️ Função atualizar_classificacoes indisponível ({e}); atualizando por grupo")
+                    self._atualizar_por_grupo(tabela, bloco)
+                gravadas += len(bloco)
+            
+            return {'sucesso': True, 'total': len(mudancas)}
+        
+        except Exception as e:
+            return {'erro': str(e), 'gravadas': gravadas}
+    
+    def _atualizar_por_grupo(self, tabela, mudancas, ids_por_consulta=200):
+        grupos = {}
+        for m in mudancas:
+            grupos.setdefault((m['status'], m['motivo']), []).append(m['id'])
+        
+        for (status, motivo), ids in grupos.items():
+            # Limite de ids por consulta mantém a URL do PostgREST curta
+            for i in range(0, len(ids), ids_por_consulta):
+                self._executar(self.supabase.table(tabela)
+                    .update({'status': status, 'motivo': motivo})
+                    .in_('id', ids[i:i + ids_por_consulta])
+                )
+    
     def buscar_historico_creator(self, creator_nome, limite=10):
         """Busca histórico de um creator específico"""
         if not self.is_connected():
             return []
         
         try:
-            result = self.supabase.table('relatorios')\
-                .select('*')\
-                .eq('creator_nome', creator_nome)\
-                .order('data_criacao', desc=True)\
-                .limit(limite)\
-                .execute()
+            result = self._executar(self.supabase.table('relatorios')
+                .select('*')
+                .eq('creator_nome', creator_nome)
+                .order('data_criacao', desc=True)
+                .limit(limite)
+            )
             
             return result.data
         except:
             return []
     
-    def buscar_historico_completo(self, limite=20):
-        """Busca histórico completo (admin)"""
+    def buscar_historico_completo(self, desde=None, ate=None, tamanho_pagina=1000,
+                                  colunas='creator_nome, periodo_inicio, periodo_fim, diamantes, horas, batalhas, status'):
+        """
+        Busca o histórico de todas as semanas (admin), em páginas
+        
+        Lê de snapshots_semanais (uma linha por creator/semana, sem os
+        reenvios duplicados de 'relatorios'), opcionalmente só semanas com
+        desde <= periodo_fim < ate. A primeira página traz o total
+        de linhas; as demais são buscadas em paralelo no pool do banco.
+        Retorna None se alguma página falhar (histórico parcial não é
+        distinguível de vazio e não deve ir para os caches).
+        """
         if not self.is_connected():
             return []
         
+        def _pagina(inicio):
+            consulta = self.supabase.table('snapshots_semanais').select(colunas, count='exact' if inicio == 0 else None)
+            if desde:
+                consulta = consulta.gte('periodo_fim', desde)
+            if ate:
+                consulta = consulta.lt('periodo_fim', ate)
+            return self._executar(consulta
+                .order('periodo_fim')
+                .order('creator_nome')
+                .range(inicio, inicio + tamanho_pagina - 1)
+            )
+        
         try:
-            result = self.supabase.table('relatorios')\
-                .select('*')\
-                .order('data_criacao', desc=True)\
-                .limit(limite)\
-                .execute()
+            primeira = _pagina(0)
+            linhas = list(primeira.data)
+            total = primeira.count or len(linhas)
             
-            return result.data
-        except:
-            return []
+            restantes = range(tamanho_pagina, total, tamanho_pagina)
+            
+            # Chamada de dentro do próprio pool (em_paralelo): ler em sequência para não esperar por vagas dele
+            if threading.current_thread().name.startswith('supabase'):
+                paginas = map(_pagina, restantes)
+            else:
+                paginas = self._pool().map(_pagina, restantes)
+            
+            for result in paginas:
+                linhas.extend(result.data)
+            
+            return linhas
+        except Exception as e:
+            print(f"Erro ao buscar histórico completo: {e}")
+            return None
     
     def buscar_ultimas_semanas_creator(self, creator_nome, n_semanas=4):
         """Busca últimas N semanas de um creator para gráficos"""
@@ -181,18 +633,127 @@ class Database:
             return []
         
         try:
-            # Buscar registros únicos por período
-            result = self.supabase.table('relatorios')\
-                .select('periodo_inicio, periodo_fim, diamantes, horas, batalhas')\
-                .eq('creator_nome', creator_nome)\
-                .order('periodo_fim', desc=True)\
-                .limit(n_semanas)\
-                .execute()
+            # Leitura única no índice (creator_nome, periodo_fim) do snapshot
+            result = self._executar(self.supabase.table('snapshots_semanais')
+                .select('periodo_inicio, periodo_fim, diamantes, horas, batalhas, dias_validos, status')
+                .eq('creator_nome', creator_nome)
+                .order('periodo_fim', desc=True)
+                .limit(n_semanas)
+            )
             
             return result.data
         except:
             return []
     
+    def buscar_relatorio_periodo(self, periodo_inicio, periodo_fim, tamanho_pagina=1000):
+        """
+        Todas as linhas de 'relatorios' de uma semana (todos os envios), em páginas por id
+        
+        Usado para reconstruir o relatório da semana sem a planilha original.
+        Retorna None se a leitura falhar (diferente de [] = semana não gravada).
+        """
+        if not self.is_connected():
+            return []
+        
+        try:
+            linhas = []
+            apos_id = 0
+            
+            while True:
+                result = self._executar(self.supabase.table('relatorios')
+                    .select('id, creator_nome, diamantes, horas, batalhas, dias_validos, perc_batalhas, nota_ia, data_criacao')
+                    .eq('periodo_inicio', periodo_inicio)
+                    .eq('periodo_fim', periodo_fim)
+                    .gt('id', apos_id)
+                    .order('id')
+                    .limit(tamanho_pagina)
+                )
+                
+                linhas.extend(result.data)
+                
+                if len(result.data) < tamanho_pagina:
+                    break
+                apos_id = result.data[-1]['id']
+            
+            return linhas
+        except Exception as e:
+            print(f"Erro ao buscar relatório do período: {e}")
+            return None
+    
+    def listar_periodos(self, limite=104):
+        """
+        Semanas gravadas (mais recentes primeiro), da view periodos_relatorios
+        
+        Retorna lista de dicts com periodo_inicio, periodo_fim, n_criadores e
+        total_diamantes; vazia se a view não existir.
+        """
+        if not self.is_connected():
+            return []
+        
+        try:
+            result = self._executar(self.supabase.table('periodos_relatorios')
+                .select('periodo_inicio, periodo_fim, n_criadores, total_diamantes')
+                .order('periodo_fim', desc=True)
+                .limit(limite)
+            )
+            return result.data
+        except Exception as e:
+            print(f"Erro ao listar períodos: {e}")
+            return []
+    
+    def buscar_semana_anterior(self, periodo_inicio, tamanho_pagina=1000):
+        """
+        Busca os agregados por creator da última semana gravada antes de periodo_inicio
+        
+        Retorna dict com periodo_inicio, periodo_fim e criadores (lista de dicts),
+        ou None se não houver semana anterior.
+        """
+        if not self.is_connected():
+            return None
+        
+        try:
+            ultimo = self._executar(self.supabase.table('snapshots_semanais')
+                .select('periodo_inicio, periodo_fim')
+                .lt('periodo_fim', periodo_inicio)
+                .order('periodo_fim', desc=True)
+                .limit(1)
+            )
+            
+            if not ultimo.data:
+                return None
+            
+            periodo_inicio_ant = ultimo.data[0]['periodo_inicio']
+            periodo_fim = ultimo.data[0]['periodo_fim']
+            criadores = []
+            apos_id = 0
+            
+            # Leitura paginada por id (PostgREST limita o tamanho de cada resposta;
+            # sem ordem estável, páginas por offset podem pular ou repetir creators)
+            while True:
+                result = self._executar(self.supabase.table('snapshots_semanais')
+                    .select('id, creator_nome, diamantes, horas, batalhas, dias_validos, perc_batalhas, status')
+                    .eq('periodo_inicio', periodo_inicio_ant)
+                    .eq('periodo_fim', periodo_fim)
+                    .gt('id', apos_id)
+                    .order('id')
+                    .limit(tamanho_pagina)
+                )
+                
+                criadores.extend(result.data)
+                
+                if len(result.data) < tamanho_pagina:
+                    break
+                apos_id = result.data[-1]['id']
+            
+            return {
+                'periodo_inicio': periodo_inicio_ant,
+                'periodo_fim': periodo_fim,
+                'criadores': criadores
+            }
+        except Exception as e:
+            print(f"Erro ao buscar semana anterior: {e}")
+            return None
+    
     # ==========================================
     # ESTATÍSTICAS
     # ==========================================
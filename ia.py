@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cliente Claude (Anthropic) Compartilhado
+Cliente único por processo, timeouts, limite de chamadas simultâneas e SLA
+"""
+
+import fcntl
+import os
+import threading
+import time
+
+import anthropic
+
+from armazenamento import PASTA_DADOS, pasta_privada
+
+MODELO_PADRAO = 'claude-sonnet-4-5-20250929'
+
+
+class LimiteConcorrencia:
+    """
+    Semáforo entre processos (workers do gunicorn e pool do processar_lote)
+
+    Cada vaga é um arquivo de trava na pasta privada de dados (dados/, não
+    o /tmp compartilhado); quem consegue o flock de um deles pode chamar a
+    API. O sistema operacional solta a trava se o processo morrer, então
+    vagas nunca ficam presas.
+    """
+
+    def __init__(self, vagas, nome='ia', pasta=None):
+        self.vagas = max(1, vagas)
+        self.pasta = pasta or PASTA_DADOS
+        self.arquivos = [os.path.join(self.pasta, f"olah_{nome}_vaga_{i}.lock") for i in range(self.vagas)]
+
+    def adquirir(self, prazo):
+        """
+        Tenta pegar uma vaga até o instante prazo (time.monotonic); retorna o fd ou None
+
+        Erro ao abrir as travas (pasta sem permissão, arquivo de outro
+        usuário) conta como vaga ocupada: a chamada cai no fallback.
+        """
+        try:
+            pasta_privada(self.pasta)
+        except OSError as e:
+            print(f"⚠️ Travas da IA indisponíveis ({e})")
+            return None
+
+        while True:
+            abriu = False
+            for caminho in self.arquivos:
+                try:
+                    fd = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o600)
+                except OSError:
+                    continue
+                abriu = True
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except OSError:
+                    os.close(fd)
+
+            if not abriu:
+                print(f"⚠️ Travas da IA indisponíveis em {self.pasta}")
+                return None
+            if time.monotonic() >= prazo:
+                return None
+            time.sleep(0.05)
+
+    def liberar(self, fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+class ClienteIA:
+    """
+    Acesso à API do Claude com orçamento de tempo
+
+    - um cliente Anthropic por processo (pool HTTP com keep-alive reaproveitado)
+    - timeouts de conexão/leitura e no máximo max_simultaneas chamadas na
+      máquina inteira
+    - cada geração tem sla segundos no total (fila + chamada); estourou, o
+      chamador usa os insights automáticos
+    - se a latência média recente (EWMA) já passa do SLA, as chamadas são
+      puladas e só uma sonda a cada intervalo_sonda segundos vai à API
+    """
+
+    def __init__(self, api_key=None, base_url=None, modelo=None, sla=20, max_simultaneas=2,
+                 timeout_conexao=3, intervalo_sonda=60):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.modelo = modelo or MODELO_PADRAO
+        self.sla = sla
+        self.timeout_conexao = timeout_conexao
+        self.intervalo_sonda = intervalo_sonda
+        self.limite = LimiteConcorrencia(max_simultaneas)
+
+        self._cliente = None
+        self._cliente_pid = None
+        self._lock = threading.Lock()
+
+        # Estatísticas deste processo
+        self.latencia_media = None  # EWMA (segundos)
+        self._ultima_sonda = 0
+        self.chamadas = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def do_ambiente(cls):
+        return cls(
+            api_key=os.environ.get('ANTHROPIC_API_KEY'),
+            base_url=os.environ.get('ANTHROPIC_BASE_URL') or None,
+            modelo=os.environ.get('IA_MODELO'),
+            sla=float(os.environ.get('IA_SLA_SEGUNDOS', 20)),
+            max_simultaneas=int(os.environ.get('IA_MAX_SIMULTANEAS', 2)),
+            timeout_conexao=float(os.environ.get('IA_CONNECT_TIMEOUT', 3)),
+            intervalo_sonda=float(os.environ.get('IA_INTERVALO_SONDA', 60))
+        )
+
+    def disponivel(self):
+        return bool(self.api_key)
+
+    @property
+    def cliente(self):
+        """Cliente Anthropic do processo atual (recriado se o PID mudar)"""
+        if self._cliente_pid != os.getpid():
+            with self._lock:
+                if self._cliente_pid != os.getpid():
+                    self._cliente = anthropic.Anthropic(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        timeout=anthropic.Timeout(self.sla, connect=self.timeout_conexao),
+                        max_retries=0  # retentativas estourariam o SLA; o fallback cobre
+                    )
+                    self._cliente_pid = os.getpid()
+        return self._cliente
+
+    def _degradado(self):
+        """Latência recente acima do SLA: pular a chamada (exceto sondas periódicas)"""
+        if self.latencia_media is None or self.latencia_media <= self.sla:
+            return False
+
+        with self._lock:
+            agora = time.monotonic()
+            if agora - self._ultima_sonda >= self.intervalo_sonda:
+                self._ultima_sonda = agora
+                return False
+        return True
+
+    def _registrar_latencia(self, segundos):
+        with self._lock:
+            self.chamadas += 1
+            if self.latencia_media is None:
+                self.latencia_media = segundos
+            else:
+                self.latencia_media = 0.3 * segundos + 0.7 * self.latencia_media
+
+    def _desistir(self, motivo):
+        with self._lock:
+            self.fallbacks += 1
+        print(f"⚠️ IA: {motivo} - usando insights automáticos")
+        return None
+
+    def gerar(self, prompt, max_tokens=800):
+        """
+        Envia um prompt e retorna o texto da resposta
+
+        Retorna None quando a IA não está configurada, está lenta ou falhou;
+        o chamador decide o texto alternativo.
+        """
+        if not self.disponivel():
+            return None
+
+        if self._degradado():
+            return self._desistir(f"latência média {self.latencia_media:.1f}s acima do SLA de {self.sla:.0f}s")
+
+        inicio = time.monotonic()
+        prazo = inicio + self.sla
+
+        vaga = self.limite.adquirir(prazo)
+        if vaga is None:
+            return self._desistir(f"nenhuma vaga livre em {self.sla:.0f}s")
+
+        try:
+            restante = prazo - time.monotonic()
+            if restante <= 1:
+                return self._desistir("orçamento de tempo esgotado na fila")
+
+            message = self.cliente.with_options(
+                timeout=anthropic.Timeout(restante, connect=min(self.timeout_conexao, restante))
+            ).messages.create(
+                model=self.modelo,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            self._registrar_latencia(time.monotonic() - inicio)
+            return message.content[0].text
+
+        except anthropic.APITimeoutError:
+            # Timeout também entra na média para ativar o modo degradado
+            self._registrar_latencia(time.monotonic() - inicio)
+            return self._desistir(f"sem resposta em {self.sla:.0f}s")
+
+        except anthropic.APIError as e:
+            return self._desistir(f"erro na API ({e.__class__.__name__}: {e})")
+
+        finally:
+            self.limite.liberar(vaga)
+
+    def estatisticas(self):
+        return {
+            'configurada': self.disponivel(),
+            'modelo': self.modelo,
+            'sla_segundos': self.sla,
+            'latencia_media_s': round(self.latencia_media, 2) if self.latencia_media is not None else None,
+            'chamadas': self.chamadas,
+            'fallbacks': self.fallbacks,
+            'pid': os.getpid()
+        }
+
+
+# Instância global (lê o ambiente na importação, como o db)
+ia = ClienteIA.do_ambiente()
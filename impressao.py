@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Relatório para Impressão (PDF)
+Versão enxuta do relatório para o WeasyPrint: estilos planos, sem barra de ações, gradientes,
+sombras, caixas com rolagem ou emojis, e tabelas já divididas em páginas
+"""
+
+import io
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from jinja2 import Environment
+
+# Linhas por página nas tabelas (A4 paisagem com fonte 9pt)
+LINHAS_POR_PAGINA = int(os.environ.get('PDF_LINHAS_POR_PAGINA', 35))
+
+# Criadores por lista do PDF: alertas, atenções, anomalias e tabela detalhada (a lista completa fica no CSV/XLSX)
+MAX_CRIADORES = int(os.environ.get('PDF_MAX_CRIADORES', 1000))
+
+# Processos para renderizar seções em paralelo (0 ou 1 = documento único)
+PROCESSOS = int(os.environ.get('PDF_PROCESSOS', 0))
+
+SUFIXO = '.impressao.html'
+
+# Cada seção começa com este marcador: o documento pode ser cortado em partes independentes
+MARCADOR_SECAO = '<!-- secao -->'
+MARCADOR_FIM = '<!-- fim -->'
+
+STATUS_TEXTO = {
+    '🟢': 'OK', '🟡': 'Atenção', '🔴': 'Alerta',
+    'verde': 'OK', 'amarelo': 'Atenção', 'vermelho': 'Alerta'
+}
+
+# Emojis e seletores de variação (fontes de emoji são o que há de mais caro no layout)
+_EMOJI = re.compile('[\U0001F000-\U0001FAFF☀-➿⬀-⯿️‍]')
+
+
+def caminho_impressao(html_path):
+    """relatorio_X.html -> relatorio_X.impressao.html"""
+    base = html_path[:-5] if html_path.endswith('.html') else html_path
+    return base + SUFIXO
+
+
+def _milhar(valor):
+    return f"{int(valor or 0):,}".replace(',', '.')
+
+
+def _status(valor):
+    return STATUS_TEXTO.get(valor, valor or '')
+
+
+def _sem_emoji(texto):
+    return _EMOJI.sub('', texto or '').strip()
+
+
+def _paginas(itens, tamanho=None):
+    """Divide uma lista em páginas de até LINHAS_POR_PAGINA itens"""
+    tamanho = tamanho or LINHAS_POR_PAGINA
+    return [itens[i:i + tamanho] for i in range(0, len(itens), tamanho)]
+
+
+def _lista(itens):
+    """Páginas dos primeiros MAX_CRIADORES itens e quantos ficaram de fora"""
+    itens = itens or []
+    return _paginas(itens[:MAX_CRIADORES]), max(0, len(itens) - MAX_CRIADORES)
+
+
+TEMPLATE_IMPRESSAO = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="UTF-8">
+<title>Relatório Semanal - {{ periodo }}</title>
+<style>
+    @page { size: A4 landscape; margin: 12mm 10mm 14mm;
+        @bottom-left { content: "OLAH Agência · Relatório {{ periodo }}"; font-size: 7pt; color: #666; }
+        @bottom-right { content: string(secao); font-size: 7pt; color: #666; } }
+    * { margin: 0; padding: 0; }
+    body { font-family: 'DejaVu Sans', Arial, sans-serif; font-size: 9pt; line-height: 1.3; color: #000; }
+    h1 { font-size: 16pt; border-bottom: 2pt solid #ff0050; padding-bottom: 3pt; margin-bottom: 4pt; }
+    h2 { font-size: 12pt; margin: 10pt 0 4pt; string-set: secao content(); }
+    section + section { break-before: page; }
+    .meta { color: #444; margin-bottom: 6pt; }
+    .resumo td { padding: 2pt 8pt 2pt 0; border: none; }
+    table { width: 100%; border-collapse: collapse; margin-bottom: 6pt; }
+    thead { display: table-header-group; }
+    tr { break-inside: avoid; }
+    th { text-align: left; font-weight: bold; border-bottom: 1pt solid #000; padding: 2pt 3pt; }
+    td { padding: 2pt 3pt; border-bottom: 0.5pt solid #ccc; vertical-align: top; }
+    .d { text-align: right; }
+    .c { text-align: center; }
+    .nome { font-weight: bold; }
+    .alerta { color: #c62828; font-weight: bold; }
+    .atencao { color: #e65100; font-weight: bold; }
+    .nota { font-style: italic; color: #333; }
+    .insights { white-space: pre-wrap; border-left: 2pt solid #8B00FF; padding-left: 6pt; }
+</style>
+</head>
+<body>
+""" + MARCADOR_SECAO + """
+<section>
+    <h1>Relatório Semanal — Agência</h1>
+    <p class="meta">Período: {{ periodo }} · Criadores analisados: {{ n_criadores }}{% if aba %} · Aba: {{ aba }}{% endif %}</p>
+
+    <h2>Sumário Executivo</h2>
+    <table class="resumo">
+        <tr><td>Diamantes totais</td><td><strong>{{ total_diamantes|milhar }}</strong></td>
+            <td>Horas totais</td><td><strong>{{ total_horas }}h</strong></td>
+            <td>Eficiência média</td><td><strong>{{ media_dph }} diam/h</strong></td></tr>
+        <tr><td>Média por criador</td><td><strong>{{ media_diam_criador|milhar }}</strong></td>
+            <td>Horas por criador</td><td><strong>{{ media_horas_criador }}h</strong></td>
+            <td>Top {{ n_top }} (Pareto)</td><td><strong>{{ perc_pareto }}% dos diamantes</strong></td></tr>
+        <tr><td>Alertas</td><td class="alerta">{{ n_alertas }}</td>
+            <td>Atenções</td><td class="atencao">{{ n_atencoes }}</td>
+            <td>OKs</td><td><strong>{{ n_oks }}</strong></td></tr>
+    </table>
+
+    {% if abas %}
+    <h2>Resumo por Aba</h2>
+    <table>
+        <thead><tr><th>Aba</th><th class="d">Criadores</th><th class="d">Diamantes</th><th class="d">% do total</th><th class="d">Alertas</th><th class="d">Atenções</th></tr></thead>
+        <tbody>
+        {% for a in abas %}
+            <tr><td class="nome">{{ a.aba }}</td><td class="d">{{ a.n_criadores }}</td><td class="d">{{ a.total_diamantes|milhar }}</td><td class="d">{{ a.percentual }}%</td><td class="d">{{ a.n_alertas }}</td><td class="d">{{ a.n_atencoes }}</td></tr>
+        {% endfor %}
+        </tbody>
+    </table>
+    {% endif %}
+
+    <h2>Painel da Agência</h2>
+    <table>
+        <thead><tr><th>Métrica</th><th class="d">Valor Médio</th><th class="d">Meta Ideal</th><th class="d">Alerta</th><th class="c">Status</th></tr></thead>
+        <tbody>
+            <tr><td>Diamantes</td><td class="d">{{ media_diam_criador|milhar }}</td><td class="d">≥ {{ metas.diamantes.ideal }}</td><td class="d">&lt; {{ metas.diamantes.alerta }}</td><td class="c">{{ status_diam_ag|status }}</td></tr>
+            <tr><td>Horas</td><td class="d">{{ media_horas_criador }}h</td><td class="d">≥ {{ metas.horas.ideal }}</td><td class="d">&lt; {{ metas.horas.alerta }}</td><td class="c">{{ status_horas_ag|status }}</td></tr>
+            <tr><td>% em Batalhas</td><td class="d">{{ media_perc_batalhas }}%</td><td class="d">≥ {{ metas.perc_batalhas.ideal }}</td><td class="d">&lt; {{ metas.perc_batalhas.alerta }}</td><td class="c">{{ status_perc_bat_ag|status }}</td></tr>
+            <tr><td>Batalhas</td><td class="d">{{ media_batalhas }}</td><td class="d">≥ {{ metas.batalhas.ideal }}</td><td class="d">&lt; {{ metas.batalhas.alerta }}</td><td class="c">{{ status_bat_ag|status }}</td></tr>
+            <tr><td>Dias válidos</td><td class="d">{{ media_dias }}</td><td class="d">≥ {{ metas.dias.ideal }}</td><td class="d">&lt; {{ metas.dias.alerta }}</td><td class="c">{{ status_dias_ag|status }}</td></tr>
+        </tbody>
+    </table>
+
+    {% if concentracao %}
+    <h2>Concentração de Diamantes</h2>
+    <p class="meta">Índice de Gini: {{ "%.3f"|format(concentracao.gini) }} (0 = distribuição igual · 1 = tudo em um criador)</p>
+    <table>
+        <thead><tr>{% for corte in concentracao.cortes %}<th class="d">Top {{ corte.percentual }}% ({{ corte.n }})</th>{% endfor %}</tr></thead>
+        <tbody><tr>{% for corte in concentracao.cortes %}<td class="d">{{ corte.participacao }}%</td>{% endfor %}</tr></tbody>
+    </table>
+    <table>
+        <thead><tr>{% for d in concentracao.decis %}<th class="d">{{ d.decil }}º decil</th>{% endfor %}</tr></thead>
+        <tbody><tr>{% for d in concentracao.decis %}<td class="d">{{ d.participacao }}%</td>{% endfor %}</tr></tbody>
+    </table>
+    {% endif %}
+
+    {% if comparativo %}
+    <h2>Comparativo com a Semana Anterior</h2>
+    <p class="meta">
+        Semana anterior: {{ comparativo.periodo_anterior }} ·
+        Diamantes: {{ comparativo.total_diamantes_ant|milhar }} → {{ total_diamantes|milhar }}
+        {% if comparativo.var_total_diamantes is not none %}({{ "%+.1f"|format(comparativo.var_total_diamantes) }}%){% endif %} ·
+        Novos creators: {{ comparativo.n_novos }} · Saíram: {{ comparativo.n_sairam }} ·
+        Entraram em alerta: {{ comparativo.novos_alertas|length }} · Saíram do alerta: {{ comparativo.recuperados|length }}
+    </p>
+    <table>
+        <thead><tr><th>Maiores quedas</th><th class="d">Δ Diamantes</th><th>Maiores altas</th><th class="d">Δ Diamantes</th></tr></thead>
+        <tbody>
+        {% for i in range([comparativo.maiores_quedas|length, comparativo.maiores_altas|length]|max) %}
+            {% set q = comparativo.maiores_quedas[i] if i < comparativo.maiores_quedas|length else none %}
+            {% set a = comparativo.maiores_altas[i] if i < comparativo.maiores_altas|length else none %}
+            <tr>
+                <td class="nome">{{ q.nome if q and q.delta < 0 else '' }}</td>
+                <td class="d">{% if q and q.delta < 0 %}{{ q.delta|milhar }}{% if q.var is not none %} ({{ q.var }}%){% endif %}{% endif %}</td>
+                <td class="nome">{{ a.nome if a and a.delta > 0 else '' }}</td>
+                <td class="d">{% if a and a.delta > 0 %}+{{ a.delta|milhar }}{% if a.var is not none %} ({{ "%+.1f"|format(a.var) }}%){% endif %}{% endif %}</td>
+            </tr>
+        {% endfor %}
+        </tbody>
+    </table>
+    {% endif %}
+
+    {% if insights_ia %}
+    <h2>Insights da IA</h2>
+    <div class="insights">{{ insights_ia|sem_emoji }}</div>
+    {% endif %}
+</section>
+
+{% for pagina in paginas_pareto %}
+{% set inicio = loop.index0 * linhas_por_pagina %}
+""" + MARCADOR_SECAO + """
+<section>
+    <h2>Destaques 80/20{% if not loop.first %} (cont.){% endif %}</h2>
+    <table>
+        <thead><tr><th>#</th><th>Criador</th><th class="d">Diamantes</th><th class="d">% do total</th></tr></thead>
+        <tbody>
+        {% for c in pagina %}
+            <tr><td>{{ inicio + loop.index }}</td><td class="nome">{{ c.nome }}</td><td class="d">{{ c.diamantes|milhar }}</td><td class="d">{{ c.percentual }}%</td></tr>
+        {% endfor %}
+        </tbody>
+    </table>
+</section>
+{% endfor %}
+
+{% for titulo, classe, paginas, fora in listas_status %}
+{% for pagina in paginas %}
+""" + MARCADOR_SECAO + """
+<section>
+    <h2>{{ titulo }}{% if not loop.first %} (cont.){% endif %}</h2>
+    <table>
+        <thead><tr><th style="width: 22%">Criador</th><th style="width: 33%">Motivo</th><th>Nota</th></tr></thead>
+        <tbody>
+        {% for c in pagina %}
+            <tr><td class="nome">{{ c.nome }}{% if c.is_top %} (top){% endif %}</td><td class="{{ classe }}">{{ c.motivos|join(' · ')|sem_emoji }}</td><td class="nota">{{ c.nota_ia|sem_emoji }}</td></tr>
+        {% endfor %}
+        </tbody>
+    </table>
+    {% if loop.last and fora > 0 %}
+    <p class="meta">Mais {{ fora }} criadores nesta lista (completa na exportação CSV/XLSX).</p>
+    {% endif %}
+</section>
+{% endfor %}
+{% endfor %}
+
+{% for pagina in paginas_anomalias %}
+""" + MARCADOR_SECAO + """
+<section>
+    <h2>Anomalias vs Histórico{% if not loop.first %} (cont.){% endif %}</h2>
+    <table>
+        <thead><tr><th style="width: 22%">Criador</th><th>Fora do próprio padrão (mediana das últimas semanas)</th></tr></thead>
+        <tbody>
+        {% for a in pagina %}
+            <tr><td class="nome">{{ a.nome }}{% if a.is_top %} (top){% endif %}</td><td class="{{ 'alerta' if a.pior_variacao < 0 else 'atencao' }}">{{ a.descricoes|join(' · ')|sem_emoji }}</td></tr>
+        {% endfor %}
+        </tbody>
+    </table>
+    {% if loop.last and anomalias_fora > 0 %}
+    <p class="meta">Mais {{ anomalias_fora }} criadores com anomalias (completa na exportação CSV/XLSX).</p>
+    {% endif %}
+</section>
+{% endfor %}
+
+{% for pagina in paginas_criadores %}
+""" + MARCADOR_SECAO + """
+<section>
+    <h2>Visão Detalhada por Criador{% if not loop.first %} (cont.){% endif %}</h2>
+    <table>
+        <thead><tr>
+            <th>Criador</th><th class="d">Diamantes</th><th class="d">Horas</th><th class="d">Diam/h</th><th class="d">%Bat</th><th class="d">Bats</th><th class="d">Dias</th>
+            <th class="c">Diam</th><th class="c">Horas</th><th class="c">%Bat</th><th class="c">Bats</th><th class="c">Dias</th>
+            {% if comparativo %}<th class="d">Δ Sem.</th>{% endif %}<th>Status</th>
+        </tr></thead>
+        <tbody>
+        {% for c in pagina %}
+            <tr>
+                <td class="nome">{{ c.nome }}{% if c.aba and abas %} ({{ c.aba }}){% endif %}</td>
+                <td class="d">{{ c.diamantes|milhar }}</td><td class="d">{{ c.horas }}</td><td class="d">{{ c.diam_hora }}</td>
+                <td class="d">{{ c.perc_bat }}%</td><td class="d">{{ c.batalhas }}</td><td class="d">{{ c.dias }}</td>
+                <td class="c">{{ c.st_diam|status }}</td><td class="c">{{ c.st_horas|status }}</td><td class="c">{{ c.st_perc_bat|status }}</td>
+                <td class="c">{{ c.st_bats|status }}</td><td class="c">{{ c.st_dias|status }}</td>
+                {% if comparativo %}<td class="d">{% if c.var_diamantes is not none %}{{ "%+.1f"|format(c.var_diamantes) }}%{% endif %}</td>{% endif %}
+                <td>{{ c.classificacao.status|status }}</td>
+            </tr>
+        {% endfor %}
+        </tbody>
+    </table>
+    {% if loop.last and criadores_fora > 0 %}
+    <p class="meta">Mais {{ criadores_fora }} criadores não exibidos no PDF (lista completa na exportação CSV/XLSX).</p>
+    {% endif %}
+</section>
+{% endfor %}
+""" + MARCADOR_FIM + """
+</body>
+</html>"""
+
+_ambiente = Environment(autoescape=True)
+_ambiente.filters.update(milhar=_milhar, status=_status, sem_emoji=_sem_emoji)
+_template = None
+
+
+def renderizar_impressao(dados, criadores):
+    """
+    HTML de impressão a partir dos agregados e dos criadores já classificados
+
+    Pareto, alertas, atenções, anomalias e a tabela detalhada (cada lista
+    até MAX_CRIADORES) saem em páginas de LINHAS_POR_PAGINA linhas, cada uma
+    em uma seção própria.
+    """
+    global _template
+    if _template is None:
+        _template = _ambiente.from_string(TEMPLATE_IMPRESSAO)
+
+    paginas_anomalias, anomalias_fora = _lista(dados.get('anomalias'))
+    paginas_criadores, criadores_fora = _lista(criadores)
+
+    return _template.render(
+        **dados,
+        linhas_por_pagina=LINHAS_POR_PAGINA,
+        paginas_pareto=_lista(dados.get('top_pareto'))[0],
+        listas_status=[
+            ('Alertas Vermelhos', 'alerta', *_lista(dados.get('alertas'))),
+            ('Atenções', 'atencao', *_lista(dados.get('atencoes')))
+        ],
+        paginas_anomalias=paginas_anomalias,
+        anomalias_fora=anomalias_fora,
+        paginas_criadores=paginas_criadores,
+        criadores_fora=criadores_fora
+    )
+
+
+def gravar_impressao(html_content, caminho):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+
+
+# ==========================================
+# PDF (DOCUMENTO ÚNICO OU SEÇÕES EM PARALELO)
+# ==========================================
+
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def _obter_pool(processos):
+    """Pool reaproveitado entre PDFs (spawn: seguro dentro dos workers com threads do gunicorn)"""
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _descartar_pool(pool):
+    """Processo do pool morreu (ex: falta de memória): o próximo PDF cria outro pool"""
+    global _pool
+    with _lock_pool:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _renderizar_pdf(html_content, base_url):
+    """Renderiza um documento HTML e devolve os bytes do PDF (executa nos processos do pool)"""
+    from weasyprint import HTML
+    return HTML(string=html_content, base_url=base_url).write_pdf()
+
+
+def dividir_secoes(html_content, partes):
+    """
+    Corta o HTML de impressão em até 'partes' documentos independentes
+
+    Cada documento leva o cabeçalho (estilos) e uma faixa contínua de seções
+    com número parecido de seções. HTML sem marcadores volta inteiro.
+    """
+    if MARCADOR_SECAO not in html_content or MARCADOR_FIM not in html_content:
+        return [html_content]
+
+    cabecalho, _, corpo = html_content.partition(MARCADOR_SECAO)
+    corpo, _, rodape = corpo.rpartition(MARCADOR_FIM)
+    secoes = corpo.split(MARCADOR_SECAO)
+
+    partes = max(1, min(partes, len(secoes)))
+    tamanho, sobra = divmod(len(secoes), partes)
+
+    documentos = []
+    inicio = 0
+    for i in range(partes):
+        fim = inicio + tamanho + (1 if i < sobra else 0)
+        documentos.append(cabecalho + ''.join(secoes[inicio:fim]) + rodape)
+        inicio = fim
+    return documentos
+
+
+def _unir_pdfs(pdfs, destino):
+    from pypdf import PdfWriter
+
+    escritor = PdfWriter()
+    for pdf in pdfs:
+        escritor.append(io.BytesIO(pdf))
+    with open(destino, 'wb') as f:
+        escritor.write(f)
+
+
+def gerar_pdf(html_path, pdf_path, processos=None):
+    """
+    Gera o PDF de um HTML (de preferência o de impressão)
+
+    Com processos > 1, as seções são renderizadas em paralelo e unidas com
+    pypdf (por isso o rodapé mostra a seção, não o número da página: cada
+    parte contaria as próprias páginas). O PDF é gravado em um temporário e
+    renomeado: requisições simultâneas nunca servem um arquivo pela metade.
+    """
+    processos = PROCESSOS if processos is None else processos
+    base_url = os.path.dirname(os.path.abspath(html_path))
+    temporario = f"{pdf_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    with open(html_path, 'r', encoding='utf-8') as f:
+        html_content = f.read()
+
+    documentos = dividir_secoes(html_content, processos) if processos > 1 else [html_content]
+
+    try:
+        if len(documentos) > 1:
+            try:
+                import pypdf  # noqa: F401
+            except ImportError:
+                print("⚠️ pypdf não instalado; PDF gerado em documento único")
+                documentos = [html_content]
+
+        if len(documentos) == 1:
+            from weasyprint import HTML
+            HTML(string=html_content, base_url=base_url).write_pdf(temporario)
+        else:
+            pool = _obter_pool(processos)
+            try:
+                pdfs = list(pool.map(_renderizar_pdf, documentos, [base_url] * len(documentos)))
+            except BrokenProcessPool:
+                _descartar_pool(pool)
+                raise
+            _unir_pdfs(pdfs, temporario)
+
+        os.replace(temporario, pdf_path)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    return pdf_path
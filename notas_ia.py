@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Notas de Coaching por Creator (IA)
+Gera notas curtas para creators em alerta/atenção, vários creators por prompt
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout, as_completed
+
+from cache import CacheCompartilhado
+from ia import ia
+
+TAMANHO_LOTE = int(os.environ.get('NOTAS_IA_LOTE', 25))
+MAX_PARALELO = int(os.environ.get('NOTAS_IA_PARALELO', os.environ.get('IA_MAX_SIMULTANEAS', 2)))
+
+# Limites por upload (as notas rodam dentro da requisição, abaixo do timeout do gunicorn):
+# creators enviados à IA e segundos de espera; o que passar disso fica sem nota
+MAX_NOTAS = int(os.environ.get('NOTAS_IA_MAX', 500))
+TEMPO_MAXIMO = float(os.environ.get('NOTAS_IA_TEMPO', 90))
+
+# Mesma semana reenviada (ou aba + consolidado) não gera a nota de novo
+cache_notas = CacheCompartilhado(
+    'notas_ia',
+    ttl=int(os.environ.get('NOTAS_IA_TTL', 7 * 86400)),
+    max_itens=int(os.environ.get('NOTAS_IA_MAX_ITENS', 20000))
+)
+
+
+def chave_metricas(criador, perfil):
+    """Hash das métricas que a nota comenta: mudou qualquer uma, gera de novo"""
+    base = [
+        criador['nome'], criador['diamantes'], round(float(criador['horas']), 2),
+        criador['batalhas'], round(float(criador['perc_bat']), 1), criador['dias'],
+        criador['classificacao']['status'], criador['classificacao']['motivo'], perfil
+    ]
+    return hashlib.sha1(json.dumps(base, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+def montar_prompt_notas(lote):
+    """Prompt de um lote: uma linha JSON por creator, resposta em JSON nome -> nota"""
+    linhas = '\n'.join(json.dumps({
+        'nome': c['nome'],
+        'status': c['classificacao']['status'],
+        'diamantes': c['diamantes'],
+        'horas': round(float(c['horas']), 1),
+        'dias_validos': c['dias'],
+        'batalhas': c['batalhas'],
+        'perc_batalhas': round(float(c['perc_bat']), 1),
+        'problemas': [*(c.get('alertas') or ()), *(c.get('atencoes') or ())]
+    }, ensure_ascii=False) for c in lote)
+
+    return f"""Você é gerente de creators da OLAH Agência (TikTok).
+
+Para CADA creator abaixo, escreva uma nota de coaching curta (máximo 20 palavras),
+prática e direta, focada no principal problema dele nesta semana.
+
+CREATORS (um JSON por linha):
+{linhas}
+
+RESPONDA APENAS com um objeto JSON no formato {{"nome do creator": "nota"}},
+com exatamente os nomes recebidos. TOM: direto, jovem, enérgico (marca OLAH)."""
+
+
+def _interpretar_resposta(texto, nomes):
+    """Extrai o JSON da resposta (tolerando cercas de código) e filtra nomes desconhecidos"""
+    if not texto:
+        return {}
+
+    inicio, fim = texto.find('{'), texto.rfind('}')
+    if inicio < 0 or fim <= inicio:
+        return {}
+
+    try:
+        notas = json.loads(texto[inicio:fim + 1])
+    except ValueError:
+        return {}
+
+    return {
+        nome: re.sub(r'\s+', ' ', str(nota)).strip()
+        for nome, nota in notas.items()
+        if nome in nomes and str(nota).strip()
+    }
+
+
+def _gerar_lote(lote):
+    nomes = {c['nome'] for c in lote}
+    texto = ia.gerar(montar_prompt_notas(lote), max_tokens=60 * len(lote) + 100)
+    return _interpretar_resposta(texto, nomes)
+
+
+def _prioridade(criador):
+    # Alertas antes de atenções; dentro de cada um, quem mais fatura
+    return (criador['classificacao']['status'] != 'vermelho', -criador['diamantes'])
+
+
+def gerar_notas_criadores(criadores, perfil=None, tamanho_lote=None, max_paralelo=None,
+                          max_notas=None, tempo_maximo=None):
+    """
+    Gera notas para os creators informados
+
+    Os que já têm nota em cache (mesmas métricas) não vão para a IA; do
+    resto, no máximo max_notas (alertas e maiores faturamentos primeiro)
+    são divididos em lotes de tamanho_lote, enviados com no máximo
+    max_paralelo lotes ao mesmo tempo. Passados tempo_maximo segundos, os
+    lotes ainda não concluídos são abandonados (os que terminarem depois
+    só alimentam o cache). Retorna dict nome -> nota; quem ficou de fora
+    não tem nota.
+    """
+    tamanho_lote = tamanho_lote or TAMANHO_LOTE
+    max_paralelo = max_paralelo or MAX_PARALELO
+    max_notas = MAX_NOTAS if max_notas is None else max_notas
+    tempo_maximo = TEMPO_MAXIMO if tempo_maximo is None else tempo_maximo
+
+    chaves = {criador['nome']: chave_metricas(criador, perfil) for criador in criadores}
+
+    # Uma consulta ao cache compartilhado para todos os creators
+    em_cache = cache_notas.obter_varios(chaves.values())
+    notas = {nome: em_cache[chave] for nome, chave in chaves.items() if chave in em_cache}
+    pendentes = [criador for criador in criadores if criador['nome'] not in notas]
+
+    if not pendentes or not ia.disponivel():
+        return notas
+
+    if len(pendentes) > max_notas:
+        print(f"⚠️ Notas IA: {len(pendentes)} creators sem nota em cache; só os {max_notas} prioritários vão para a IA")
+        pendentes = sorted(pendentes, key=_prioridade)[:max_notas]
+
+    lotes = [pendentes[i:i + tamanho_lote] for i in range(0, len(pendentes), tamanho_lote)]
+    print(f"📝 Notas IA: {len(pendentes)} creators em {len(lotes)} lotes ({len(notas)} do cache)")
+
+    def _guardar(futuro):
+        # Também para lotes que terminam depois do prazo: a próxima vez vem do cache
+        if not futuro.cancelled() and futuro.exception() is None:
+            for nome, nota in futuro.result().items():
+                cache_notas.definir(chaves[nome], nota)
+
+    pool = ThreadPoolExecutor(max_workers=min(max_paralelo, len(lotes)))
+    futuros = [pool.submit(_gerar_lote, lote) for lote in lotes]
+    for futuro in futuros:
+        futuro.add_done_callback(_guardar)
+
+    try:
+        for futuro in as_completed(futuros, timeout=tempo_maximo):
+            if futuro.exception() is None:
+                notas.update(futuro.result())
+    except FuturoTimeout:
+        pendentes_lotes = sum(not f.done() for f in futuros)
+        print(f"⚠️ Notas IA: prazo de {tempo_maximo:.0f}s esgotado, {pendentes_lotes} lotes sem nota")
+    finally:
+        # Não esperar os lotes em andamento; os que ainda estão na fila nem começam
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return notas
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reprocessamento em Lote
+Roda o AnalisadorRelatorio sobre vários exports de uma vez (ex: após mudar METAS)
+
+Uso:
+    python processar_lote.py uploads/
+    python processar_lote.py "uploads/*.xlsx" --sem-ia --pdf --workers 4
+    python processar_lote.py uploads/ --banco-lote
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from analisador import AnalisadorRelatorio, gravar_html
+from impressao import caminho_impressao, gerar_pdf
+from reconstrucao import salvar_snapshot
+
+EXTENSOES = ('.xlsx', '.xls', '.csv')
+
+
+def listar_arquivos(entradas):
+    """Expande diretórios e globs em uma lista ordenada de planilhas"""
+    arquivos = []
+
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = [os.path.join(entrada, f) for f in os.listdir(entrada)]
+        else:
+            candidatos = glob.glob(entrada)
+
+        arquivos.extend(
+            c for c in candidatos
+            if os.path.isfile(c) and c.lower().endswith(EXTENSOES)
+        )
+
+    return sorted(set(arquivos))
+
+
+def _escrever_pdf(analisador, html_path):
+    # Cada arquivo já roda em um processo do lote: PDF em documento único
+    analisador.salvar_impressao(html_path)
+    gerar_pdf(caminho_impressao(html_path), html_path.replace('.html', '.pdf'), processos=1)
+
+
+def processar_arquivo(filepath, opcoes):
+    """
+    Processa uma planilha (executa dentro de um processo do pool)
+
+    Retorna um dict simples (serializável) com o resultado. Quando o banco é
+    gravado em lote, os criadores voltam para o processo principal.
+    """
+    inicio = time.perf_counter()
+    # Extensão entra no nome para 'semana.csv' e 'semana.xlsx' não colidirem
+    nome_base = os.path.basename(filepath).replace('.', '_')
+
+    try:
+        analisador = AnalisadorRelatorio(filepath, usar_ia=not opcoes['sem_ia'], perfil=opcoes['perfil'])
+        resultado = analisador.processar()
+
+        if resultado['status'] == 'erro':
+            return {'arquivo': filepath, 'status': 'erro', 'mensagem': resultado['mensagem']}
+
+        periodo_inicio, periodo_fim = analisador.obter_periodo_datas()
+
+        # Renderizar uma vez; HTML, tabela, impressão (ou PDF) e snapshot são gravados em paralelo
+        output_filename = f"relatorio_{nome_base}.html"
+        html_path = os.path.join(opcoes['saida'], output_filename)
+        html_content = analisador.renderizar_html(output_filename)
+
+        with ThreadPoolExecutor(max_workers=2) as escritores:
+            tarefas = [
+                escritores.submit(gravar_html, html_content, html_path),
+                escritores.submit(analisador.salvar_tabela_completa, html_path),
+                escritores.submit(salvar_snapshot, analisador, periodo_inicio, periodo_fim)
+            ]
+            if opcoes['pdf']:
+                tarefas.append(escritores.submit(_escrever_pdf, analisador, html_path))
+            else:
+                tarefas.append(escritores.submit(analisador.salvar_impressao, html_path))
+            for tarefa in tarefas:
+                tarefa.result()
+
+        retorno = {
+            'arquivo': filepath,
+            'status': 'sucesso',
+            'html': html_path,
+            'periodo_inicio': periodo_inicio,
+            'periodo_fim': periodo_fim,
+            'n_criadores': len(analisador.criadores)
+        }
+
+        if not opcoes['sem_banco']:
+            if opcoes['banco_lote']:
+                retorno['criadores'] = analisador.criadores
+            else:
+                from database import db
+                salvo = db.salvar_relatorio(periodo_inicio, periodo_fim, analisador.criadores)
+                retorno['gravado_banco'] = 'erro' not in salvo or salvo.get('parcial', False)
+                if 'erro' in salvo:
+                    retorno['aviso'] = f"Banco: {salvo['erro']}"
+
+        retorno['segundos'] = round(time.perf_counter() - inicio, 2)
+        return retorno
+
+    except Exception as e:
+        return {'arquivo': filepath, 'status': 'erro', 'mensagem': str(e)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reprocessa exports semanais em lote')
+    parser.add_argument('entradas', nargs='+', help='Diretórios ou globs com as planilhas')
+    parser.add_argument('--saida', default='outputs', help='Pasta dos relatórios gerados (padrão: outputs)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processos em paralelo')
+    parser.add_argument('--sem-ia', action='store_true', help='Não chamar a API do Claude (usa insights automáticos)')
+    parser.add_argument('--sem-banco', action='store_true', help='Não gravar nada no Supabase')
+    parser.add_argument('--banco-lote', action='store_true', help='Gravar todos os relatórios no Supabase de uma vez ao final')
+    parser.add_argument('--pdf', action='store_true', help='Gerar também o PDF de cada relatório')
+    parser.add_argument('--perfil', default=None, help='Perfil de metas de regras_metas.json (padrão: REGRAS_PERFIL ou "padrao")')
+    args = parser.parse_args(argv)
+
+    arquivos = listar_arquivos(args.entradas)
+    if not arquivos:
+        print("⚠️ Nenhuma planilha encontrada.")
+        return 1
+
+    os.makedirs(args.saida, exist_ok=True)
+
+    opcoes = {
+        'saida': args.saida,
+        'sem_ia': args.sem_ia,
+        'sem_banco': args.sem_banco,
+        'banco_lote': args.banco_lote,
+        'pdf': args.pdf,
+        'perfil': args.perfil
+    }
+
+    print(f"📦 {len(arquivos)} planilhas · {args.workers} processos")
+    inicio = time.perf_counter()
+    sucessos, erros, para_banco = [], [], []
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futuros = {pool.submit(processar_arquivo, f, opcoes): f for f in arquivos}
+
+        for futuro in as_completed(futuros):
+            r = futuro.result()
+
+            if r['status'] == 'sucesso':
+                sucessos.append(r)
+                print(f"✅ {r['arquivo']} → {r['html']} ({r['n_criadores']} criadores, {r['segundos']}s)")
+                if r.get('aviso'):
+                    print(f"   ⚠️ {r['aviso']}")
+                if 'criadores' in r:
+                    para_banco.append(r)
+            else:
+                erros.append(r)
+                print(f"❌ {r['arquivo']}: {r['mensagem']}")
+
+    # Gravados um a um pelos processos (já concluídos aqui)
+    gravou_banco = any(r.get('gravado_banco') for r in sucessos)
+
+    if para_banco:
+        from database import db
+
+        print(f"💾 Gravando {len(para_banco)} relatórios no Supabase em lote...")
+        salvo = db.salvar_relatorios_lote(para_banco)
+        if 'erro' in salvo:
+            print(f"❌ Erro ao gravar no banco: {salvo['erro']}")
+        else:
+            print(f"✅ {salvo['total']} registros gravados")
+        gravou_banco = gravou_banco or 'erro' not in salvo or salvo.get('parcial', False)
+
+    # Só depois das gravações: um painel pedido antes voltaria a guardar os dados antigos
+    from cache import invalidar_relatorios, relatorios_reconstruidos
+    if gravou_banco:
+        invalidar_relatorios()
+    elif sucessos:
+        relatorios_reconstruidos.invalidar()  # snapshots das semanas regravados
+
+    duracao = time.perf_counter() - inicio
+    total_criadores = sum(r['n_criadores'] for r in sucessos)
+
+    print()
+    print("📊 RESUMO")
+    print(f"   Planilhas: {len(sucessos)} ok · {len(erros)} com erro")
+    print(f"   Criadores: {total_criadores}")
+    print(f"   Tempo total: {duracao:.1f}s")
+    print(f"   Vazão: {len(sucessos) / max(duracao, 0.001):.2f} planilhas/s · {total_criadores / max(duracao, 0.001):.0f} criadores/s")
+
+    return 1 if erros else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ranking e Concentração
+Posições, curva de participação acumulada, Gini, percentis e decis em NumPy
+"""
+
+from functools import cached_property
+
+import numpy as np
+
+# Cortes mostrados no relatório (% dos criadores do topo)
+CORTES_PADRAO = (1, 5, 10, 20, 50)
+
+
+class Ranking:
+    """
+    Ranking de uma métrica (ex: diamantes) com as medidas de concentração
+
+    Uma única ordenação (estável, decrescente) alimenta tudo: posição de cada
+    criador, curva acumulada, Gini, percentis e decis. A participação em
+    qualquer corte sai da curva sem reordenar.
+    """
+
+    def __init__(self, valores):
+        self.valores = np.asarray(valores, dtype=float)
+        self.n = len(self.valores)
+        self.total = float(self.valores.sum())
+
+    @cached_property
+    def ordem(self):
+        """Índices do maior para o menor valor (empates mantêm a ordem original)"""
+        return np.argsort(-self.valores, kind='stable')
+
+    @cached_property
+    def posicao(self):
+        """Posição (0 = maior) de cada criador, na ordem original"""
+        posicao = np.empty(self.n, dtype=np.intp)
+        posicao[self.ordem] = np.arange(self.n)
+        return posicao
+
+    @cached_property
+    def curva(self):
+        """Participação acumulada (0 a 1) dos k primeiros, para k = 1..n"""
+        acumulado = np.cumsum(self.valores[self.ordem])
+        return acumulado / self.total if self.total > 0 else np.zeros(self.n)
+
+    @cached_property
+    def gini(self):
+        """Coeficiente de Gini (0 = todos iguais, 1 = um criador concentra tudo)"""
+        if self.n == 0 or self.total <= 0:
+            return 0.0
+        crescente = self.valores[self.ordem[::-1]]
+        i = np.arange(1, self.n + 1)
+        return float(2 * np.dot(i, crescente) / (self.n * self.total) - (self.n + 1) / self.n)
+
+    @cached_property
+    def percentis(self):
+        """Percentil de cada criador: % dos criadores com valor menor ou igual"""
+        crescente = np.sort(self.valores)
+        return np.searchsorted(crescente, self.valores, side='right') * 100.0 / max(self.n, 1)
+
+    @cached_property
+    def decis(self):
+        """Decil de cada criador pela posição (1 = 10% do topo, 10 = 10% da base)"""
+        return (self.posicao * 10 // max(self.n, 1) + 1).astype(np.int8)
+
+    def participacao_top(self, k):
+        """% do total gerado pelos k primeiros"""
+        k = max(0, min(int(k), self.n))
+        return round(float(self.curva[k - 1]) * 100, 1) if k else 0.0
+
+    def resumo(self, cortes=CORTES_PADRAO):
+        """Gini, participação nos cortes e soma por decil (para o relatório)"""
+        por_decil = np.bincount(self.decis - 1, weights=self.valores, minlength=10) if self.n else np.zeros(10)
+        qtd_decil = np.bincount(self.decis - 1, minlength=10) if self.n else np.zeros(10, dtype=int)
+
+        return {
+            'gini': round(self.gini, 3),
+            'cortes': [{
+                'percentual': p,
+                'n': max(1, int(self.n * p / 100)),
+                'participacao': self.participacao_top(max(1, int(self.n * p / 100)))
+            } for p in cortes],
+            'decis': [{
+                'decil': d + 1,
+                'n': int(qtd_decil[d]),
+                'total': int(por_decil[d]),
+                'participacao': round(float(por_decil[d]) / self.total * 100, 1) if self.total > 0 else 0.0
+            } for d in range(10)]
+        }
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recebimento de Planilhas
+Upload gravado direto no disco com hash e checagem de formato durante a transferência,
+e sessões de upload em blocos (retomáveis) para exports grandes
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from flask import Request
+from werkzeug.exceptions import UnsupportedMediaType
+
+EXTENSOES = ('.xlsx', '.xls', '.csv')
+
+# Limite do corpo de cada requisição (e do arquivo inteiro nas sessões em blocos)
+MAX_UPLOAD = int(os.environ.get('MAX_CONTENT_LENGTH', 100 * 1024 * 1024))
+TAMANHO_BLOCO = int(os.environ.get('UPLOAD_TAMANHO_BLOCO', 8 * 1024 * 1024))
+SESSAO_TTL = int(os.environ.get('UPLOAD_SESSAO_TTL', 86400))
+
+# Bytes lidos antes de decidir o formato
+_AMOSTRA = 2048
+_LEITURA = 64 * 1024
+
+
+class ErroUpload(Exception):
+    """Erro de upload com o status HTTP da resposta"""
+
+    def __init__(self, mensagem, codigo=400, **extras):
+        super().__init__(mensagem)
+        self.codigo = codigo
+        self.extras = extras
+
+
+def extensao(nome):
+    return os.path.splitext(nome or '')[1].lower()
+
+
+def detectar_formato(inicio):
+    """
+    Formato real pelos primeiros bytes: 'xlsx' (zip), 'xls' (OLE2) ou 'csv' (texto)
+
+    Retorna None para conteúdo binário que não é planilha. CSV do Excel pode
+    vir em Latin-1, então o texto não precisa ser UTF-8 válido.
+    """
+    if inicio.startswith(b'PK\x03\x04'):
+        return 'xlsx'
+    if inicio.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        return 'xls'
+    # Bytes de controle (exceto tab e quebras de linha) só aparecem em binário
+    if any(b < 0x09 or 0x0d < b < 0x20 for b in inicio):
+        return None
+    return 'csv'
+
+
+def validar_formato(inicio, nome):
+    """Levanta UnsupportedMediaType se o conteúdo não bate com a extensão"""
+    esperado = extensao(nome).lstrip('.')
+    if detectar_formato(inicio) != esperado:
+        raise UnsupportedMediaType(f"O conteúdo do arquivo não é um {esperado.upper()} válido")
+
+
+class ArquivoRecebido:
+    """
+    Destino do upload enquanto o Werkzeug lê o corpo da requisição
+
+    Os bytes vão direto para um arquivo na pasta de uploads (sem passar por
+    um temporário em memória), o SHA-256 é calculado a cada bloco e o
+    formato é conferido assim que chegam os primeiros bytes: um arquivo
+    errado é recusado sem esperar o resto do corpo.
+    """
+
+    def __init__(self, pasta, nome):
+        self.nome = nome
+        self.caminho = os.path.join(pasta, f".recebendo_{uuid.uuid4().hex}")
+        self.tamanho = 0
+        self._hash = hashlib.sha256()
+        self._amostra = b''
+        self._validado = False
+        self._movido = False
+        self._arquivo = open(self.caminho, 'w+b')
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def _validar(self):
+        self._validado = True
+        try:
+            validar_formato(self._amostra, self.nome)
+        except UnsupportedMediaType:
+            # O parser ainda não entregou este arquivo à requisição: ninguém mais vai fechá-lo
+            self.close()
+            raise
+        self._amostra = b''
+
+    def write(self, dados):
+        if not self._validado:
+            self._amostra += bytes(dados[:_AMOSTRA])
+            if len(self._amostra) >= _AMOSTRA:
+                self._validar()
+        self._hash.update(dados)
+        self.tamanho += len(dados)
+        return self._arquivo.write(dados)
+
+    def seek(self, *args):
+        # O parser volta ao início quando o arquivo termina: arquivos menores que a amostra são checados aqui
+        if not self._validado:
+            self._validar()
+        return self._arquivo.seek(*args)
+
+    def mover_para(self, destino):
+        """Fecha e renomeia o arquivo recebido para o caminho definitivo"""
+        self._arquivo.close()
+        os.replace(self.caminho, destino)
+        self._movido = True
+        return destino
+
+    def close(self):
+        self._arquivo.close()
+        if not self._movido and os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+    def __getattr__(self, nome):
+        return getattr(self._arquivo, nome)
+
+
+class RequestUpload(Request):
+    """Request do Flask que entrega os arquivos enviados já como ArquivoRecebido"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Campo de arquivo vazio (nada selecionado): a view responde com a mensagem dela
+        if not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        if extensao(filename) not in EXTENSOES:
+            raise UnsupportedMediaType('Formato inválido. Use XLSX, XLS ou CSV')
+
+        from flask import current_app
+        return ArquivoRecebido(current_app.config['UPLOAD_FOLDER'], filename)
+
+
+# ==========================================
+# SESSÕES DE UPLOAD EM BLOCOS (retomáveis)
+# ==========================================
+# 1. POST cria a sessão (nome, tamanho e sha256 opcional)
+# 2. PUT envia cada bloco a partir do offset 'inicio'; conexão caiu no meio,
+#    GET informa quantos bytes chegaram e o envio continua dali
+# 3. POST .../concluir confere tamanho e hash e processa a planilha
+
+def _pasta_sessoes(pasta_uploads):
+    pasta = os.path.join(pasta_uploads, '.sessoes')
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def _caminhos(pasta_uploads, sessao_id):
+    if not sessao_id or not all(c in '0123456789abcdef' for c in sessao_id):
+        raise ErroUpload('Sessão de upload não encontrada', 404)
+    base = os.path.join(_pasta_sessoes(pasta_uploads), sessao_id)
+    if not os.path.exists(base + '.json'):
+        raise ErroUpload('Sessão de upload não encontrada', 404)
+    return base + '.json', base + '.parte'
+
+
+def _ler_sessao(pasta_uploads, sessao_id):
+    meta, parte = _caminhos(pasta_uploads, sessao_id)
+    with open(meta, 'r', encoding='utf-8') as f:
+        sessao = json.load(f)
+    sessao['recebido'] = os.path.getsize(parte)
+    return sessao, parte
+
+
+def criar_sessao(pasta_uploads, nome, tamanho, sha256=None):
+    """Abre uma sessão de upload; retorna id, bytes recebidos e tamanho de bloco sugerido"""
+    if extensao(nome) not in EXTENSOES:
+        raise ErroUpload('Formato inválido. Use XLSX, XLS ou CSV', 415)
+    if not isinstance(tamanho, int) or tamanho <= 0:
+        raise ErroUpload('Tamanho do arquivo inválido')
+    if tamanho > MAX_UPLOAD:
+        raise ErroUpload(f"Arquivo muito grande (máx. {MAX_UPLOAD // (1024 * 1024)}MB)", 413)
+
+    sessao = {
+        'id': uuid.uuid4().hex,
+        'nome': nome,
+        'tamanho': tamanho,
+        'sha256': (sha256 or '').lower() or None,
+        'criada_em': time.time()
+    }
+    base = os.path.join(_pasta_sessoes(pasta_uploads), sessao['id'])
+    open(base + '.parte', 'wb').close()
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(sessao, f)
+
+    return {'id': sessao['id'], 'recebido': 0, 'tamanho': tamanho, 'tamanho_bloco': TAMANHO_BLOCO}
+
+
+def estado_sessao(pasta_uploads, sessao_id):
+    sessao, _ = _ler_sessao(pasta_uploads, sessao_id)
+    return {'id': sessao['id'], 'recebido': sessao['recebido'], 'tamanho': sessao['tamanho']}
+
+
+def _validar_sessao(amostra, sessao, parte):
+    try:
+        validar_formato(amostra, sessao['nome'])
+    except UnsupportedMediaType as e:
+        # Formato errado não se resolve reenviando: a sessão é descartada
+        os.remove(parte)
+        os.remove(parte[:-len('.parte')] + '.json')
+        raise ErroUpload(e.description, 415) from None
+
+
+def receber_bloco(pasta_uploads, sessao_id, inicio, fluxo):
+    """
+    Acrescenta um bloco lido de fluxo (corpo da requisição) a partir do offset inicio
+
+    O arquivo da sessão fica travado durante a escrita (workers diferentes
+    podem receber blocos da mesma sessão). Offset diferente do já recebido
+    responde 409 com o offset certo; o primeiro bloco tem o formato checado.
+    """
+    sessao, parte = _ler_sessao(pasta_uploads, sessao_id)
+
+    with open(parte, 'ab') as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        recebido = os.fstat(arquivo.fileno()).st_size
+
+        if inicio != recebido:
+            raise ErroUpload('Offset fora de ordem', 409, recebido=recebido)
+
+        amostra = b'' if recebido == 0 else None
+        while True:
+            dados = fluxo.read(_LEITURA)
+            if not dados:
+                break
+            if recebido + len(dados) > sessao['tamanho']:
+                raise ErroUpload('Bloco ultrapassa o tamanho declarado da sessão', 400, recebido=recebido)
+
+            if amostra is not None:
+                amostra += dados[:_AMOSTRA - len(amostra)]
+                if len(amostra) >= min(_AMOSTRA, sessao['tamanho']):
+                    _validar_sessao(amostra, sessao, parte)
+                    amostra = None
+
+            arquivo.write(dados)
+            recebido += len(dados)
+
+        if amostra:
+            _validar_sessao(amostra, sessao, parte)
+
+    return {'id': sessao['id'], 'recebido': recebido, 'tamanho': sessao['tamanho']}
+
+
+def concluir_sessao(pasta_uploads, sessao_id, prefixo):
+    """
+    Confere tamanho e SHA-256 e move o arquivo montado para uploads/<prefixo>_<nome>
+
+    Retorna dict com caminho, nome e sha256. A sessão é removida (também
+    quando o hash não bate).
+    """
+    sessao, parte = _ler_sessao(pasta_uploads, sessao_id)
+    meta = parte[:-len('.parte')] + '.json'
+
+    if sessao['recebido'] != sessao['tamanho']:
+        raise ErroUpload('Upload incompleto', 409, recebido=sessao['recebido'])
+
+    h = hashlib.sha256()
+    with open(parte, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    sha256 = h.hexdigest()
+
+    destino = os.path.join(pasta_uploads, f"{prefixo}_{sessao['nome']}")
+    try:
+        if sessao['sha256'] and sessao['sha256'] != sha256:
+            os.remove(parte)
+            raise ErroUpload('Hash do arquivo não confere (arquivo corrompido no envio)', 422)
+        os.replace(parte, destino)
+    finally:
+        os.remove(meta)
+
+    return {'caminho': destino, 'nome': sessao['nome'], 'sha256': sha256}
+
+
+def limpar_sessoes(pasta_uploads, ttl=None):
+    """Remove sessões abandonadas há mais de ttl segundos e arquivos de uploads interrompidos"""
+    limite = time.time() - (ttl or SESSAO_TTL)
+    pasta_sessoes = _pasta_sessoes(pasta_uploads)
+
+    candidatos = [os.path.join(pasta_sessoes, nome) for nome in os.listdir(pasta_sessoes)]
+    candidatos += [os.path.join(pasta_uploads, nome) for nome in os.listdir(pasta_uploads) if nome.startswith('.recebendo_')]
+
+    for caminho in candidatos:
+        if os.path.isfile(caminho) and os.path.getmtime(caminho) < limite:
+            os.remove(caminho)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reclassificação do Histórico
+Reaplica as regras de metas às métricas já gravadas no Supabase, sem reler planilhas
+
+Uso:
+    python reclassificar.py --simular
+    python reclassificar.py --perfil iniciantes
+    python reclassificar.py --tabelas relatorios --tamanho-pagina 5000
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from regras import obter_regras
+
+TABELAS = ('relatorios', 'snapshots_semanais')
+
+
+def reclassificar_pagina(linhas, regras):
+    """
+    Classifica uma página de linhas do banco com as regras vetorizadas
+
+    Retorna a lista de dicts id/status/motivo só das linhas cujo
+    status ou motivo mudou.
+    """
+    df = pd.DataFrame(linhas)
+
+    def _coluna(nome):
+        return pd.to_numeric(df[nome], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    status, motivo, _ = regras.classificar(
+        _coluna('diamantes'), _coluna('horas'), _coluna('batalhas'),
+        _coluna('perc_batalhas'), _coluna('dias_validos'),
+        df['is_top'].fillna(False).to_numpy(dtype=bool)
+    )
+
+    mudou = (status != df['status'].to_numpy(dtype=object)) | (motivo != df['motivo'].to_numpy(dtype=object))
+    ids = df['id'].to_numpy()
+
+    return [
+        {'id': int(ids[i]), 'status': status[i], 'motivo': motivo[i]}
+        for i in np.flatnonzero(mudou)
+    ]
+
+
+def reclassificar_tabela(db, tabela, regras, tamanho_pagina=1000, simular=False, resultado=None):
+    """
+    Percorre a tabela inteira em páginas e grava as classificações que mudaram
+
+    Retorna dict com linhas lidas, alteradas e contagem por transição
+    (status antigo -> novo). Se resultado for passado, é preenchido a cada
+    bloco gravado: após um erro no meio da tabela, diz o que já foi gravado.
+    """
+    resultado = resultado if resultado is not None else {}
+    resultado.update(lidas=0, alteradas=0, transicoes={})
+    transicoes = resultado['transicoes']
+    apos_id = 0
+
+    while True:
+        linhas = db.buscar_pagina_metricas(tabela, apos_id, tamanho_pagina)
+        if not linhas:
+            break
+
+        mudancas = reclassificar_pagina(linhas, regras)
+        anteriores = {l['id']: l['status'] for l in linhas}
+        for m in mudancas:
+            chave = f"{anteriores[m['id']]} → {m['status']}"
+            transicoes[chave] = transicoes.get(chave, 0) + 1
+
+        if mudancas and not simular:
+            salvo = db.atualizar_classificacoes(tabela, mudancas)
+            if 'erro' in salvo:
+                resultado['alteradas'] += salvo.get('gravadas', 0)
+                raise RuntimeError(salvo['erro'])
+
+        resultado['lidas'] += len(linhas)
+        resultado['alteradas'] += len(mudancas)
+        apos_id = linhas[-1]['id']
+        print(f"   {tabela}: {resultado['lidas']} linhas lidas · {resultado['alteradas']} reclassificadas")
+
+        if len(linhas) < tamanho_pagina:
+            break
+
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reclassifica o histórico gravado com as metas atuais')
+    parser.add_argument('--perfil', default=None, help='Perfil de metas de regras_metas.json (padrão: REGRAS_PERFIL ou "padrao")')
+    parser.add_argument('--tabelas', nargs='+', choices=TABELAS, default=list(TABELAS), help='Tabelas a reclassificar (padrão: ambas)')
+    parser.add_argument('--tamanho-pagina', type=int, default=1000, help='Linhas lidas por consulta (padrão: 1000)')
+    parser.add_argument('--simular', action='store_true', help='Só conta o que mudaria, sem gravar no banco')
+    args = parser.parse_args(argv)
+
+    from database import db
+
+    if not db.is_connected():
+        print("❌ Supabase não configurado (SUPABASE_URL / SUPABASE_KEY)")
+        return 1
+
+    regras = obter_regras(args.perfil)
+    modo = 'simulação' if args.simular else 'gravando'
+    print(f"🔁 Reclassificando com o perfil '{regras.perfil}' (versão {regras.versao}) · {modo}")
+
+    inicio = time.perf_counter()
+    resultados = {}
+
+    try:
+        for tabela in args.tabelas:
+            # Registrado antes de começar: o finally vê o que já foi gravado mesmo se a tabela falhar no meio
+            resultados[tabela] = {}
+            reclassificar_tabela(db, tabela, regras, args.tamanho_pagina, args.simular, resultado=resultados[tabela])
+    except Exception as e:
+        print(f"❌ Erro na reclassificação: {e}")
+        return 1
+    finally:
+        # Status gravados mudaram: painéis e analytics do servidor precisam ser recalculados
+        if not args.simular and any(r.get('alteradas') for r in resultados.values()):
+            from cache import invalidar_relatorios
+            invalidar_relatorios()
+
+    duracao = time.perf_counter() - inicio
+
+    print()
+    print("📊 RESUMO")
+    for tabela, r in resultados.items():
+        print(f"   {tabela}: {r['lidas']} linhas · {r['alteradas']} {'mudariam' if args.simular else 'reclassificadas'}")
+        for transicao, qtd in sorted(r['transicoes'].items(), key=lambda t: -t[1]):
+            print(f"      {transicao}: {qtd}")
+    total = sum(r['lidas'] for r in resultados.values())
+    print(f"   Tempo total: {duracao:.1f}s · {total / max(duracao, 0.001):.0f} linhas/s")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
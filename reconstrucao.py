@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reconstrução de Relatórios
+Refaz o relatório de qualquer semana a partir dos dados gravados (snapshot colunar local ou
+linhas de 'relatorios' no Supabase), sem a planilha original
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from analisador import AnalisadorRelatorio
+from regras import obter_regras
+
+# Snapshots por semana: fora de outputs/, não entram na limpeza dos relatórios
+PASTA_SNAPSHOTS = os.environ.get('SNAPSHOTS_PATH', 'snapshots')
+
+# Só o que a análise precisa para refazer a semana (o resto é recalculado)
+COLUNAS_SNAPSHOT = ['nome', 'diamantes', 'horas', 'dias', 'batalhas', 'perc_bat', 'nota_ia', 'aba']
+
+
+class ReconstrucaoIndisponivel(Exception):
+    """A semana não pôde ser refeita agora (banco fora do ar, erro no processamento)"""
+
+
+_NOME_PERIODO = re.compile(r'^relatorio_(\d{4}-\d{2}-\d{2})_(\d{4}-\d{2}-\d{2})\.html$')
+
+
+def nome_relatorio_periodo(periodo_inicio, periodo_fim):
+    """Nome fixo do relatório reconstruído de uma semana"""
+    return f"relatorio_{periodo_inicio}_{periodo_fim}.html"
+
+
+def periodo_do_nome(nome):
+    """(periodo_inicio, periodo_fim) de um nome gerado por nome_relatorio_periodo, ou None"""
+    encontrado = _NOME_PERIODO.match(nome or '')
+    return encontrado.groups() if encontrado else None
+
+
+def caminho_snapshot(periodo_inicio, periodo_fim, pasta=None):
+    return os.path.join(pasta or PASTA_SNAPSHOTS, f"{periodo_inicio}_{periodo_fim}.parquet")
+
+
+# ==========================================
+# SNAPSHOT COLUNAR (gravado ao publicar)
+# ==========================================
+
+def salvar_snapshot(analisador, periodo_inicio, periodo_fim, pasta=None):
+    """
+    Grava as métricas brutas da semana em Parquet (alguns KB por mil creators)
+
+    Perfil de metas e insights da IA vão nos metadados do arquivo: a
+    reconstrução não chama a IA de novo.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    criadores = analisador.criadores
+    tabela = pa.table({
+        'nome': [c['nome'] for c in criadores],
+        'diamantes': np.array([c['diamantes'] for c in criadores], dtype=np.int64),
+        'horas': np.array([c['horas'] for c in criadores], dtype=np.float64),
+        'dias': np.array([c['dias'] for c in criadores], dtype=np.int16),
+        'batalhas': np.array([c['batalhas'] for c in criadores], dtype=np.int32),
+        'perc_bat': np.array([c['perc_bat'] for c in criadores], dtype=np.float32),
+        'nota_ia': [c.get('nota_ia') for c in criadores],
+        'aba': pa.array([c.get('aba') for c in criadores], type=pa.string()).dictionary_encode()
+    })
+    tabela = tabela.replace_schema_metadata({
+        'perfil': analisador.regras.perfil or '',
+        'insights_ia': analisador.dados_agregados.get('insights_ia') or ''
+    })
+
+    caminho = caminho_snapshot(periodo_inicio, periodo_fim, pasta)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + '.tmp'
+    pq.write_table(tabela, temporario, compression='zstd')
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def listar_snapshots(pasta=None):
+    """Semanas com snapshot local: lista de (periodo_inicio, periodo_fim)"""
+    pasta = pasta or PASTA_SNAPSHOTS
+    if not os.path.isdir(pasta):
+        return []
+
+    periodos = []
+    for nome in os.listdir(pasta):
+        partes = nome[:-len('.parquet')].split('_') if nome.endswith('.parquet') else []
+        if len(partes) == 2:
+            periodos.append(tuple(partes))
+    return periodos
+
+
+def _ler_snapshot(caminho):
+    import pyarrow.parquet as pq
+
+    tabela = pq.read_table(caminho, columns=COLUNAS_SNAPSHOT)
+    meta = {k.decode(): v.decode() for k, v in (tabela.schema.metadata or {}).items()}
+    return tabela.to_pandas(), meta
+
+
+def _ler_banco(db, periodo_inicio, periodo_fim):
+    """Linha mais recente de cada creator da semana em 'relatorios', nas colunas do snapshot"""
+    linhas = db.buscar_relatorio_periodo(periodo_inicio, periodo_fim)
+    if linhas is None:
+        raise ReconstrucaoIndisponivel('Banco de dados indisponível ao ler a semana')
+    if not linhas:
+        return None
+
+    df = pd.DataFrame(linhas)
+    # Semana montada por vários envios (ex: um por sub-agência) e reenvios: vale a última linha de cada creator
+    df = df.sort_values(['data_criacao', 'id']).drop_duplicates('creator_nome', keep='last')
+
+    return pd.DataFrame({
+        'nome': df['creator_nome'],
+        'diamantes': df['diamantes'],
+        'horas': df['horas'],
+        'dias': df['dias_validos'],
+        'batalhas': df['batalhas'],
+        'perc_bat': df['perc_batalhas'],
+        'nota_ia': df['nota_ia'] if 'nota_ia' in df else None,
+        'aba': None
+    })
+
+
+def _planilha(df, periodo_inicio, periodo_fim):
+    """Métricas gravadas -> DataFrame no formato do export do TikTok (entrada do analisador)"""
+    segundos = (pd.to_numeric(df['horas'], errors='coerce').fillna(0) * 3600).round().astype(np.int64)
+    diamantes = pd.to_numeric(df['diamantes'], errors='coerce').fillna(0)
+    perc = pd.to_numeric(df['perc_bat'], errors='coerce').fillna(0)
+
+    planilha = pd.DataFrame({
+        'Nome do criador': df['nome'].to_numpy(),
+        'Diamantes': diamantes.to_numpy(),
+        'Duração da LIVE': (
+            (segundos // 3600).astype(str) + 'h ' + (segundos % 3600 // 60).astype(str) + 'm '
+            + (segundos % 60).astype(str) + 's'
+        ).to_numpy(),
+        'Dias válidos de início de LIVE': df['dias'].to_numpy(),
+        'Batalhas': df['batalhas'].to_numpy(),
+        # Só o percentual foi gravado: diamantes de batalha voltam dele
+        'Diamantes obtidos de batalhas': (diamantes * perc / 100).round().to_numpy(),
+        'Período dos dados': f"{periodo_inicio} a {periodo_fim}"
+    })
+
+    if df['aba'].notna().any():
+        planilha['aba'] = df['aba'].to_numpy()
+    return planilha
+
+
+def montar_analisador(periodo_inicio, periodo_fim, db=None, pasta=None):
+    """
+    Analisador já processado para a semana, a partir do snapshot local ou do banco
+
+    Status e motivos são recalculados com as metas atuais (as mesmas do
+    reclassificar.py); notas e insights da IA gravados são reaproveitados.
+    Retorna (analisador, origem) com origem 'snapshot' ou 'banco', ou
+    (None, None) se a semana não existe em nenhum dos dois. Falha ao ler o
+    banco levanta ReconstrucaoIndisponivel.
+    """
+    caminho = caminho_snapshot(periodo_inicio, periodo_fim, pasta)
+    meta = {}
+
+    if os.path.exists(caminho):
+        dados, meta = _ler_snapshot(caminho)
+        origem = 'snapshot'
+    elif db is not None and db.is_connected():
+        dados = _ler_banco(db, periodo_inicio, periodo_fim)
+        origem = 'banco'
+    else:
+        dados = None
+
+    if dados is None or dados.empty:
+        return None, None
+
+    perfil = meta.get('perfil') or None
+    try:
+        obter_regras(perfil)
+    except ValueError:
+        perfil = None  # Perfil removido do arquivo de metas: usa o padrão
+
+    analisador = AnalisadorRelatorio(
+        caminho, usar_ia=False, perfil=perfil, df=_planilha(dados, periodo_inicio, periodo_fim)
+    )
+    resultado = analisador.processar()
+    if resultado['status'] == 'erro':
+        raise ValueError(resultado['mensagem'])
+
+    notas = {n: nota for n, nota in zip(dados['nome'], dados['nota_ia']) if isinstance(nota, str) and nota}
+    for c in analisador.criadores:
+        c['nota_ia'] = notas.get(c['nome'])
+
+    if meta.get('insights_ia'):
+        analisador.dados_agregados['insights_ia'] = meta['insights_ia']
+
+    return analisador, origem
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registros Compactos de Criadores
+Substituem os dicts por criador (__slots__, classificações compartilhadas)
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+class Classificacao:
+    """status/motivo/ação de um criador - instâncias iguais são compartilhadas"""
+
+    __slots__ = ('status', 'motivo', 'acao')
+
+    def __init__(self, status, motivo, acao):
+        self.status = status
+        self.motivo = motivo
+        self.acao = acao
+
+    def __getitem__(self, chave):
+        try:
+            return getattr(self, chave)
+        except AttributeError:
+            raise KeyError(chave) from None
+
+    def get(self, chave, padrao=None):
+        return getattr(self, chave, padrao)
+
+    def __reduce__(self):
+        return (Classificacao, (self.status, self.motivo, self.acao))
+
+
+class Criador:
+    """
+    Linha processada de um criador
+
+    Aceita acesso como dict (c['nome'], c.get('aba'), c['nota_ia'] = ...)
+    e como atributo (criador.nome no Jinja), então template, banco e
+    Parquet consomem o registro sem mudanças.
+    """
+
+    __slots__ = (
+        'nome', 'diamantes', 'horas', 'diam_hora', 'perc_bat', 'batalhas', 'dias',
+        'classificacao', 'is_top', 'st_diam', 'st_horas', 'st_perc_bat', 'st_bats', 'st_dias',
+        'alertas', 'atencoes', 'aba', 'percentil', 'decil', 'nota_ia', 'var_diamantes', 'tendencia',
+        'anomalias'
+    )
+
+    def __init__(self, nome, diamantes, horas, diam_hora, perc_bat, batalhas, dias,
+                 classificacao, is_top, st_diam, st_horas, st_perc_bat, st_bats, st_dias,
+                 alertas=(), atencoes=(), aba=None, percentil=None, decil=None):
+        self.nome = nome
+        self.diamantes = diamantes
+        self.horas = horas
+        self.diam_hora = diam_hora
+        self.perc_bat = perc_bat
+        self.batalhas = batalhas
+        self.dias = dias
+        self.classificacao = classificacao
+        self.is_top = is_top
+        self.st_diam = st_diam
+        self.st_horas = st_horas
+        self.st_perc_bat = st_perc_bat
+        self.st_bats = st_bats
+        self.st_dias = st_dias
+        self.alertas = alertas
+        self.atencoes = atencoes
+        self.aba = aba
+        self.percentil = percentil
+        self.decil = decil
+        self.nota_ia = None
+        self.var_diamantes = None
+        self.tendencia = ''
+        self.anomalias = ()
+
+    def __getitem__(self, chave):
+        try:
+            return getattr(self, chave)
+        except AttributeError:
+            raise KeyError(chave) from None
+
+    def __setitem__(self, chave, valor):
+        try:
+            setattr(self, chave, valor)
+        except AttributeError:
+            raise KeyError(chave) from None
+
+    def __contains__(self, chave):
+        return chave in self.__slots__
+
+    def get(self, chave, padrao=None):
+        return getattr(self, chave, padrao)
+
+    def keys(self):
+        return self.__slots__
+
+    @property
+    def motivos(self):
+        """Formato das caixas de alertas/atenções do relatório"""
+        return [self.classificacao.motivo]
+
+    def __getstate__(self):
+        return tuple(getattr(self, campo) for campo in self.__slots__)
+
+    def __setstate__(self, estado):
+        for campo, valor in zip(self.__slots__, estado):
+            setattr(self, campo, valor)
+
+    def __repr__(self):
+        return f"Criador({self.nome!r}, diamantes={self.diamantes}, status={self.classificacao.status!r})"
+
+
+def montar_criadores(colunas, status, motivo, acao):
+    """
+    Cria os registros a partir de listas alinhadas
+
+    colunas: dict campo -> lista de valores (mesmos nomes dos atributos).
+    status/motivo/ação se repetem muito entre criadores: strings internadas
+    e um único objeto Classificacao por combinação.
+    """
+    classificacoes = {}
+
+    def _classificacao(s, m, a):
+        chave = (s, m, a)
+        item = classificacoes.get(chave)
+        if item is None:
+            item = classificacoes[chave] = Classificacao(sys.intern(s), sys.intern(m), sys.intern(a))
+        return item
+
+    campos = list(colunas)
+    return [
+        Criador(classificacao=_classificacao(s, m, a), **dict(zip(campos, valores)))
+        for s, m, a, *valores in zip(status, motivo, acao, *colunas.values())
+    ]
+
+
+def valores_compartilhados(serie):
+    """
+    Lista de valores de uma coluna de baixa cardinalidade (emojis, abas)
+    em que valores iguais são o mesmo objeto str
+    """
+    codigos, unicos = pd.factorize(serie)
+    return np.asarray(unicos, dtype=object)[codigos].tolist()
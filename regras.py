@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Regras de Metas Configuráveis
+Carrega os perfis de METAS de um arquivo versionado e compila em arrays NumPy
+"""
+
+import copy
+import json
+import os
+import threading
+
+import numpy as np
+
+# Metas e alertas (seção 2 do manual) - usadas quando não há arquivo de regras
+METAS_PADRAO = {
+    'diamantes': {'ideal': 12500, 'alerta': 3000},
+    'horas': {'ideal': 25, 'alerta': 20},
+    'dias': {'ideal': 3, 'alerta': 2},
+    'batalhas': {'ideal': 20, 'alerta': 5},
+    'perc_batalhas': {'ideal': 50, 'alerta': 20}
+}
+
+# Ordem dos indicadores nos arrays compilados
+INDICADORES = ['diamantes', 'horas', 'batalhas', 'perc_batalhas', 'dias']
+
+PERFIL_PADRAO = 'padrao'
+ARQUIVO_REGRAS = os.environ.get('REGRAS_METAS_PATH', 'regras_metas.json')
+
+STATUS_EMOJI = np.array(['🔴', '🟡', '🟢'], dtype=object)
+
+
+def _numero(valor):
+    """Formata número no padrão brasileiro (12500 -> '12.500', 2.5 -> '2,5')"""
+    if float(valor) == int(valor):
+        return f"{int(valor):,}".replace(',', '.')
+    return f"{valor}".replace('.', ',')
+
+
+class RegrasCompiladas:
+    """Perfil de metas compilado em arrays (ideal/alerta) e rótulos prontos"""
+
+    def __init__(self, perfil, versao, metas):
+        self.perfil = perfil
+        self.versao = versao
+        self.metas = metas
+
+        self.ideal = np.array([metas[i]['ideal'] for i in INDICADORES], dtype=float)
+        self.alerta = np.array([metas[i]['alerta'] for i in INDICADORES], dtype=float)
+
+        # Rótulos usados nas mensagens e no template (ex: '3.000', '20h', '50%')
+        sufixos = {'horas': 'h', 'perc_batalhas': '%'}
+        self.rotulos = {
+            ind: {
+                'ideal': _numero(metas[ind]['ideal']) + sufixos.get(ind, ''),
+                'alerta': _numero(metas[ind]['alerta']) + sufixos.get(ind, '')
+            }
+            for ind in metas
+        }
+
+        # Motivos por quantidade de indicadores OK (0 a 5) - só existem 6 variações
+        self._motivos_top = np.array(
+            [f"Top creator com {n * 20}% indicadores OK" for n in range(6)], dtype=object
+        )
+        self._motivos_amarelo = np.array(
+            [f"{n * 20}% indicadores OK" for n in range(6)], dtype=object
+        )
+
+    def status(self, indicador, valores):
+        """Retorna array de emojis 🟢/🟡/🔴 para os valores de um indicador"""
+        valores = np.asarray(valores, dtype=float)
+        meta = self.metas[indicador]
+        nivel = (valores >= meta['alerta']).astype(np.int8) + (valores >= meta['ideal'])
+        return STATUS_EMOJI[nivel]
+
+    def status_valor(self, indicador, valor):
+        """Status de um único valor (ex: média da agência)"""
+        return self.status(indicador, [valor])[0]
+
+    def classificar(self, diamantes, horas, batalhas, perc_batalhas, dias, is_top):
+        """
+        Versão vetorizada de classificar_criador_com_ia
+
+        Recebe arrays alinhados e retorna (status, motivo, acao) como arrays.
+        Tops com 60%+ indicadores OK não vão para vermelho.
+        """
+        matriz = np.column_stack([
+            np.asarray(diamantes, dtype=float),
+            np.asarray(horas, dtype=float),
+            np.asarray(batalhas, dtype=float),
+            np.asarray(perc_batalhas, dtype=float),
+            np.asarray(dias, dtype=float)
+        ])
+        n_ok = (matriz >= self.ideal).sum(axis=1)
+        is_top = np.asarray(is_top, dtype=bool)
+
+        top_ok = is_top & (n_ok >= 3)
+        diam_baixo = ~top_ok & (matriz[:, 0] < self.metas['diamantes']['alerta'])
+        multiplos = ~top_ok & ~diam_baixo & (n_ok <= 1)
+        abaixo = ~top_ok & ~diam_baixo & ~multiplos & (n_ok < 3)
+
+        status = np.select(
+            [top_ok, diam_baixo, multiplos, abaixo],
+            ['amarelo', 'vermelho', 'vermelho', 'amarelo'],
+            default='verde'
+        ).astype(object)
+
+        motivo = np.full(len(n_ok), 'Todas métricas em dia', dtype=object)
+        motivo[top_ok] = self._motivos_top[n_ok[top_ok]]
+        motivo[multiplos] = 'Múltiplos indicadores críticos'
+        motivo[abaixo] = self._motivos_amarelo[n_ok[abaixo]]
+        alerta_diam = self.rotulos['diamantes']['alerta']
+        motivo[diam_baixo] = [
+            f"Diamantes abaixo do alerta ({int(v)} < {alerta_diam})" for v in matriz[diam_baixo, 0]
+        ]
+
+        acao = np.select(
+            [top_ok, diam_baixo | multiplos, abaixo],
+            ['Monitorar e otimizar pontos de atenção', 'Contato imediato', 'Monitorar e orientar'],
+            default='Manter estratégia'
+        ).astype(object)
+
+        return status, motivo, acao
+
+
+# ==========================================
+# CARREGAMENTO E CACHE POR PROCESSO
+# ==========================================
+
+_lock = threading.Lock()
+_cache = {'mtime': None, 'versao': None, 'perfis': {}, 'compiladas': {}}
+
+
+def _ler_arquivo(caminho):
+    """Lê o arquivo de regras; sem arquivo, vale só o perfil padrão (versão 0)"""
+    if not os.path.exists(caminho):
+        return 0, {PERFIL_PADRAO: METAS_PADRAO}
+
+    with open(caminho, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    return config.get('versao', 0), config.get('perfis', {})
+
+
+def _resolver_perfil(perfis, nome, visitados=None):
+    """Monta as metas de um perfil, aplicando herança ('herda') sobre o padrão"""
+    visitados = visitados or set()
+    if nome in visitados:
+        raise ValueError(f"Herança circular no perfil de metas '{nome}'")
+    visitados.add(nome)
+
+    if nome not in perfis and nome != PERFIL_PADRAO:
+        raise ValueError(f"Perfil de metas não encontrado: {nome}")
+
+    definicao = perfis.get(nome, {})
+    base_nome = definicao.get('herda', PERFIL_PADRAO if nome != PERFIL_PADRAO else None)
+    metas = _resolver_perfil(perfis, base_nome, visitados) if base_nome else copy.deepcopy(METAS_PADRAO)
+
+    for indicador, valores in definicao.items():
+        if indicador == 'herda':
+            continue
+        if indicador not in METAS_PADRAO:
+            raise ValueError(f"Indicador desconhecido no perfil '{nome}': {indicador}")
+        metas[indicador] = {**metas[indicador], **valores}
+
+    return metas
+
+
+def obter_regras(perfil=None, caminho=None):
+    """
+    Retorna as regras compiladas de um perfil (cache por processo)
+
+    O arquivo só é relido quando muda no disco; se a 'versao' mudar,
+    todos os perfis compilados são descartados e recompilados sob demanda.
+    """
+    perfil = perfil or os.environ.get('REGRAS_PERFIL', PERFIL_PADRAO)
+    caminho = caminho or ARQUIVO_REGRAS
+
+    try:
+        mtime = os.path.getmtime(caminho)
+    except OSError:
+        mtime = None
+
+    with _lock:
+        if mtime != _cache['mtime'] or caminho != _cache.get('caminho'):
+            versao, perfis = _ler_arquivo(caminho)
+            if versao != _cache['versao'] or caminho != _cache.get('caminho'):
+                _cache['compiladas'] = {}
+                if _cache['versao'] is not None:
+                    print(f"🔄 Regras de metas recarregadas (versão {versao})")
+            _cache.update({'mtime': mtime, 'versao': versao, 'perfis': perfis, 'caminho': caminho})
+
+        if perfil not in _cache['compiladas']:
+            metas = _resolver_perfil(_cache['perfis'], perfil)
+            _cache['compiladas'][perfil] = RegrasCompiladas(perfil, _cache['versao'], metas)
+
+        return _cache['compiladas'][perfil]
+
+
+def listar_perfis(caminho=None):
+    """Lista os perfis disponíveis no arquivo de regras"""
+    _, perfis = _ler_arquivo(caminho or ARQUIVO_REGRAS)
+    return sorted(set(perfis) | {PERFIL_PADRAO})
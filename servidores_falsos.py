@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidores Falsos para Testes de Carga
+Supabase (subconjunto do PostgREST em memória) e API da Anthropic, com latência configurável
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+class Latencia:
+    """Atraso artificial: média ± variação (segundos), sorteado a cada resposta"""
+
+    def __init__(self, media=0.0, variacao=0.0):
+        self.media = media
+        self.variacao = variacao
+
+    def esperar(self):
+        atraso = self.media + random.uniform(-self.variacao, self.variacao)
+        if atraso > 0:
+            time.sleep(atraso)
+
+
+class _Servidor:
+    """Servidor HTTP em thread própria (porta 0 = livre escolhida pelo sistema)"""
+
+    def __init__(self, handler, porta=0):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', porta), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.dono = self
+        self.chamadas = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def contar(self):
+        with self._lock:
+            self.chamadas += 1
+
+    def iniciar(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def parar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ==========================================
+# SUPABASE (POSTGREST)
+# ==========================================
+
+_OPERADORES = {
+    'eq': lambda a, b: a == b,
+    'neq': lambda a, b: a != b,
+    'gt': lambda a, b: a is not None and a > b,
+    'gte': lambda a, b: a is not None and a >= b,
+    'lt': lambda a, b: a is not None and a < b,
+    'lte': lambda a, b: a is not None and a <= b
+}
+
+# Parâmetros da URL que não são filtros de coluna
+_RESERVADOS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+
+# Chaves únicas usadas pelos upserts da aplicação
+_UNICAS = {'snapshots_semanais': ('creator_nome', 'periodo_fim')}
+
+
+def _converter(valor, referencia):
+    """Texto do filtro -> tipo da coluna (PostgREST recebe tudo como texto)"""
+    if valor == 'null':
+        return None
+    if isinstance(referencia, bool):
+        return valor == 'true'
+    if isinstance(referencia, int):
+        return int(float(valor))
+    if isinstance(referencia, float):
+        return float(valor)
+    return valor
+
+
+class SupabaseFalso(_Servidor):
+    """
+    Subconjunto do PostgREST em memória: select com filtros (eq, neq, gt,
+    gte, lt, lte, in), order, limit/offset, count=exact, insert, upsert,
+    update, delete e as funções atualizar_classificacoes e substituir_relatorios
+
+    Suficiente para as consultas de database.py; tabelas são listas de dicts.
+    """
+
+    def __init__(self, latencia=None, porta=0):
+        super().__init__(_HandlerSupabase, porta)
+        self.latencia = latencia or Latencia()
+        self.tabelas = {}
+        self._ids = {}
+        # Índices: por creator (filtro mais comum do painel) e pela chave única dos upserts
+        self._por_creator = {}
+        self._unicos = {}
+        self._lock_dados = threading.Lock()
+
+    def inserir(self, tabela, linhas):
+        """Carga direta (sem HTTP); retorna as linhas com id"""
+        with self._lock_dados:
+            return [self._inserir(tabela, linha) for linha in linhas]
+
+    def _inserir(self, tabela, linha):
+        linhas = self.tabelas.setdefault(tabela, [])
+        if 'id' not in linha:
+            self._ids[tabela] = self._ids.get(tabela, 0) + 1
+            linha = {'id': self._ids[tabela], **linha}
+        linhas.append(linha)
+        self._por_creator.setdefault(tabela, {}).setdefault(linha.get('creator_nome'), []).append(linha)
+        if tabela in _UNICAS:
+            self._unicos[(tabela, tuple(linha.get(c) for c in _UNICAS[tabela]))] = linha
+        return linha
+
+    def _upsert(self, tabela, linha, conflito):
+        if conflito == _UNICAS.get(tabela):
+            existente = self._unicos.get((tabela, tuple(linha.get(c) for c in conflito)))
+        else:
+            existente = next((l for l in self.tabelas.get(tabela, [])
+                              if all(l.get(c) == linha.get(c) for c in conflito)), None)
+        if existente is not None:
+            existente.update(linha)
+            return existente
+        return self._inserir(tabela, dict(linha))
+
+    def _filtrar(self, tabela, filtros):
+        linhas = self.tabelas.get(tabela, [])
+        por_nome = dict(filtros).get('creator_nome', '')
+        if por_nome.startswith('eq.'):
+            linhas = self._por_creator.get(tabela, {}).get(por_nome[3:], [])
+        for coluna, expressao in filtros:
+            operador, _, valor = expressao.partition('.')
+            if operador == 'in':
+                opcoes = [v.strip('"') for v in valor.strip('()').split(',')]
+                linhas = [l for l in linhas if str(l.get(coluna)) in opcoes]
+            elif operador == 'is':
+                linhas = [l for l in linhas if l.get(coluna) is None] if valor == 'null' else linhas
+            else:
+                comparar = _OPERADORES[operador]
+                linhas = [l for l in linhas if comparar(l.get(coluna), _converter(valor, l.get(coluna)))]
+        return linhas
+
+    def consultar(self, metodo, tabela, params, corpo, prefer):
+        """Executa uma requisição PostgREST; retorna (status, linhas, total)"""
+        filtros = [(k, v) for k, v in params if k not in _RESERVADOS]
+        opcoes = dict(params)
+
+        with self._lock_dados:
+            if metodo == 'GET':
+                linhas = self._filtrar(tabela, filtros)
+                for chave in reversed((opcoes.get('order') or '').split(',')):
+                    if chave:
+                        coluna, _, direcao = chave.partition('.')
+                        linhas = sorted(linhas, key=lambda l: (l.get(coluna) is None, l.get(coluna)),
+                                        reverse=direcao.startswith('desc'))
+                total = len(linhas)
+                inicio = int(opcoes.get('offset', 0))
+                fim = inicio + int(opcoes['limit']) if 'limit' in opcoes else None
+                linhas = linhas[inicio:fim]
+
+                colunas = [c.strip() for c in (opcoes.get('select') or '*').split(',')]
+                if '*' not in colunas:
+                    linhas = [{c: l.get(c) for c in colunas} for l in linhas]
+                return 200, [dict(l) for l in linhas], total
+
+            novas = corpo if isinstance(corpo, list) else [corpo]
+
+            if metodo == 'POST':
+                if 'merge-duplicates' in prefer:
+                    conflito = tuple((opcoes.get('on_conflict') or '').split(',')) if opcoes.get('on_conflict') \
+                        else _UNICAS.get(tabela, ('id',))
+                    gravadas = [self._upsert(tabela, linha, conflito) for linha in novas]
+                else:
+                    gravadas = [self._inserir(tabela, dict(linha)) for linha in novas]
+                return 201, [dict(l) for l in gravadas], len(gravadas)
+
+            if metodo == 'PATCH':
+                alvos = self._filtrar(tabela, filtros)
+                for linha in alvos:
+                    linha.update(corpo)
+                return 200, [dict(l) for l in alvos], len(alvos)
+
+            if metodo == 'DELETE':
+                alvos = self._filtrar(tabela, filtros)
+                ids = {id(l) for l in alvos}
+                restantes = [l for l in self.tabelas.get(tabela, []) if id(l) not in ids]
+                self.tabelas[tabela] = []
+                self._por_creator[tabela] = {}
+                self._unicos = {k: v for k, v in self._unicos.items() if k[0] != tabela}
+                for linha in restantes:
+                    self._inserir(tabela, linha)
+                return 200, [], len(alvos)
+
+        return 405, [], 0
+
+    def rpc(self, funcao, corpo):
+        if funcao == 'substituir_relatorios':
+            return self._substituir_relatorios(corpo['linhas'])
+        if funcao != 'atualizar_classificacoes':
+            return 404, {'message': f'function {funcao} not found'}
+        with self._lock_dados:
+            por_id = {l['id']: l for l in self.tabelas.get(corpo['tabela'], [])}
+            for linha in corpo['linhas']:
+                if linha['id'] in por_id:
+                    por_id[linha['id']].update(status=linha['status'], motivo=linha['motivo'])
+        return 200, len(corpo['linhas'])
+
+
+    def _substituir_relatorios(self, linhas):
+        chaves = {(l['creator_nome'], l['periodo_inicio'], l['periodo_fim']) for l in linhas}
+        with self._lock_dados:
+            restantes = [l for l in self.tabelas.get('relatorios', [])
+                         if (l.get('creator_nome'), l.get('periodo_inicio'), l.get('periodo_fim')) not in chaves]
+            self.tabelas['relatorios'] = []
+            self._por_creator['relatorios'] = {}
+            for linha in restantes:
+                self._inserir('relatorios', linha)
+            for linha in linhas:
+                self._inserir('relatorios', dict(linha))
+        return 200, len(linhas)
+
+
+class _HandlerSupabase(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, dados, cabecalhos=None):
+        corpo = json.dumps(dados, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _tratar(self):
+        servidor = self.server.dono
+        servidor.contar()
+        servidor.latencia.esperar()
+
+        partes = urlsplit(self.path)
+        params = parse_qsl(partes.query, keep_blank_values=True)
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        corpo = json.loads(self.rfile.read(tamanho)) if tamanho else None
+
+        caminho = re.match(r'^/rest/v1/(rpc/)?([\w]+)$', partes.path)
+        if not caminho:
+            return self._responder(404, {'message': 'not found'})
+
+        if caminho.group(1):
+            status, dados = servidor.rpc(caminho.group(2), corpo or {})
+            return self._responder(status, dados)
+
+        prefer = self.headers.get('Prefer', '')
+        status, linhas, total = servidor.consultar(self.command, caminho.group(2), params, corpo, prefer)
+
+        contagem = str(total) if 'count=exact' in prefer else '*'
+        cabecalhos = {'Content-Range': f"0-{max(len(linhas) - 1, 0)}/{contagem}"}
+        if self.command != 'GET' and 'return=minimal' in prefer:
+            return self._responder(status, [], cabecalhos)
+        self._responder(status, linhas, cabecalhos)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _tratar
+
+
+# ==========================================
+# ANTHROPIC (MESSAGES API)
+# ==========================================
+
+class AnthropicFalso(_Servidor):
+    """
+    /v1/messages com latência configurável
+
+    Prompts de notas em lote recebem JSON nome -> nota; os demais, um texto
+    fixo no formato dos insights.
+    """
+
+    def __init__(self, latencia=None, taxa_erro=0.0, porta=0):
+        super().__init__(_HandlerAnthropic, porta)
+        self.latencia = latencia or Latencia()
+        self.taxa_erro = taxa_erro
+
+
+class _HandlerAnthropic(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        servidor = self.server.dono
+        servidor.contar()
+        corpo = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        servidor.latencia.esperar()
+
+        if random.random() < servidor.taxa_erro:
+            resposta, status = {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Overloaded'}}, 529
+        else:
+            prompt = corpo.get('messages', [{}])[0].get('content', '')
+            if 'CREATORS (um JSON' in prompt:
+                nomes = [json.loads(l)['nome'] for l in prompt.splitlines() if l.startswith('{"nome"')]
+                texto = json.dumps({nome: 'Foque em constância: mais dias de live nesta semana.' for nome in nomes},
+                                   ensure_ascii=False)
+            else:
+                texto = ("🔧 **Recomendações Práticas:**\n- Reforçar lives nos dias fortes\n"
+                         "- Acompanhar de perto os creators em alerta\n\n"
+                         "⚠️ **Observações Críticas:**\n- Semana estável em diamantes")
+            resposta, status = {
+                'id': 'msg_carga', 'type': 'message', 'role': 'assistant', 'model': corpo.get('model', 'falso'),
+                'content': [{'type': 'text', 'text': texto}],
+                'stop_reason': 'end_turn', 'stop_sequence': None,
+                'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': len(texto) // 4}
+            }, 200
+
+        dados = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
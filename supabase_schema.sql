@@ -0,0 +1,120 @@
+-- ====================================
+-- OLAH AGÊNCIA - ESQUEMA SUPABASE (tabelas auxiliares)
+-- ====================================
+-- Execute no SQL Editor do Supabase.
+-- As tabelas 'usuarios' e 'relatorios' já existem desde a v3.0.
+
+-- ------------------------------------
+-- Snapshot semanal por creator
+-- ------------------------------------
+-- Uma linha por creator/semana, gravada via upsert em salvar_relatorio.
+-- Reenvios da mesma semana sobrescrevem a linha em vez de duplicar.
+CREATE TABLE IF NOT EXISTS snapshots_semanais (
+    id BIGSERIAL PRIMARY KEY,
+    creator_nome TEXT NOT NULL,
+    periodo_inicio TEXT NOT NULL,
+    periodo_fim TEXT NOT NULL,
+    diamantes BIGINT NOT NULL DEFAULT 0,
+    horas DOUBLE PRECISION NOT NULL DEFAULT 0,
+    batalhas INTEGER NOT NULL DEFAULT 0,
+    dias_validos INTEGER NOT NULL DEFAULT 0,
+    perc_batalhas DOUBLE PRECISION NOT NULL DEFAULT 0,
+    diamantes_por_hora DOUBLE PRECISION NOT NULL DEFAULT 0,
+    status TEXT,
+    motivo TEXT,
+    is_top BOOLEAN NOT NULL DEFAULT FALSE,
+    atualizado_em TEXT,
+    UNIQUE (creator_nome, periodo_fim)
+);
+
+-- A restrição UNIQUE já cria o índice (creator_nome, periodo_fim) usado pelo gráfico.
+CREATE INDEX IF NOT EXISTS idx_snapshots_periodo_fim ON snapshots_semanais (periodo_fim);
+
+-- Carga inicial a partir do histórico existente (último envio de cada semana vence)
+INSERT INTO snapshots_semanais (
+    creator_nome, periodo_inicio, periodo_fim, diamantes, horas, batalhas,
+    dias_validos, perc_batalhas, diamantes_por_hora, status, motivo, is_top, atualizado_em
+)
+SELECT DISTINCT ON (creator_nome, periodo_fim)
+    creator_nome, periodo_inicio, periodo_fim, diamantes, horas, batalhas,
+    dias_validos, perc_batalhas, diamantes_por_hora, status, motivo, is_top, data_criacao
+FROM relatorios
+ORDER BY creator_nome, periodo_fim, data_criacao DESC
+ON CONFLICT (creator_nome, periodo_fim) DO NOTHING;
+
+-- ------------------------------------
+-- Nota de coaching gerada por IA (creators em alerta/atenção)
+-- ------------------------------------
+ALTER TABLE relatorios ADD COLUMN IF NOT EXISTS nota_ia TEXT;
+
+-- ------------------------------------
+-- Reclassificação em lote (reclassificar.py)
+-- ------------------------------------
+-- Um UPDATE por bloco de linhas {id, status, motivo} em vez de um por linha.
+CREATE OR REPLACE FUNCTION atualizar_classificacoes(tabela TEXT, linhas JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    total INTEGER;
+BEGIN
+    IF tabela NOT IN ('relatorios', 'snapshots_semanais') THEN
+        RAISE EXCEPTION 'Tabela não permitida: %', tabela;
+    END IF;
+
+    EXECUTE format(
+        'UPDATE %I AS t SET status = l.status, motivo = l.motivo
+         FROM jsonb_to_recordset($1) AS l(id BIGINT, status TEXT, motivo TEXT)
+         WHERE t.id = l.id', tabela
+    ) USING linhas;
+
+    GET DIAGNOSTICS total = ROW_COUNT;
+    RETURN total;
+END;
+$$;
+
+-- ------------------------------------
+-- Reprocessamento em lote (processar_lote.py --banco-lote)
+-- ------------------------------------
+-- Troca as linhas de cada creator/semana do bloco numa única transação:
+-- se o INSERT falhar, o DELETE é desfeito e o histórico fica como estava.
+CREATE OR REPLACE FUNCTION substituir_relatorios(linhas JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    total INTEGER;
+BEGIN
+    DELETE FROM relatorios AS r
+    USING (
+        SELECT DISTINCT creator_nome, periodo_inicio, periodo_fim
+        FROM jsonb_populate_recordset(NULL::relatorios, linhas)
+    ) AS l
+    WHERE r.creator_nome = l.creator_nome
+      AND r.periodo_inicio = l.periodo_inicio
+      AND r.periodo_fim = l.periodo_fim;
+
+    INSERT INTO relatorios (
+        periodo_inicio, periodo_fim, creator_nome, diamantes, horas, batalhas, dias_validos,
+        perc_batalhas, diamantes_por_hora, status, motivo, is_top, nota_ia, data_criacao
+    )
+    SELECT periodo_inicio, periodo_fim, creator_nome, diamantes, horas, batalhas, dias_validos,
+           perc_batalhas, diamantes_por_hora, status, motivo, is_top, nota_ia, data_criacao
+    FROM jsonb_populate_recordset(NULL::relatorios, linhas);
+
+    GET DIAGNOSTICS total = ROW_COUNT;
+    RETURN total;
+END;
+$$;
+
+-- ------------------------------------
+-- Relatórios reconstruídos a partir do banco
+-- ------------------------------------
+-- Leitura das linhas de uma semana em 'relatorios' (reconstrucao.py)
+CREATE INDEX IF NOT EXISTS idx_relatorios_periodo ON relatorios (periodo_fim, periodo_inicio, id);
+
+-- Semanas disponíveis para a tela de histórico
+CREATE OR REPLACE VIEW periodos_relatorios AS
+SELECT periodo_inicio, periodo_fim, COUNT(*) AS n_criadores, SUM(diamantes) AS total_diamantes
+FROM snapshots_semanais
+GROUP BY periodo_inicio, periodo_fim;
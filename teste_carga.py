@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Teste de Carga
+Sobe a aplicação no gunicorn contra Supabase e Anthropic falsos e mede latência/vazão por rota
+
+Uso:
+    python teste_carga.py
+    python teste_carga.py --creators 80 --admins 4 --duracao 120 --workers 2 --threads 4
+    python teste_carga.py --latencia-banco 0.05 --latencia-ia 3 --mix-admin upload=1,pdf=1
+    python teste_carga.py --url http://localhost:5000 --sem-servidores   (app já rodando)
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import bcrypt
+import httpx
+import numpy as np
+
+from servidores_falsos import AnthropicFalso, Latencia, SupabaseFalso
+
+SENHA = 'carga123'
+ADMIN_EMAIL = 'admin@carga.local'
+
+MIX_ADMIN_PADRAO = 'upload=2,pdf=1,relatorio=3,api_criadores=3,analytics=1'
+
+# Primeira semana do histórico semeado (segunda-feira)
+SEMANA_BASE = date(2024, 1, 1)
+
+
+# ==========================================
+# DADOS
+# ==========================================
+
+def _metricas(rng):
+    """Métricas de uma semana com distribuição parecida com a real (cauda longa em diamantes)"""
+    horas = round(float(rng.gamma(3, 8)), 2)
+    batalhas = int(rng.poisson(15))
+    return {
+        'diamantes': int(rng.lognormal(8.5, 1.4)),
+        'horas': horas,
+        'batalhas': batalhas,
+        'dias_validos': int(rng.integers(0, 8)),
+        'perc_batalhas': round(float(rng.uniform(0, 100)), 1)
+    }
+
+
+def semear(supabase, n_criadores, n_semanas, semente=42):
+    """
+    Usuários (1 admin + 1 por creator), relatórios e snapshots das últimas semanas
+
+    Retorna a lista de nomes dos creators.
+    """
+    rng = np.random.default_rng(semente)
+    nomes = [f"creator{i:05d}" for i in range(n_criadores)]
+
+    # Custo baixo: o teste mede a aplicação, não o bcrypt (BCRYPT_ROUNDS=4 no app)
+    senha_hash = bcrypt.hashpw(SENHA.encode('utf-8'), bcrypt.gensalt(rounds=4)).decode('utf-8')
+    supabase.inserir('usuarios', [
+        {'email': ADMIN_EMAIL, 'senha_hash': senha_hash, 'tipo': 'admin', 'nome_display': 'admin', 'criadores_gerenciados': []}
+    ] + [
+        {'email': f"{nome}@carga.local", 'senha_hash': senha_hash, 'tipo': 'creator', 'nome_display': nome, 'criadores_gerenciados': []}
+        for nome in nomes
+    ])
+
+    relatorios = []
+    for s in range(n_semanas):
+        inicio = SEMANA_BASE + timedelta(weeks=s)
+        fim = inicio + timedelta(days=6)
+        for nome in nomes:
+            m = _metricas(rng)
+            relatorios.append({
+                'periodo_inicio': inicio.isoformat(),
+                'periodo_fim': fim.isoformat(),
+                'creator_nome': nome,
+                **m,
+                'diamantes_por_hora': round(m['diamantes'] / m['horas'], 2) if m['horas'] else 0,
+                'status': random.choice(['verde', 'amarelo', 'vermelho']),
+                'motivo': 'Carga inicial',
+                'is_top': False,
+                'data_criacao': f"{fim.isoformat()}T12:00:00"
+            })
+
+    supabase.inserir('relatorios', relatorios)
+    supabase.inserir('snapshots_semanais', [
+        {**{k: v for k, v in r.items() if k != 'data_criacao'}, 'atualizado_em': r['data_criacao']}
+        for r in relatorios
+    ])
+    return nomes
+
+
+def gerar_planilha(nomes, semana, semente=None):
+    """CSV no formato do export do TikTok para a semana informada (índice a partir de SEMANA_BASE)"""
+    rng = np.random.default_rng(semente)
+    inicio = SEMANA_BASE + timedelta(weeks=semana)
+    periodo = f"{inicio.isoformat()} a {(inicio + timedelta(days=6)).isoformat()}"
+
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(['Nome do criador', 'Diamantes', 'Duração da LIVE', 'Dias válidos de início de LIVE',
+                       'Batalhas', 'Diamantes obtidos de batalhas', 'Período dos dados'])
+    for nome in nomes:
+        m = _metricas(rng)
+        segundos = int(m['horas'] * 3600)
+        escritor.writerow([
+            nome, m['diamantes'], f"{segundos // 3600}h {segundos % 3600 // 60}m {segundos % 60}s",
+            m['dias_validos'], m['batalhas'], int(m['diamantes'] * m['perc_batalhas'] / 100), periodo
+        ])
+    return buffer.getvalue().encode('utf-8')
+
+
+# ==========================================
+# APLICAÇÃO
+# ==========================================
+
+def iniciar_app(porta, workers, threads, ambiente, pasta):
+    """Sobe o gunicorn como no Dockerfile (pasta de trabalho própria) e espera o /health"""
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    comando = [
+        sys.executable, '-m', 'gunicorn', '--bind', f"127.0.0.1:{porta}",
+        '--workers', str(workers), '--threads', str(threads), '--timeout', '300',
+        '--log-level', 'warning', 'app:app'
+    ]
+    env = {
+        **os.environ,
+        'PYTHONPATH': raiz,
+        'REGRAS_METAS_PATH': os.path.join(raiz, 'regras_metas.json'),
+        'ARMAZENAMENTO_PATH': os.path.join(pasta, 'armazenamento.db'),
+        'TMPDIR': pasta,
+        **ambiente
+    }
+    log = open(os.path.join(pasta, 'app.log'), 'w')
+    processo = subprocess.Popen(comando, cwd=pasta, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    url = f"http://127.0.0.1:{porta}"
+    prazo = time.monotonic() + 60
+    while time.monotonic() < prazo:
+        if processo.poll() is not None:
+            raise RuntimeError(f"gunicorn encerrou (código {processo.returncode}); veja {log.name}")
+        try:
+            if httpx.get(url + '/health', timeout=2).status_code == 200:
+                return processo, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+
+    processo.terminate()
+    raise RuntimeError(f"Aplicação não respondeu em 60s; veja {log.name}")
+
+
+# ==========================================
+# USUÁRIOS VIRTUAIS
+# ==========================================
+
+class Resultados:
+    """Latências por rota (thread-safe)"""
+
+    def __init__(self):
+        self.medicoes = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, rota, segundos, status):
+        with self._lock:
+            self.medicoes.setdefault(rota, []).append((segundos, status))
+
+    def resumo(self, duracao):
+        linhas = []
+        for rota, medicoes in sorted(self.medicoes.items()):
+            tempos = np.array([m[0] for m in medicoes]) * 1000
+            erros = sum(1 for _, status in medicoes if not status or status >= 400)
+            linhas.append({
+                'rota': rota,
+                'requisicoes': len(medicoes),
+                'erros': erros,
+                'rps': round(len(medicoes) / duracao, 2),
+                'p50_ms': round(float(np.percentile(tempos, 50)), 1),
+                'p95_ms': round(float(np.percentile(tempos, 95)), 1),
+                'p99_ms': round(float(np.percentile(tempos, 99)), 1),
+                'max_ms': round(float(tempos.max()), 1)
+            })
+        return linhas
+
+
+def _medir(resultados, rota, cliente, metodo, caminho, **kwargs):
+    inicio = time.perf_counter()
+    try:
+        resposta = cliente.request(metodo, caminho, **kwargs)
+        resposta.read()
+        status = resposta.status_code
+    except httpx.HTTPError:
+        resposta, status = None, 0
+    resultados.registrar(rota, time.perf_counter() - inicio, status)
+    return resposta
+
+
+def _login(cliente, email, resultados):
+    resposta = _medir(resultados, 'login', cliente, 'POST', '/login', data={'email': email, 'senha': SENHA})
+    return resposta is not None and resposta.status_code == 302
+
+
+class EstadoAdmin:
+    """Relatórios gerados durante o teste (alvo de /pdf, /relatorio e /api/...)"""
+
+    def __init__(self, nomes, primeira_semana):
+        self.nomes = nomes
+        self.relatorios = []
+        self._semana = primeira_semana
+        self._lock = threading.Lock()
+
+    def proxima_semana(self):
+        with self._lock:
+            self._semana += 1
+            return self._semana
+
+    def adicionar(self, arquivo):
+        with self._lock:
+            self.relatorios.append(arquivo)
+
+    def sortear(self):
+        with self._lock:
+            return random.choice(self.relatorios) if self.relatorios else None
+
+
+def _acao_admin(acao, cliente, estado, resultados):
+    if acao == 'upload':
+        semana = estado.proxima_semana()
+        planilha = gerar_planilha(estado.nomes, semana, semente=semana)
+        resposta = _medir(resultados, 'upload', cliente, 'POST', '/upload',
+                          files={'file': (f"semana{semana}.csv", planilha, 'text/csv')})
+        if resposta is not None and resposta.status_code == 200:
+            estado.adicionar(resposta.json()['html_url'].rsplit('/', 1)[-1])
+        return
+
+    if acao == 'analytics':
+        _medir(resultados, 'analytics', cliente, 'GET', '/api/analytics')
+        return
+
+    arquivo = estado.sortear()
+    if not arquivo:
+        return
+    if acao == 'pdf':
+        _medir(resultados, 'pdf', cliente, 'GET', f"/pdf/{arquivo}")
+    elif acao == 'relatorio':
+        _medir(resultados, 'relatorio', cliente, 'GET', f"/relatorio/{arquivo}")
+    elif acao == 'api_criadores':
+        _medir(resultados, 'api_criadores', cliente, 'GET', f"/api/relatorio/{arquivo}/criadores",
+               params={'pagina': random.randint(1, 5), 'ordenar': random.choice(['diamantes', 'horas', 'nome'])})
+
+
+def usuario_virtual(url, email, acoes, pesos, prazo, pausa, resultados, estado):
+    """Loga e repete ações sorteadas pelos pesos até o prazo (pausa média entre ações)"""
+    with httpx.Client(base_url=url, timeout=300, follow_redirects=False) as cliente:
+        if not _login(cliente, email, resultados):
+            return
+        while time.monotonic() < prazo:
+            acao = random.choices(acoes, pesos)[0]
+            if acao == 'painel':
+                _medir(resultados, 'painel', cliente, 'GET', '/painel')
+            else:
+                _acao_admin(acao, cliente, estado, resultados)
+            if pausa:
+                time.sleep(random.uniform(0, 2 * pausa))
+
+
+def _ler_mix(texto):
+    itens = [parte.split('=') for parte in texto.split(',') if parte]
+    return [nome.strip() for nome, _ in itens], [float(peso) for _, peso in itens]
+
+
+def imprimir_resumo(linhas, duracao):
+    print()
+    print(f"📊 RESULTADO ({duracao:.0f}s)")
+    print(f"   {'rota':<15}{'req':>8}{'erros':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+    for l in linhas:
+        print(f"   {l['rota']:<15}{l['requisicoes']:>8}{l['erros']:>7}{l['rps']:>9}"
+              f"{l['p50_ms']:>10}{l['p95_ms']:>10}{l['p99_ms']:>10}{l['max_ms']:>10}")
+    total = sum(l['requisicoes'] for l in linhas)
+    print(f"   Total: {total} requisições · {total / max(duracao, 0.001):.1f} req/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Teste de carga com Supabase e Anthropic falsos')
+    parser.add_argument('--creators', type=int, default=40, help='Creators simultâneos abrindo /painel')
+    parser.add_argument('--admins', type=int, default=2, help='Admins simultâneos (upload, PDF, relatórios)')
+    parser.add_argument('--mix-admin', default=MIX_ADMIN_PADRAO, help=f'Pesos das ações dos admins (padrão: {MIX_ADMIN_PADRAO})')
+    parser.add_argument('--duracao', type=float, default=60, help='Segundos de tráfego medido')
+    parser.add_argument('--pausa', type=float, default=0.5, help='Pausa média entre ações de um usuário (s)')
+    parser.add_argument('--workers', type=int, default=2, help='Workers do gunicorn')
+    parser.add_argument('--threads', type=int, default=4, help='Threads por worker do gunicorn')
+    parser.add_argument('--porta', type=int, default=5099, help='Porta da aplicação')
+    parser.add_argument('--base-creators', type=int, default=500, help='Creators no banco falso (e em cada planilha enviada)')
+    parser.add_argument('--base-semanas', type=int, default=8, help='Semanas de histórico no banco falso')
+    parser.add_argument('--latencia-banco', type=float, default=0.02, help='Latência média do Supabase falso (s)')
+    parser.add_argument('--latencia-ia', type=float, default=2.0, help='Latência média da Anthropic falsa (s)')
+    parser.add_argument('--erro-ia', type=float, default=0.0, help='Fração de respostas 529 da Anthropic falsa')
+    parser.add_argument('--url', default=None, help='Usar uma aplicação já rodando (não sobe o gunicorn)')
+    parser.add_argument('--saida', default=None, help='Gravar o resultado em JSON neste arquivo')
+    args = parser.parse_args(argv)
+
+    supabase = SupabaseFalso(Latencia(args.latencia_banco, args.latencia_banco / 2)).iniciar()
+    anthropic = AnthropicFalso(Latencia(args.latencia_ia, args.latencia_ia / 4), taxa_erro=args.erro_ia).iniciar()
+
+    print(f"🌱 Semeando {args.base_creators} creators × {args.base_semanas} semanas...")
+    nomes = semear(supabase, args.base_creators, args.base_semanas)
+
+    pasta = tempfile.mkdtemp(prefix='olah_carga_')
+    processo = None
+    url = args.url
+
+    try:
+        if not url:
+            ambiente = {
+                'SUPABASE_URL': supabase.url,
+                'SUPABASE_KEY': 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.carga',
+                'ANTHROPIC_API_KEY': 'sk-ant-carga',
+                'ANTHROPIC_BASE_URL': anthropic.url,
+                'SECRET_KEY': os.urandom(16).hex(),
+                'BCRYPT_ROUNDS': '4'
+            }
+            print(f"🚀 gunicorn: {args.workers} workers × {args.threads} threads")
+            processo, url = iniciar_app(args.porta, args.workers, args.threads, ambiente, pasta)
+
+        estado = EstadoAdmin(nomes, args.base_semanas - 1)
+
+        # Um relatório pronto antes do tráfego: /pdf e /relatorio já têm alvo desde o início
+        preparo = Resultados()
+        with httpx.Client(base_url=url, timeout=300) as cliente:
+            if not _login(cliente, ADMIN_EMAIL, preparo):
+                raise RuntimeError('Login do admin falhou (a aplicação está usando o Supabase falso?)')
+            _acao_admin('upload', cliente, estado, preparo)
+        if not estado.relatorios:
+            raise RuntimeError(f"Upload inicial falhou; veja {os.path.join(pasta, 'app.log')}")
+
+        acoes_admin, pesos_admin = _ler_mix(args.mix_admin)
+        resultados = Resultados()
+        prazo = time.monotonic() + args.duracao
+
+        usuarios = [
+            threading.Thread(target=usuario_virtual, args=(
+                url, f"{random.choice(nomes)}@carga.local", ['painel'], [1], prazo, args.pausa, resultados, estado))
+            for _ in range(args.creators)
+        ] + [
+            threading.Thread(target=usuario_virtual, args=(
+                url, ADMIN_EMAIL, acoes_admin, pesos_admin, prazo, args.pausa, resultados, estado))
+            for _ in range(args.admins)
+        ]
+
+        print(f"🔥 {args.creators} creators + {args.admins} admins por {args.duracao:.0f}s "
+              f"(banco {args.latencia_banco * 1000:.0f}ms, IA {args.latencia_ia:.1f}s)")
+        inicio = time.monotonic()
+        for usuario in usuarios:
+            usuario.start()
+        for usuario in usuarios:
+            usuario.join()
+        duracao = time.monotonic() - inicio
+
+        linhas = resultados.resumo(duracao)
+        imprimir_resumo(linhas, duracao)
+        print(f"   Chamadas ao Supabase falso: {supabase.chamadas} · à Anthropic falsa: {anthropic.chamadas}")
+
+        if args.saida:
+            with open(args.saida, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'configuracao': vars(args),
+                    'duracao': round(duracao, 1),
+                    'rotas': linhas,
+                    'chamadas_supabase': supabase.chamadas,
+                    'chamadas_anthropic': anthropic.chamadas
+                }, f, ensure_ascii=False, indent=2)
+            print(f"💾 Resultado gravado em {args.saida}")
+
+        return 0
+
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+
+    finally:
+        if processo:
+            processo.terminate()
+            processo.wait(timeout=30)
+        supabase.parar()
+        anthropic.parar()
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
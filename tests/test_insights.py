@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Prompt dos insights da IA: deve levar os números reais da semana
+"""
+
+import pytest
+
+import analisador as modulo_analisador
+from analisador import AnalisadorRelatorio, montar_prompt_insights
+
+# Totais conferidos à mão: 80.950 diamantes, 99h55m de live (99.9h), 77 batalhas;
+# ana_live e bruno_tk (top 20%) ficam em atenção, os outros 8 em alerta
+PLANILHA = """Nome do criador,Diamantes,Duração da LIVE,Dias válidos de início de LIVE,Batalhas,Diamantes obtidos de batalhas,Período dos dados
+ana_live,48000,30h 10m 0s,6,40,30000,2024-01-08 a 2024-01-14
+bruno_tk,21000,26h 0m 0s,5,25,12000,2024-01-08 a 2024-01-14
+carla.oficial,9000,22h 30m 0s,3,10,2000,2024-01-08 a 2024-01-14
+davi_games,1500,8h 0m 0s,1,2,100,2024-01-08 a 2024-01-14
+eva_ao_vivo,700,3h 15m 0s,1,0,0,2024-01-08 a 2024-01-14
+fabi_live,300,2h 0m 0s,1,0,0,2024-01-08 a 2024-01-14
+gui.tk,200,2h 0m 0s,1,0,0,2024-01-08 a 2024-01-14
+helo_oficial,150,2h 0m 0s,1,0,0,2024-01-08 a 2024-01-14
+igor_games,60,2h 0m 0s,1,0,0,2024-01-08 a 2024-01-14
+ju_ao_vivo,40,2h 0m 0s,1,0,0,2024-01-08 a 2024-01-14
+"""
+
+
+@pytest.fixture
+def planilha(tmp_path):
+    caminho = tmp_path / 'semana.csv'
+    caminho.write_text(PLANILHA, encoding='utf-8')
+    return str(caminho)
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Substitui a chamada à API: guarda os prompts recebidos e devolve um texto fixo"""
+    recebidos = []
+
+    def gerar(prompt, max_tokens=800):
+        recebidos.append(prompt)
+        return 'INSIGHTS DE TESTE'
+
+    monkeypatch.setattr(modulo_analisador.ia, 'disponivel', lambda: True)
+    monkeypatch.setattr(modulo_analisador.ia, 'gerar', gerar)
+    # Só o prompt dos insights interessa aqui
+    monkeypatch.setattr(AnalisadorRelatorio, 'gerar_notas_ia', lambda self: None)
+    return recebidos
+
+
+def test_prompt_leva_os_numeros_da_semana(planilha):
+    analisador = AnalisadorRelatorio(planilha, usar_ia=False)
+    assert analisador.processar()['status'] == 'sucesso'
+
+    prompt = montar_prompt_insights(analisador.dados_agregados)
+
+    assert '- Total diamantes: 80,950' in prompt
+    assert '- Horas totais: 99.9h' in prompt
+    assert '- Alertas vermelhos: 8' in prompt
+    assert '- Atenções: 2' in prompt
+    assert '- Média batalhas/creator: 7.7' in prompt
+    assert '- Top 3: ana_live, bruno_tk' in prompt
+
+
+def test_insights_enviam_o_prompt_da_semana(planilha, prompts):
+    analisador = AnalisadorRelatorio(planilha)
+    assert analisador.processar()['status'] == 'sucesso'
+
+    assert len(prompts) == 1
+    assert prompts[0] == montar_prompt_insights(analisador.dados_agregados)
+    assert '- Total diamantes: 80,950' in prompts[0]
+    assert '- Horas totais: 99.9h' in prompts[0]
+    assert analisador.dados_agregados['insights_ia'] == 'INSIGHTS DE TESTE'